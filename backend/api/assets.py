@@ -0,0 +1,129 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from io import BytesIO
+from django.conf import settings
+from PIL import Image
+from reportlab.lib.utils import ImageReader
+
+# Static images drawn on purchase order PDFs
+LOGO_PATH = os.path.join(settings.BASE_DIR, 'static', 'images', 'cit-logo.png')
+ORIGINAL_STAMP_PATH = os.path.join(settings.BASE_DIR, 'static', 'images', 'stamp-original.png')
+CIT_STAMP_PATH = os.path.join(settings.BASE_DIR, 'static', 'images', 'stamp-cit.png')
+STATIC_ASSET_PATHS = [LOGO_PATH, ORIGINAL_STAMP_PATH, CIT_STAMP_PATH]
+
+# Signatures are user content, so only keep the most recently used ones
+MAX_CACHED_SIGNATURES = 128
+
+
+class ImageAssetRegistry:
+    """
+    Process-wide cache of decoded images ready to hand to ReportLab.
+
+    Static assets are decoded once and re-read only when their mtime
+    changes. Signatures are keyed by a hash of their content, so identical
+    signature files stored under different names share one decoded image.
+    """
+
+    def __init__(self, max_signatures=MAX_CACHED_SIGNATURES):
+        self.max_signatures = max_signatures
+        self._lock = threading.Lock()
+        self._static = {}
+        self._signature_hashes = {}
+        self._signatures = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def static_image(self, path, mode=None):
+        """
+        Return an ``ImageReader`` for a static asset, or None if it is missing.
+
+        ``mode`` optionally converts the decoded image (e.g. ``'RGB'``).
+        """
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+        key = (path, mode)
+        with self._lock:
+            entry = self._static.get(key)
+            if entry is not None and entry[0] == mtime:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        reader = ImageReader(self._decode(path, mode))
+        with self._lock:
+            self._static[key] = (mtime, reader)
+        return reader
+
+    def signature_image(self, path):
+        """Return an ``ImageReader`` for a signature file, cached by content hash"""
+        stat = os.stat(path)
+        identity = (path, stat.st_size, stat.st_mtime_ns)
+
+        with self._lock:
+            content_hash = self._signature_hashes.get(identity)
+            if content_hash is not None and content_hash in self._signatures:
+                self._signatures.move_to_end(content_hash)
+                self.hits += 1
+                return self._signatures[content_hash]
+
+        with open(path, 'rb') as f:
+            data = f.read()
+        content_hash = hashlib.sha256(data).hexdigest()
+
+        with self._lock:
+            self._signature_hashes[identity] = content_hash
+            reader = self._signatures.get(content_hash)
+            if reader is not None:
+                self._signatures.move_to_end(content_hash)
+                self.hits += 1
+                return reader
+            self.misses += 1
+
+        # Decoded up front: render threads share the reader, and a lazily
+        # decoded PNG isn't safe to load from several threads at once
+        reader = ImageReader(self._decode(BytesIO(data)))
+        with self._lock:
+            self._signatures[content_hash] = reader
+            while len(self._signatures) > self.max_signatures:
+                self._signatures.popitem(last=False)
+            # Drop path identities whose image has been evicted
+            if len(self._signature_hashes) > 2 * self.max_signatures:
+                self._signature_hashes = {
+                    key: value for key, value in self._signature_hashes.items()
+                    if value in self._signatures
+                }
+        return reader
+
+    def _decode(self, fp, mode=None):
+        with Image.open(fp) as img:
+            img.load()
+            if mode and img.mode != mode:
+                return img.convert(mode)
+            return img.copy()
+
+    def stats(self):
+        """Return hit/miss counters and the current number of cached images"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'static_images': len(self._static),
+                'signature_images': len(self._signatures),
+            }
+
+    def clear(self):
+        """Forget every cached image and reset the counters"""
+        with self._lock:
+            self._static.clear()
+            self._signature_hashes.clear()
+            self._signatures.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+registry = ImageAssetRegistry()
@@ -0,0 +1,136 @@
+import hashlib
+from django.db.models import Count, Max
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.response import Response
+
+# Bump when serializer output changes, so clients drop responses they
+# cached in the old format
+ETAG_VERSION = 4
+
+SAFE_METHODS = ('GET', 'HEAD')
+CONDITIONAL_WRITE_METHODS = ('PUT', 'PATCH', 'DELETE')
+
+
+class PreconditionFailed(APIException):
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = 'The resource has changed since it was fetched.'
+    default_code = 'precondition_failed'
+
+
+class NotModified(Exception):
+    """Raised to answer a conditional GET with 304 before the view runs"""
+
+
+def _strip_weak(etag):
+    return etag[2:] if etag.startswith('W/') else etag
+
+
+def _etag_version(etag):
+    # If-Match uses strong comparison, so weak ETags never match
+    if etag.startswith('W/'):
+        return None
+    return etag.strip('"').partition('-')[0]
+
+
+class ConditionalRequestMixin:
+    """
+    ETags for viewset reads, computed without serializing the response.
+
+    The ETag is a hash of one aggregate query over the filtered queryset
+    (row count and latest ``updated_at`` by default), the query string and
+    the user, so ``If-None-Match`` can be answered with a 304 after that
+    single query. Updates and deletes of a single object honour
+    ``If-Match`` and fail with 412 when the object has changed.
+
+    A single object's ETag is its version followed by a hash of the query
+    string, so each ``?fields=``/``?expand=`` representation has its own.
+    ``If-Match`` only compares the version, so an ETag read with any
+    representation can be sent back with an update.
+
+    Viewsets whose responses include related rows extend
+    ``get_etag_aggregates`` so changes to those rows change the ETag too,
+    or override ``get_etag_state`` to avoid the query altogether.
+    """
+    etag_actions = ('list', 'retrieve', 'search')
+    # Querysets that are the same for every user can share ETags
+    etag_per_user = True
+
+    def get_etag_aggregates(self):
+        # Distinct, since aggregates over to-many relations add joins
+        return {
+            'rows': Count('pk', distinct=True),
+            'updated': Max('updated_at'),
+        }
+
+    def get_etag_state(self, queryset):
+        """Return values that change whenever the response for ``queryset`` would"""
+        return queryset.order_by().aggregate(**self.get_etag_aggregates())
+
+    def get_etag(self):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        if lookup_url_kwarg in self.kwargs:
+            return self.get_object_etag(self.kwargs[lookup_url_kwarg])
+        queryset = self.filter_queryset(self.get_queryset())
+        return quote_etag(self._etag_digest(queryset, self.action, self.request.query_params.urlencode()))
+
+    def get_object_etag(self, lookup_value):
+        """Return the ETag of the object ``lookup_value`` in this request's representation"""
+        queryset = self.filter_queryset(self.get_queryset()).filter(**{self.lookup_field: lookup_value})
+        # Retrieve, update and delete share the object's version
+        version = self._etag_digest(queryset, 'detail')
+        representation = hashlib.sha256(self.request.query_params.urlencode().encode('utf-8')).hexdigest()
+        return quote_etag(f"{version}-{representation[:16]}")
+
+    def _etag_digest(self, queryset, kind, query_string=''):
+        state = self.get_etag_state(queryset)
+        parts = [
+            f"v{ETAG_VERSION}",
+            type(self).__name__,
+            kind,
+            str(self.request.user.pk) if self.etag_per_user else '',
+            query_string,
+        ]
+        parts.extend(f"{name}={state[name]}" for name in sorted(state))
+        return hashlib.sha256('\0'.join(parts).encode('utf-8')).hexdigest()[:32]
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.etag = None
+
+        if request.method in SAFE_METHODS and self.action in self.etag_actions:
+            self.etag = self.get_etag()
+            if_none_match = request.headers.get('If-None-Match')
+            if if_none_match:
+                etags = {_strip_weak(etag) for etag in parse_etags(if_none_match)}
+                if self.etag in etags:
+                    raise NotModified
+
+        elif request.method in CONDITIONAL_WRITE_METHODS and 'If-Match' in request.headers:
+            etags = parse_etags(request.headers['If-Match'])
+            if '*' not in etags and _etag_version(self.get_etag()) not in {_etag_version(etag) for etag in etags}:
+                raise PreconditionFailed
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+            self._set_etag_headers(response)
+            return response
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if getattr(self, 'etag', None) and response.status_code == status.HTTP_200_OK:
+            self._set_etag_headers(response)
+        elif request.method in ('PUT', 'PATCH') and response.status_code == status.HTTP_200_OK:
+            # Hand back the new ETag so the next update can send If-Match
+            self.etag = self.get_etag()
+            self._set_etag_headers(response)
+        return response
+
+    def _set_etag_headers(self, response):
+        response['ETag'] = self.etag
+        # Let browsers keep the response but revalidate it on every use
+        patch_cache_control(response, private=True, no_cache=True)
@@ -0,0 +1,76 @@
+from decimal import Decimal
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+from .models import LineItem, PurchaseOrder, Vendor
+from .serializers import PurchaseOrderSummarySerializer
+
+DASHBOARD_CACHE_TIMEOUT = 300
+RECENT_PURCHASE_ORDER_COUNT = 5
+
+# Bumped on every vendor/line item write, which invalidates all dashboards at once
+GENERATION_KEY = 'dashboard:generation'
+
+
+def _generation():
+    return cache.get_or_set(GENERATION_KEY, 0, None)
+
+
+def _cache_key(user_id):
+    return f"dashboard:{_generation()}:{user_id}"
+
+
+def _money(value):
+    return str((value or Decimal('0')).quantize(Decimal('0.01')))
+
+
+def build_dashboard_stats(user):
+    """Compute the dashboard numbers for a user with a fixed set of queries"""
+    month_start = timezone.now().date().replace(day=1)
+    purchase_orders = PurchaseOrder.objects.filter(user=user)
+    totals = purchase_orders.aggregate(
+        count=Count('id'),
+        total_spend=Sum('total_amount'),
+        month_spend=Sum('total_amount', filter=Q(date__gte=month_start)),
+    )
+    recent = (
+        purchase_orders.select_related('vendor')
+        .only('id', 'po_number', 'date', 'total_amount', 'created_at', 'vendor__id', 'vendor__name')
+        .order_by('-created_at', '-id')[:RECENT_PURCHASE_ORDER_COUNT]
+    )
+    return {
+        'purchase_orders': totals['count'],
+        'vendors': Vendor.objects.count(),
+        'line_items': LineItem.objects.count(),
+        'total_spend': _money(totals['total_spend']),
+        'month_spend': _money(totals['month_spend']),
+        'recent_purchase_orders': PurchaseOrderSummarySerializer(recent, many=True).data,
+    }
+
+
+def get_dashboard_stats(user):
+    """Return the dashboard numbers for a user, from the cache when possible"""
+    key = _cache_key(user.pk)
+    stats = cache.get(key)
+    if stats is None:
+        stats = build_dashboard_stats(user)
+        cache.set(key, stats, DASHBOARD_CACHE_TIMEOUT)
+    return stats
+
+
+def invalidate_dashboard(user_id):
+    """Drop the cached dashboard of one user once the current transaction commits"""
+    transaction.on_commit(lambda: cache.delete(_cache_key(user_id)))
+
+
+def invalidate_all_dashboards():
+    """Drop every cached dashboard, e.g. after a shared catalog write"""
+    transaction.on_commit(_bump_generation)
+
+
+def _bump_generation():
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 1, None)
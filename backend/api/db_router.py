@@ -0,0 +1,76 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from . import metrics
+
+PRIMARY = 'default'
+REPLICA = 'replica'
+
+# Routing decisions for the request being handled in this context. Code
+# running outside a request (background jobs, management commands) has no
+# state and always uses the primary.
+_routing_state = ContextVar('db_routing_state', default=None)
+
+
+class RoutingState:
+    """Where the reads of one request go, and whether it has written yet"""
+
+    __slots__ = ('read_alias', 'wrote')
+
+    def __init__(self, read_alias=PRIMARY):
+        self.read_alias = read_alias
+        self.wrote = False
+
+
+def replica_configured():
+    return REPLICA in settings.DATABASES
+
+
+def reading_from_replica():
+    """Whether reads in the current context go to the replica"""
+    state = _routing_state.get()
+    return (
+        state is not None and not state.wrote
+        and state.read_alias == REPLICA and replica_configured()
+    )
+
+
+@contextmanager
+def routing(read_alias):
+    """Send reads in this context to ``read_alias`` until something is written"""
+    state = RoutingState(read_alias)
+    token = _routing_state.set(state)
+    try:
+        yield state
+    finally:
+        _routing_state.reset(token)
+
+
+class PrimaryReplicaRouter:
+    """
+    Send writes to the primary and reads to the replica where allowed.
+
+    Reads only go to the replica inside ``routing(REPLICA)``, which the
+    ``ReplicaRoutingMiddleware`` sets up for safe requests. The first write
+    switches the rest of that request back to the primary so it reads its
+    own changes.
+    """
+
+    def db_for_read(self, model, **hints):
+        alias = REPLICA if reading_from_replica() else PRIMARY
+        metrics.db_reads_routed.inc(alias=alias)
+        return alias
+
+    def db_for_write(self, model, **hints):
+        state = _routing_state.get()
+        if state is not None:
+            state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema from the primary
+        return db == PRIMARY
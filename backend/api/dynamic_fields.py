@@ -0,0 +1,141 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework.serializers import BaseSerializer, ListSerializer
+
+SAFE_METHODS = ('GET', 'HEAD')
+
+
+def _names(value):
+    if isinstance(value, str):
+        value = value.split(',')
+    return {name.strip() for name in value if name.strip()}
+
+
+class DynamicFieldsMixin:
+    """
+    Serializer support for ``?fields=`` and ``?expand=``.
+
+    Relations listed in ``Meta.expandable_fields`` (name to serializer
+    class and keyword arguments) are output as ids unless named in
+    ``expand``, in which case they are nested. ``fields`` limits the
+    output to the named fields; write-only fields are always kept. Both
+    options come from the serializer context, or else from the query
+    string, and only apply to the top-level serializer.
+    """
+
+    def _is_top_level(self):
+        return self.root is self or (isinstance(self.parent, ListSerializer) and self.parent is self.root)
+
+    def _option(self, name):
+        if name in self.context:
+            return _names(self.context[name])
+        request = self.context.get('request')
+        if request is None or name not in request.query_params:
+            return None
+        return _names(request.query_params[name])
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if not self._is_top_level():
+            return fields
+
+        expand = self._option('expand') or set()
+        for name, (serializer_class, kwargs) in getattr(self.Meta, 'expandable_fields', {}).items():
+            if name in expand:
+                fields[name] = serializer_class(read_only=True, **kwargs)
+
+        requested = self._option('fields')
+        if requested:
+            fields = {name: field for name, field in fields.items() if name in requested or field.write_only}
+        return fields
+
+
+class DynamicQuerysetMixin:
+    """
+    Viewset support for fetching only what the serializer outputs.
+
+    On reads the queryset's columns, joins and prefetches are derived from
+    the serializer's fields (after ``?fields=``/``?expand=``): columns no
+    field reads are deferred, to-one relations are joined only when shown,
+    and to-many relations are prefetched in full only when expanded.
+    ``computed_field_columns`` maps fields backed by model properties to
+    the columns they read; any other field that can't be traced to a
+    column leaves the queryset as it was.
+    """
+    computed_field_columns = {}
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.request.method not in SAFE_METHODS:
+            return queryset
+        return self.select_serialized_fields(queryset)
+
+    def select_serialized_fields(self, queryset):
+        opts = queryset.model._meta
+        columns = {opts.pk.name}
+        joins = {}
+        prefetches = []
+
+        for name, field in self.get_serializer().fields.items():
+            if field.write_only:
+                continue
+            if name in self.computed_field_columns:
+                columns.update(self.computed_field_columns[name])
+                continue
+            path = field.source_attrs
+            try:
+                model_field = opts.get_field(path[0]) if path else None
+            except FieldDoesNotExist:
+                model_field = None
+            if model_field is None or len(path) > 2:
+                return queryset
+
+            expanded = isinstance(field, BaseSerializer)
+            if model_field.many_to_many or model_field.one_to_many:
+                if expanded:
+                    prefetches.append(model_field.name)
+                else:
+                    # Just the ids of the related rows (and, for reverse
+                    # foreign keys, the column that links them back)
+                    related_columns = ['pk'] if model_field.many_to_many else ['pk', model_field.field.name]
+                    related = model_field.related_model
+                    prefetches.append(Prefetch(model_field.name, queryset=related.objects.only(*related_columns)))
+            elif model_field.is_relation:
+                columns.add(model_field.name)
+                if expanded:
+                    joins[model_field.name] = None
+                elif len(path) == 2:
+                    try:
+                        model_field.related_model._meta.get_field(path[1])
+                    except FieldDoesNotExist:
+                        return queryset
+                    related_columns = joins.setdefault(model_field.name, set())
+                    if related_columns is not None:
+                        related_columns.add(path[1])
+            elif len(path) == 1:
+                columns.add(model_field.name)
+            else:
+                return queryset
+
+        # Cursor pagination reads the ordering columns of the page's rows
+        ordering = getattr(self.paginator, 'ordering', None) or ()
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+        for term in (*queryset.query.order_by, *ordering):
+            if isinstance(term, str):
+                try:
+                    columns.add(opts.get_field(term.lstrip('-')).name)
+                except FieldDoesNotExist:
+                    pass
+
+        for relation, related_columns in joins.items():
+            if related_columns is None:
+                continue
+            columns.discard(relation)
+            columns.update(f'{relation}__{column}' for column in related_columns)
+
+        queryset = queryset.select_related(None).prefetch_related(None).only(*columns)
+        if joins:
+            # select_related() without arguments would follow every relation
+            queryset = queryset.select_related(*joins)
+        return queryset.prefetch_related(*prefetches)
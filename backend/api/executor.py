@@ -0,0 +1,60 @@
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+
+
+class ExecutorSaturated(Exception):
+    """Raised when a bounded executor has no free slot for another task"""
+
+
+class BoundedExecutor:
+    """
+    Thread pool that refuses work instead of queueing it without limit.
+
+    At most ``max_workers`` tasks run at once and ``max_pending`` more may
+    wait for a thread; beyond that ``submit`` raises ``ExecutorSaturated``
+    so callers can shed load. Tasks run in a copy of the submitter's
+    context, so context variables (such as the per-request metrics) are
+    visible to them.
+    """
+
+    def __init__(self, max_workers, max_pending, thread_name_prefix=''):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix=thread_name_prefix)
+        self._slots = threading.BoundedSemaphore(max_workers + max_pending)
+
+    def submit(self, fn, *args, **kwargs):
+        if not self._slots.acquire(blocking=False):
+            raise ExecutorSaturated
+        try:
+            context = contextvars.copy_context()
+            future = self._executor.submit(context.run, fn, *args, **kwargs)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    async def run(self, fn, *args, **kwargs):
+        """Run ``fn`` on the pool and await its result from async code"""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+
+_render_executor = None
+_render_executor_lock = threading.Lock()
+
+
+def get_render_executor():
+    """Return the process-wide executor used for PDF renders in requests"""
+    global _render_executor
+    with _render_executor_lock:
+        if _render_executor is None:
+            _render_executor = BoundedExecutor(
+                settings.PDF_RENDER_THREADS,
+                settings.PDF_RENDER_QUEUE_SIZE,
+                thread_name_prefix='pdf-render',
+            )
+        return _render_executor
@@ -0,0 +1,33 @@
+import django_filters
+from rest_framework import filters
+from .models import PurchaseOrder
+
+
+class PurchaseOrderFilter(django_filters.FilterSet):
+    """Server-side filters for the purchase order list"""
+    vendor_id = django_filters.NumberFilter(field_name='vendor_id')
+    date_from = django_filters.DateFilter(field_name='date', lookup_expr='gte')
+    date_to = django_filters.DateFilter(field_name='date', lookup_expr='lte')
+    min_total = django_filters.NumberFilter(field_name='total_amount', lookup_expr='gte')
+    max_total = django_filters.NumberFilter(field_name='total_amount', lookup_expr='lte')
+    
+    class Meta:
+        model = PurchaseOrder
+        fields = ['vendor_id', 'approval_stamp', 'date_from', 'date_to', 'min_total', 'max_total']
+
+
+class CursorOrderingFilter(filters.OrderingFilter):
+    """
+    ``?ordering=`` for cursor-paginated lists.
+
+    The id is appended to the ordering the client picks, so rows that tie
+    on it still have a fixed order and the cursor's offset into the ties
+    doesn't skip or repeat any of them between pages.
+    """
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if not ordering or any(field.lstrip('-') in ('id', 'pk') for field in ordering):
+            return ordering
+        direction = '-' if ordering[0].startswith('-') else ''
+        return [*ordering, f'{direction}id']
@@ -0,0 +1,247 @@
+import csv
+import hashlib
+import io
+import logging
+import tempfile
+from itertools import islice
+from decimal import Decimal
+from django.conf import settings
+from django.db import transaction
+from rest_framework import serializers, status
+from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
+from rest_framework.response import Response
+from .dashboard import invalidate_all_dashboards
+from .line_items import line_item_content_hash
+from .models import LineItem, Vendor
+from .response_cache import invalidate as invalidate_cached_responses
+from .serializers import LineItemSerializer, VendorSerializer
+
+logger = logging.getLogger(__name__)
+
+# Rows of the existing table read per query when building the duplicate index
+INDEX_FETCH_SIZE = 5000
+
+
+class CSVImportError(Exception):
+    """Raised when a CSV file can't be imported at all"""
+
+
+def _normalize(value):
+    if isinstance(value, Decimal):
+        return str(value.normalize())
+    if isinstance(value, str):
+        return ' '.join(value.split()).casefold()
+    return str(value)
+
+
+def _error_message(detail):
+    if isinstance(detail, dict):
+        return '; '.join(f"{field}: {_error_message(errors)}" for field, errors in detail.items())
+    if isinstance(detail, list):
+        return ' '.join(_error_message(error) for error in detail)
+    return str(detail)
+
+
+class ImportStats:
+    """Running counts of one import"""
+
+    __slots__ = ('rows', 'created', 'duplicates', 'rejected')
+
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.duplicates = 0
+        self.rejected = 0
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class CSVImporter:
+    """
+    Stream the rows of a CSV file into the database.
+
+    Rows are read one at a time and handled in chunks of ``chunk_size``:
+    each row is validated with ``serializer_class``, and the chunk's valid
+    rows are inserted with one ``bulk_create`` in their own transaction.
+    Rows whose ``key_fields`` match an existing row, or an earlier row of
+    the file, are skipped. That check uses a set of 16-byte digests loaded
+    from the table up front, so no rows of the file are kept in memory.
+    Rejected rows are written to ``rejects`` with their line number and
+    the reason.
+    """
+    model = None
+    serializer_class = None
+    key_fields = ()
+    response_cache_name = None
+
+    def __init__(self, chunk_size=None, progress=None):
+        self.chunk_size = chunk_size or settings.CSV_IMPORT_CHUNK_SIZE
+        self.progress = progress
+        self.stats = ImportStats()
+        self.columns = [
+            name for name, field in self.serializer_class().fields.items() if not field.read_only
+        ]
+
+    def row_key(self, values):
+        normalized = '\x1f'.join(_normalize(values[name]) for name in self.key_fields)
+        return hashlib.blake2b(normalized.encode(), digest_size=16).digest()
+
+    def run(self, lines, rejects=None):
+        """Import the CSV rows read from the text stream ``lines``"""
+        reader = csv.DictReader(lines)
+        header = reader.fieldnames or []
+        missing = [name for name in self.columns if name not in header]
+        if missing:
+            raise CSVImportError(f"Missing columns: {', '.join(missing)}")
+
+        reject_writer = csv.writer(rejects) if rejects is not None else None
+        if reject_writer:
+            reject_writer.writerow(['line', 'error', *header])
+
+        index = self._load_index()
+        try:
+            chunk = []
+            for row in reader:
+                chunk.append((reader.line_num, row))
+                if len(chunk) >= self.chunk_size:
+                    self._import_chunk(chunk, index, header, reject_writer)
+                    chunk = []
+            if chunk:
+                self._import_chunk(chunk, index, header, reject_writer)
+        finally:
+            # bulk_create sends no post_save, so the signal handlers don't
+            # drop the cached responses or the dashboards' counts
+            if self.stats.created:
+                if self.response_cache_name:
+                    invalidate_cached_responses(self.response_cache_name)
+                invalidate_all_dashboards()
+        return self.stats
+
+    def _load_index(self):
+        rows = self.model.objects.order_by().values_list(*self.key_fields).iterator(chunk_size=INDEX_FETCH_SIZE)
+        return {self.row_key(dict(zip(self.key_fields, values))) for values in rows}
+
+    def _import_chunk(self, chunk, index, header, reject_writer):
+        serializer = self.serializer_class()
+        objects = []
+        for line, row in chunk:
+            self.stats.rows += 1
+            try:
+                data = serializer.run_validation({name: row.get(name) for name in self.columns})
+            except serializers.ValidationError as exc:
+                self.stats.rejected += 1
+                if reject_writer:
+                    reject_writer.writerow([line, _error_message(exc.detail), *(row.get(name) for name in header)])
+                continue
+
+            key = self.row_key(data)
+            if key in index:
+                self.stats.duplicates += 1
+                continue
+            index.add(key)
+            objects.append(self.model(**data))
+
+        with transaction.atomic():
+            created = self._insert(objects)
+        self.stats.created += created
+        self.stats.duplicates += len(objects) - created
+        if self.progress:
+            self.progress(self.stats)
+
+    def _insert(self, objects):
+        """Insert the chunk's new rows and return how many were inserted"""
+        self.model.objects.bulk_create(objects)
+        return len(objects)
+
+
+class VendorImporter(CSVImporter):
+    model = Vendor
+    serializer_class = VendorSerializer
+    key_fields = ('name', 'address', 'city', 'state', 'zip_code', 'country')
+    response_cache_name = 'vendors'
+
+
+class LineItemImporter(CSVImporter):
+    model = LineItem
+    serializer_class = LineItemSerializer
+    key_fields = ('description', 'quantity', 'rate')
+    response_cache_name = 'line-items'
+
+    def row_key(self, values):
+        # Duplicates are the rows the unique content_hash would refuse
+        return bytes.fromhex(line_item_content_hash(**values))[:16]
+
+    def _load_index(self):
+        hashes = LineItem.objects.order_by().values_list('content_hash', flat=True).iterator(chunk_size=INDEX_FETCH_SIZE)
+        return {bytes.fromhex(content_hash)[:16] for content_hash in hashes}
+
+    def _insert(self, objects):
+        # Other imports or requests may have added some of these rows since
+        # the index was loaded. They are looked up again so they count as
+        # duplicates, and any added after that are skipped by the insert
+        # rather than failing the chunk on the unique content_hash.
+        hashes = {obj.compute_content_hash() for obj in objects}
+        existing = set(LineItem.objects.filter(content_hash__in=hashes).values_list('content_hash', flat=True))
+        objects = [obj for obj in objects if obj.compute_content_hash() not in existing]
+        LineItem.objects.bulk_create(objects, ignore_conflicts=True)
+        return len(objects)
+
+
+class CSVImportMixin:
+    """
+    Adds an ``import`` list action that loads an uploaded CSV ``file``.
+
+    Viewsets set ``csv_importer_class`` to the ``CSVImporter`` to use. The
+    response has the import counts and the first
+    ``CSV_IMPORT_MAX_REJECTS`` rejected rows, so the uploader's rows are
+    never stored where someone else could fetch them.
+    """
+    csv_importer_class = None
+
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_csv(self, request):
+        """
+        Import the rows of an uploaded CSV file
+        """
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({"file": ["A CSV file is required."]}, status=status.HTTP_400_BAD_REQUEST)
+
+        def log_progress(stats):
+            logger.info("CSV import progress", extra={'fields': {
+                'importer': self.csv_importer_class.__name__, **stats.as_dict()
+            }})
+
+        importer = self.csv_importer_class(progress=log_progress)
+        # Large uploads are already on disk; the rejects are buffered on disk
+        # as well and only the first of them returned
+        lines = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+        with tempfile.TemporaryFile('w+', encoding='utf-8', newline='') as rejects:
+            try:
+                stats = importer.run(lines, rejects)
+            except (CSVImportError, csv.Error, UnicodeDecodeError) as exc:
+                logger.info("CSV import failed: %s", exc)
+                return Response(
+                    {"file": [f"Invalid CSV file: {exc}"], **importer.stats.as_dict()},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            finally:
+                # Leave the upload open for Django to clean up
+                lines.detach()
+
+            rejects.seek(0)
+            data = {**stats.as_dict(), 'rejects': _read_rejects(rejects, settings.CSV_IMPORT_MAX_REJECTS)}
+        data['rejects_truncated'] = stats.rejected > len(data['rejects'])
+        return Response(data)
+
+
+def _read_rejects(rejects, limit):
+    # The first two columns are the ones CSVImporter adds to each rejected row
+    reader = csv.reader(rejects)
+    header = next(reader, [])[2:]
+    return [
+        {'line': int(line), 'error': error, 'values': dict(zip(header, values))}
+        for line, error, *values in islice(reader, limit)
+    ]
@@ -0,0 +1,56 @@
+import hashlib
+from decimal import Decimal
+from django.apps import apps
+
+AMOUNT_PRECISION = Decimal('0.01')
+
+# Line items are shared between orders and templates: there is one row per
+# distinct description, quantity and rate. Models are looked up through the
+# app registry because models.py imports this module.
+
+
+def line_item_content_hash(description, quantity, rate):
+    """
+    Hash of the fields that make two line items interchangeable.
+
+    Surrounding and repeated whitespace in the description is ignored, and
+    the amounts are compared at the precision they are stored with.
+    """
+    normalized = '\x1f'.join([
+        ' '.join(str(description).split()),
+        str(Decimal(str(quantity)).quantize(AMOUNT_PRECISION)),
+        str(Decimal(str(rate)).quantize(AMOUNT_PRECISION)),
+    ])
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+def _ids_by_hash(line_item_model, hashes):
+    # Before the hash was unique, the oldest row of each group is the one kept
+    rows = line_item_model.objects.filter(content_hash__in=hashes).order_by('-pk')
+    return dict(rows.values_list('content_hash', 'pk'))
+
+
+def get_or_create_line_items(items):
+    """
+    Return the ids of the line items with these fields, creating missing ones.
+
+    ``items`` are dicts with a description, quantity and rate. Returns the
+    ids in the same order and how many line items were created.
+    """
+    LineItem = apps.get_model('api', 'LineItem')
+    fields = [
+        {'description': item['description'], 'quantity': item['quantity'], 'rate': item['rate']}
+        for item in items
+    ]
+    hashes = [line_item_content_hash(**item) for item in fields]
+    ids = _ids_by_hash(LineItem, hashes)
+    missing = {content_hash: item for content_hash, item in zip(hashes, fields) if content_hash not in ids}
+    if missing:
+        # Rows a concurrent request inserted in the meantime are picked up below
+        LineItem.objects.bulk_create(
+            [LineItem(content_hash=content_hash, **item) for content_hash, item in missing.items()],
+            ignore_conflicts=True
+        )
+        ids.update(_ids_by_hash(LineItem, missing))
+    return [ids[content_hash] for content_hash in hashes], len(missing)
+
@@ -0,0 +1,119 @@
+import atexit
+import copy
+import logging
+import os
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+# Records waiting for the listener thread; beyond this they are dropped
+# rather than making the logging thread wait
+DEFAULT_QUEUE_SIZE = 10000
+
+
+def _quote(value):
+    text = str(value)
+    if not text or any(char in text for char in ' "=\n'):
+        return '"' + text.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+    return text
+
+
+class KeyValueFormatter(logging.Formatter):
+    """
+    Format records as ``key=value`` pairs on a single line.
+
+    Structured data goes in ``extra={'fields': {...}}`` and is appended
+    after the standard time, level, logger and message keys.
+    """
+
+    def format(self, record):
+        pairs = [
+            ('ts', self.formatTime(record)),
+            ('level', record.levelname),
+            ('logger', record.name),
+            ('msg', record.getMessage()),
+        ]
+        pairs.extend(getattr(record, 'fields', {}).items())
+        line = ' '.join(f'{key}={_quote(value)}' for key, value in pairs)
+
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            line = f'{line}\n{record.exc_text}'
+        return line
+
+
+class BackgroundQueueHandler(QueueHandler):
+    """
+    Hand records to a listener thread that formats and writes them.
+
+    The logging thread only copies the record onto an in-memory queue, so
+    a slow stdout/stderr never holds up a request. If the queue is full
+    the record is dropped and counted in ``dropped``. The formatter set on
+    this handler is used by the listener's stream handler.
+    """
+
+    def __init__(self, stream=None, queue_size=DEFAULT_QUEUE_SIZE):
+        super().__init__(queue.Queue(queue_size))
+        self.target = logging.StreamHandler(stream)
+        self.dropped = 0
+        self._listener = None
+        self._listener_pid = None
+        self._listener_lock = threading.Lock()
+        self._stopped = False
+        self._start_listener()
+        atexit.register(self.flush_and_stop)
+
+    def _start_listener(self):
+        with self._listener_lock:
+            # A forked child inherits the handler but not the thread
+            if self._listener_pid == os.getpid():
+                return
+            self._listener = QueueListener(self.queue, self.target)
+            self._listener.start()
+            self._listener_pid = os.getpid()
+
+    def setFormatter(self, fmt):
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        # Layout and stream I/O are left to the listener thread. The queue
+        # never leaves this process, so the record only needs its message
+        # and fields turned into strings now, before the objects they
+        # refer to can change.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        fields = getattr(record, 'fields', None)
+        if fields:
+            record.fields = {key: str(value) for key, value in fields.items()}
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def emit(self, record):
+        if self._stopped:
+            # Shutting down: write directly rather than start a new thread
+            self.target.handle(record)
+            return
+        if self._listener_pid != os.getpid():
+            self._start_listener()
+        super().emit(record)
+
+    def flush_and_stop(self):
+        """Write out everything still queued and stop the listener thread"""
+        with self._listener_lock:
+            self._stopped = True
+            if self._listener is not None and self._listener_pid == os.getpid():
+                self._listener.stop()
+                self._listener = None
+                self._listener_pid = None
+        self.target.flush()
+
+    def close(self):
+        self.flush_and_stop()
+        super().close()
@@ -0,0 +1,67 @@
+from decimal import Decimal
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import DecimalField, F, Sum, Value
+from django.db.models.functions import Coalesce
+from api.models import PurchaseOrder
+
+
+class Command(BaseCommand):
+    help = 'Backfills and verifies the stored total_amount of purchase orders in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Number of purchase orders per batch')
+        parser.add_argument('--verify', action='store_true', help='Only report orders whose stored total is wrong')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        verify = options['verify']
+        
+        processed = 0
+        mismatched = 0
+        last_pk = 0
+        while True:
+            batch = list(
+                PurchaseOrder.objects.filter(pk__gt=last_pk)
+                .order_by('pk')
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1]
+            
+            if verify:
+                mismatched += self._verify_batch(batch)
+            else:
+                with transaction.atomic():
+                    PurchaseOrder.objects.filter(pk__in=batch).refresh_totals()
+            
+            processed += len(batch)
+            self.stdout.write(f'Processed {processed} purchase orders')
+        
+        if not verify:
+            self.stdout.write(self.style.SUCCESS(f'Backfilled totals for {processed} purchase orders'))
+        elif mismatched:
+            raise CommandError(f'{mismatched} of {processed} purchase orders have an incorrect total')
+        else:
+            self.stdout.write(self.style.SUCCESS(f'All {processed} purchase order totals are correct'))
+    
+    def _verify_batch(self, batch):
+        """Compare stored totals against a fresh SQL sum and report differences"""
+        purchase_orders = (
+            PurchaseOrder.objects.filter(pk__in=batch)
+            .annotate(expected_total=Coalesce(
+                Sum(F('line_items__quantity') * F('line_items__rate')),
+                Value(Decimal('0.00')),
+                output_field=DecimalField(max_digits=12, decimal_places=2)
+            ))
+            .values_list('po_number', 'total_amount', 'expected_total')
+        )
+        mismatched = 0
+        for po_number, total_amount, expected_total in purchase_orders:
+            if total_amount != expected_total:
+                mismatched += 1
+                self.stdout.write(self.style.WARNING(
+                    f'{po_number}: stored {total_amount}, expected {expected_total}'
+                ))
+        return mismatched
@@ -0,0 +1,249 @@
+import itertools
+import json
+import math
+import platform
+import re
+import tempfile
+import time
+import tracemalloc
+from datetime import date
+from decimal import Decimal
+from io import BytesIO
+import reportlab
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import override_settings
+from django.utils import timezone
+from PIL import Image, ImageDraw
+from api.line_items import get_or_create_line_items
+from api.models import PurchaseOrder, Vendor
+from api.pdf import PDF_LAYOUT_VERSION, render_purchase_order_pdf
+from api.signatures import store_signature
+
+PAGE_OBJECT = re.compile(rb'/Type /Page(?!s)')
+SIGNATURE_KINDS = ('none', 'raw', 'normalized')
+
+# Metrics compared against a baseline; larger is worse for all of them
+COMPARED_METRICS = ['p50_ms', 'p90_ms', 'peak_kb', 'bytes']
+
+
+def _int_list(value):
+    return [int(part) for part in value.split(',') if part]
+
+
+def _percentile(sorted_values, percent):
+    """Nearest-rank percentile of an already sorted list"""
+    rank = math.ceil(percent / 100 * len(sorted_values))
+    return sorted_values[min(max(rank, 1), len(sorted_values)) - 1]
+
+
+def _signature_upload():
+    """A large, untrimmed signature like the browser used to upload"""
+    img = Image.new('RGB', (1600, 700), 'white')
+    draw = ImageDraw.Draw(img)
+    draw.line((300, 380, 1300, 390), fill='black', width=10)
+    for x in range(300, 1300, 60):
+        draw.arc((x, 250, x + 120, 400), 180, 360, fill='black', width=8)
+    buffer = BytesIO()
+    img.save(buffer, format='PNG')
+    buffer.seek(0)
+    return buffer
+
+
+def _text(length, seed):
+    """Deterministic filler text of exactly ``length`` characters"""
+    words = f'{seed} reagent grade solvent lot certified analytical '
+    return (words * (length // len(words) + 1))[:length]
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks PDF rendering of synthetic purchase orders and optionally checks for regressions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', default='1,100,1000', help='Comma separated line item counts')
+        parser.add_argument('--description-chars', default='40,400', help='Comma separated description lengths')
+        parser.add_argument('--notes-chars', default='0,4000', help='Comma separated notes lengths')
+        parser.add_argument('--signatures', default='none,raw,normalized',
+                            help=f"Comma separated signature kinds ({', '.join(SIGNATURE_KINDS)})")
+        parser.add_argument('--iterations', type=int, default=5, help='Timed renders per scenario')
+        parser.add_argument('--warmup', type=int, default=1, help='Untimed renders per scenario')
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+        parser.add_argument('--baseline', help='JSON results of an earlier run to compare against')
+        parser.add_argument('--threshold', type=float, default=20.0,
+                            help='Fail when a metric is this many percent worse than the baseline')
+
+    def handle(self, *args, **options):
+        try:
+            lines = _int_list(options['lines'])
+            description_chars = _int_list(options['description_chars'])
+            notes_chars = _int_list(options['notes_chars'])
+        except ValueError:
+            raise CommandError('--lines, --description-chars and --notes-chars take comma separated integers')
+        signatures = [kind for kind in options['signatures'].split(',') if kind]
+        unknown = set(signatures) - set(SIGNATURE_KINDS)
+        if unknown:
+            raise CommandError(f"Unknown signature kinds: {', '.join(sorted(unknown))}")
+        iterations = max(options['iterations'], 1)
+
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = {result['scenario']: result for result in json.load(f)['results']}
+
+        scenarios = list(itertools.product(lines, description_chars, notes_chars, signatures))
+        self.stdout.write(
+            f"{'scenario':<40} {'pages':>6} {'bytes':>9} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'peak KB':>8}"
+        )
+
+        results = []
+        # Synthetic rows are rolled back and signature files go to a scratch
+        # MEDIA_ROOT, so a run leaves neither the database nor media behind
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            with transaction.atomic():
+                fixtures = self._create_fixtures()
+                for line_count, description_length, notes_length, signature in scenarios:
+                    purchase_order = self._create_purchase_order(
+                        fixtures, line_count, description_length, notes_length, signature
+                    )
+                    result = self._measure(purchase_order.pk, iterations, options['warmup'])
+                    result.update({
+                        'scenario': f'lines={line_count},desc={description_length},'
+                                    f'notes={notes_length},sig={signature}',
+                        'lines': line_count,
+                        'description_chars': description_length,
+                        'notes_chars': notes_length,
+                        'signature': signature,
+                    })
+                    results.append(result)
+                    self.stdout.write(
+                        f"{result['scenario']:<40} {result['pages']:>6} {result['bytes']:>9} "
+                        f"{result['p50_ms']:>8.1f} {result['p90_ms']:>8.1f} {result['p99_ms']:>8.1f} "
+                        f"{result['peak_kb']:>8.0f}"
+                    )
+                transaction.set_rollback(True)
+
+        report = {
+            'meta': {
+                'created_at': timezone.now().isoformat(),
+                'python': platform.python_version(),
+                'reportlab': reportlab.Version,
+                'database': connection.vendor,
+                'layout_version': PDF_LAYOUT_VERSION,
+                'iterations': iterations,
+            },
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+        if baseline is not None:
+            regressions = self._compare(results, baseline, options['threshold'])
+            if regressions:
+                for regression in regressions:
+                    self.stdout.write(self.style.ERROR(regression))
+                raise CommandError(f'{len(regressions)} metrics regressed by more than {options["threshold"]}%')
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Benchmark finished'))
+
+    def _create_fixtures(self):
+        user, _ = User.objects.get_or_create(
+            username='pdf-benchmark', defaults={'first_name': 'Bench', 'last_name': 'Mark'}
+        )
+        vendor = Vendor.objects.create(
+            name='Benchmark Supplies', address='1 Test Road', city='Metuchen',
+            state='NJ', zip_code='08840', country='US',
+        )
+        raw_name = default_storage.save('signatures/benchmark-upload.png', ContentFile(_signature_upload().read()))
+        return {
+            'user': user,
+            'vendor': vendor,
+            'signatures': {
+                'none': None,
+                'raw': raw_name,
+                'normalized': store_signature(_signature_upload()),
+            },
+        }
+
+    def _create_purchase_order(self, fixtures, line_count, description_length, notes_length, signature):
+        purchase_order = PurchaseOrder.objects.create(
+            user=fixtures['user'], vendor=fixtures['vendor'], date=date.today(),
+            payment_days=30, payment_terms='2% 10',
+            notes=_text(notes_length, 'Note'), approval_stamp='both',
+            signature=fixtures['signatures'][signature],
+        )
+        # Scenarios with the same lines share the line item rows
+        line_item_ids, _ = get_or_create_line_items(
+            {
+                'quantity': (i % 9) + 1,
+                'description': _text(description_length, f'Item {i}'),
+                'rate': Decimal('12.50') + i % 7,
+            }
+            for i in range(line_count)
+        )
+        through = PurchaseOrder.line_items.through
+        through.objects.bulk_create(
+            through(purchaseorder_id=purchase_order.pk, lineitem_id=line_item_id) for line_item_id in line_item_ids
+        )
+        return purchase_order
+
+    def _render(self, purchase_order_id):
+        """Load and render an order the way the PDF view does on a cache miss"""
+        purchase_order = (
+            PurchaseOrder.objects.select_related('vendor', 'user')
+            .prefetch_related('line_items').get(pk=purchase_order_id)
+        )
+        return render_purchase_order_pdf(purchase_order, purchase_order.line_items.all())
+
+    def _measure(self, purchase_order_id, iterations, warmup):
+        for _ in range(warmup):
+            self._render(purchase_order_id)
+
+        timings = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            data = self._render(purchase_order_id)
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+
+        # tracemalloc slows allocation down, so peak memory gets its own run
+        tracemalloc.start()
+        try:
+            self._render(purchase_order_id)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        return {
+            'p50_ms': round(_percentile(timings, 50), 2),
+            'p90_ms': round(_percentile(timings, 90), 2),
+            'p99_ms': round(_percentile(timings, 99), 2),
+            'mean_ms': round(sum(timings) / len(timings), 2),
+            'max_ms': round(timings[-1], 2),
+            'peak_kb': round(peak / 1024, 1),
+            'bytes': len(data),
+            'pages': len(PAGE_OBJECT.findall(data)),
+        }
+
+    def _compare(self, results, baseline, threshold):
+        """Return a description of every metric worse than baseline by over ``threshold`` percent"""
+        regressions = []
+        for result in results:
+            previous = baseline.get(result['scenario'])
+            if previous is None:
+                continue
+            for metric in COMPARED_METRICS:
+                before, after = previous.get(metric), result[metric]
+                if not before:
+                    continue
+                change = (after - before) / before * 100
+                if change > threshold:
+                    regressions.append(
+                        f"{result['scenario']}: {metric} {before} -> {after} (+{change:.1f}%)"
+                    )
+        return regressions
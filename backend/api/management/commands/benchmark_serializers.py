@@ -0,0 +1,108 @@
+import time
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from api.models import LineItem, PurchaseOrder, Vendor
+from api.renderers import ORJSONRenderer, orjson
+from api.serializers import PurchaseOrderListSerializer, PurchaseOrderSerializer
+from .benchmark_pdf import _percentile
+
+
+class Command(BaseCommand):
+    help = 'Compares serializing and rendering a page of purchase orders with the detail and list serializers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100, help='Purchase orders on the page')
+        parser.add_argument('--line-items', type=int, default=5, help='Line items per purchase order')
+        parser.add_argument('--iterations', type=int, default=20, help='Timed runs per scenario')
+        parser.add_argument('--warmup', type=int, default=2, help='Untimed runs per scenario')
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stdout.write(self.style.WARNING('orjson is not installed; ORJSONRenderer falls back to json'))
+
+        # Everything is created in a transaction that is rolled back
+        with transaction.atomic():
+            user = self._create_fixtures(options['rows'], options['line_items'])
+            # The detail serializer with every relation expanded, as the list used to be
+            expanded = {'expand': 'user,vendor,line_items'}
+            scenarios = [
+                ('detail + json', self._detail_rows(user), PurchaseOrderSerializer, expanded, JSONRenderer()),
+                ('detail + orjson', self._detail_rows(user), PurchaseOrderSerializer, expanded, ORJSONRenderer()),
+                ('list + json', self._list_rows(user), PurchaseOrderListSerializer, {}, JSONRenderer()),
+                ('list + orjson', self._list_rows(user), PurchaseOrderListSerializer, {}, ORJSONRenderer()),
+            ]
+            results = [
+                (name, *self._measure(rows, serializer_class, context, renderer,
+                                      options['iterations'], options['warmup']))
+                for name, rows, serializer_class, context, renderer in scenarios
+            ]
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"{options['rows']} purchase orders, {options['line_items']} line items each")
+        self.stdout.write(f"{'scenario':<18} {'serialize p50':>14} {'render p50':>11} {'total p50':>10} {'bytes':>9}")
+        for name, serialize_ms, render_ms, total_ms, size in results:
+            self.stdout.write(
+                f"{name:<18} {serialize_ms:>12.2f}ms {render_ms:>9.2f}ms {total_ms:>8.2f}ms {size:>9}"
+            )
+
+        baseline, best = results[0], results[-1]
+        self.stdout.write(self.style.SUCCESS(
+            f"list + orjson takes {best[3] / baseline[3]:.0%} of the time and "
+            f"{best[4] / baseline[4]:.0%} of the bytes of detail + json"
+        ))
+
+    def _create_fixtures(self, row_count, line_item_count):
+        user = User.objects.create_user(username='benchmark-serializers')
+        vendor = Vendor.objects.create(
+            name='Benchmark Supplies Inc.', address='1 Test Way', city='Springfield',
+            state='IL', zip_code='62701', country='USA'
+        )
+        line_items = LineItem.objects.bulk_create(
+            LineItem(quantity=Decimal(index + 1), description=f'Benchmark item {index}', rate=Decimal('9.99'))
+            for index in range(line_item_count)
+        )
+        for _ in range(row_count):
+            purchase_order = PurchaseOrder.objects.create(user=user, vendor=vendor, notes='Benchmark order')
+            purchase_order.line_items.set(line_items)
+        return user
+
+    def _detail_rows(self, user):
+        # Everything the expanded detail serializer reads
+        return list(
+            PurchaseOrder.objects.filter(user=user)
+            .select_related('vendor', 'user').prefetch_related('line_items')
+        )
+
+    def _list_rows(self, user):
+        # The columns PurchaseOrderViewSet selects for its list
+        return list(
+            PurchaseOrder.objects.filter(user=user).select_related('vendor').only(
+                'id', 'po_number', 'date', 'vendor__name', 'total_amount',
+                'payment_terms', 'payment_days', 'created_at',
+            )
+        )
+
+    def _measure(self, rows, serializer_class, context, renderer, iterations, warmup):
+        serialize_times, render_times = [], []
+        for run in range(warmup + iterations):
+            start = time.perf_counter()
+            data = serializer_class(rows, many=True, context=context).data
+            serialized = time.perf_counter()
+            content = renderer.render(data)
+            rendered = time.perf_counter()
+            if run >= warmup:
+                serialize_times.append(serialized - start)
+                render_times.append(rendered - serialized)
+
+        totals = sorted(s + r for s, r in zip(serialize_times, render_times))
+        serialize_times.sort()
+        render_times.sort()
+        return (
+            _percentile(serialize_times, 50) * 1000,
+            _percentile(render_times, 50) * 1000,
+            _percentile(totals, 50) * 1000,
+            len(content),
+        )
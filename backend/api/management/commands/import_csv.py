@@ -0,0 +1,49 @@
+import csv
+import os
+import time
+from django.core.management.base import BaseCommand, CommandError
+from api.importers import CSVImportError, LineItemImporter, VendorImporter
+
+IMPORTERS = {
+    'vendors': VendorImporter,
+    'line-items': LineItemImporter,
+}
+
+
+class Command(BaseCommand):
+    help = 'Imports vendors or line items from a CSV file, skipping rows that already exist'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(IMPORTERS), help='What the file contains')
+        parser.add_argument('path', help='CSV file with a header row naming the columns')
+        parser.add_argument('--chunk-size', type=int, help='Rows validated and inserted per transaction')
+        parser.add_argument('--rejects', help='Where to write rejected rows (default: <path>.rejects.csv)')
+
+    def handle(self, *args, **options):
+        rejects_path = options['rejects'] or f"{options['path']}.rejects.csv"
+        started = time.monotonic()
+
+        def report(stats):
+            rate = stats.rows / max(time.monotonic() - started, 1e-6)
+            self.stdout.write(
+                f'Processed {stats.rows} rows: {stats.created} created, {stats.duplicates} duplicates, '
+                f'{stats.rejected} rejected ({rate:.0f} rows/s)'
+            )
+
+        importer = IMPORTERS[options['kind']](chunk_size=options['chunk_size'], progress=report)
+        try:
+            with open(options['path'], encoding='utf-8-sig', newline='') as lines, \
+                    open(rejects_path, 'w', encoding='utf-8', newline='') as rejects:
+                stats = importer.run(lines, rejects)
+        except (OSError, CSVImportError, csv.Error, UnicodeDecodeError) as exc:
+            raise CommandError(f'Import stopped after {importer.stats.rows} rows: {exc}')
+        finally:
+            if not importer.stats.rejected and os.path.exists(rejects_path):
+                os.remove(rejects_path)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {stats.created} of {stats.rows} rows in {time.monotonic() - started:.1f}s, '
+            f'{stats.duplicates} duplicates skipped'
+        ))
+        if stats.rejected:
+            self.stdout.write(self.style.WARNING(f'{stats.rejected} rows rejected, see {rejects_path}'))
@@ -0,0 +1,57 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from api.models import PurchaseOrder
+from api.signatures import is_stored_signature, store_signature
+
+
+class Command(BaseCommand):
+    help = 'Normalizes existing purchase order signatures and deduplicates the stored files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be migrated')
+        parser.add_argument('--keep-originals', action='store_true', help='Do not delete the original files')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        keep_originals = options['keep_originals']
+
+        names = (
+            PurchaseOrder.objects.exclude(signature='').exclude(signature__isnull=True)
+            .order_by().values_list('signature', flat=True).distinct()
+        )
+        pending = [name for name in names if not is_stored_signature(name)]
+        self.stdout.write(f'{len(pending)} signature files to migrate')
+
+        migrated = 0
+        missing = 0
+        bytes_before = 0
+        new_names = set()
+        for name in pending:
+            if not default_storage.exists(name):
+                missing += 1
+                self.stdout.write(self.style.WARNING(f'Missing file: {name}'))
+                continue
+            bytes_before += default_storage.size(name)
+            if dry_run:
+                continue
+
+            with default_storage.open(name, 'rb') as f:
+                new_name = store_signature(f)
+            new_names.add(new_name)
+
+            # A queryset update keeps updated_at and the model signals untouched
+            PurchaseOrder.objects.filter(signature=name).update(signature=new_name)
+            if not keep_originals:
+                default_storage.delete(name)
+            migrated += 1
+
+        bytes_after = sum(default_storage.size(new_name) for new_name in new_names)
+        if dry_run:
+            self.stdout.write(self.style.SUCCESS(
+                f'Would migrate {len(pending) - missing} files ({bytes_before} bytes), {missing} missing'
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'Migrated {migrated} files into {len(new_names)} shared files, '
+                f'{bytes_before} bytes -> {bytes_after} bytes, {missing} missing'
+            ))
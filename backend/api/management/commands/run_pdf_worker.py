@@ -0,0 +1,77 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from api.models import PDFRenderJob
+from api.pdf_jobs import (
+    claim_pdf_jobs, delete_superseded_pdf_jobs, requeue_stale_pdf_jobs, run_pdf_job,
+    STALE_JOB_AGE, SUPERSEDED_JOB_RETENTION
+)
+
+
+class Command(BaseCommand):
+    help = 'Runs queued purchase order PDF renders in a local thread pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=2, help='Number of render threads')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is empty')
+        parser.add_argument('--cleanup-interval', type=float, default=300.0,
+                            help='Seconds between removals of superseded jobs')
+
+    def handle(self, *args, **options):
+        threads = options['threads']
+        poll_interval = options['poll_interval']
+        
+        requeued = requeue_stale_pdf_jobs(STALE_JOB_AGE)
+        if requeued:
+            self.stdout.write(self.style.WARNING(f'Requeued {requeued} stale jobs'))
+        
+        self.stdout.write(self.style.SUCCESS(f'PDF worker started with {threads} threads'))
+        
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            running = set()
+            last_cleanup = None
+            try:
+                while True:
+                    if last_cleanup is None or time.monotonic() - last_cleanup >= options['cleanup_interval']:
+                        self._delete_superseded_jobs()
+                        last_cleanup = time.monotonic()
+                    
+                    free_slots = threads - len(running)
+                    jobs = claim_pdf_jobs(free_slots) if free_slots else []
+                    close_old_connections()
+                    for job in jobs:
+                        running.add(executor.submit(run_pdf_job, job.pk))
+                    
+                    if running:
+                        done, running = wait(running, timeout=poll_interval, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            self._report(future)
+                    elif options['once']:
+                        break
+                    else:
+                        time.sleep(poll_interval)
+            except KeyboardInterrupt:
+                self.stdout.write('Stopping, waiting for running renders to finish...')
+            
+            for future in wait(running).done:
+                self._report(future)
+    
+    def _delete_superseded_jobs(self):
+        deleted = delete_superseded_pdf_jobs(SUPERSEDED_JOB_RETENTION)
+        close_old_connections()
+        if deleted:
+            self.stdout.write(f'Removed {deleted} superseded jobs')
+    
+    def _report(self, future):
+        try:
+            job = future.result()
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f'Error running job: {str(e)}'))
+            return
+        
+        if job.status == PDFRenderJob.STATUS_DONE:
+            self.stdout.write(f'Rendered {job.pdf.name}')
+        else:
+            self.stdout.write(self.style.ERROR(f'Job {job.id} failed: {job.error}'))
@@ -0,0 +1,313 @@
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Latency buckets in seconds, shared by the request and render histograms
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+SIZE_BUCKETS = (1024, 10 * 1024, 100 * 1024, 1024 * 1024, 10 * 1024 * 1024)
+
+# Per-request statistics for the request being handled in this context
+current_request_stats = ContextVar('current_request_stats', default=None)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+class Histogram:
+    """
+    Cumulative histogram in the Prometheus style, one series per label set.
+
+    Values are kept in this process only; with several server processes
+    each one reports its own series.
+    """
+
+    def __init__(self, name, documentation, buckets, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket counts (plus +Inf), then the sum
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def collect(self):
+        """Return the histogram in the Prometheus text exposition format"""
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = [(key, list(counts), total) for key, (counts, total) in self._series.items()]
+
+        for key, counts, total in sorted(series):
+            labels = list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{_format_labels(labels + [("le", bound)])} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(labels)} {total}')
+            lines.append(f'{self.name}_count{_format_labels(labels)} {cumulative}')
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+class Counter:
+    """Monotonic counter in the Prometheus style, one series per label set"""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def values(self):
+        """Return the current value of every series, keyed by label values"""
+        with self._lock:
+            return dict(self._series)
+
+    def collect(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self._lock:
+            series = sorted(self._series.items())
+        for key, value in series:
+            lines.append(f'{self.name}{_format_labels(list(zip(self.labelnames, key)))} {value}')
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+class Gauge:
+    """
+    Gauge whose values are read from a callback when metrics are collected.
+
+    ``callback`` returns ``(label_values, value)`` pairs, with the label
+    values in the order of ``labelnames``.
+    """
+
+    def __init__(self, name, documentation, callback, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.labelnames = tuple(labelnames)
+
+    def collect(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} gauge']
+        for key, value in sorted(self.callback()):
+            lines.append(f'{self.name}{_format_labels(list(zip(self.labelnames, key)))} {value}')
+        return lines
+
+
+REGISTRY = []
+
+
+def register(metric):
+    REGISTRY.append(metric)
+    return metric
+
+
+request_duration = register(Histogram(
+    'http_request_duration_seconds', 'Time spent handling a request',
+    DURATION_BUCKETS, ['view', 'method', 'status'],
+))
+request_db_queries = register(Histogram(
+    'http_request_db_queries', 'Database queries executed per request',
+    QUERY_COUNT_BUCKETS, ['view'],
+))
+request_db_duration = register(Histogram(
+    'http_request_db_duration_seconds', 'Time spent in database queries per request',
+    DURATION_BUCKETS, ['view'],
+))
+request_pdf_duration = register(Histogram(
+    'http_request_pdf_render_seconds', 'Time spent rendering PDFs per request that rendered one',
+    DURATION_BUCKETS, ['view'],
+))
+response_size = register(Histogram(
+    'http_response_size_bytes', 'Size of response bodies with a known length',
+    SIZE_BUCKETS, ['view'],
+))
+pdf_render_duration = register(Histogram(
+    'pdf_render_duration_seconds', 'Time taken by each PDF render, in requests or background jobs',
+    DURATION_BUCKETS,
+))
+
+# Database connections opened by this process that may still be open,
+# mapped to when they were opened
+_connections = weakref.WeakKeyDictionary()
+_connections_lock = threading.Lock()
+
+
+def track_connection(connection):
+    """Record a newly opened database connection (``connection_created``)"""
+    with _connections_lock:
+        _connections[connection] = time.monotonic()
+    db_connections_opened.inc(alias=connection.alias)
+    # Connections belong to a thread, and under ASGI views run their queries
+    # on sync_to_async threads rather than the one the middleware runs on,
+    # so each connection charges its queries to the request in its context
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def _open_connections():
+    with _connections_lock:
+        tracked = list(_connections.items())
+    return [(conn, opened) for conn, opened in tracked if conn.connection is not None]
+
+
+def _connection_counts():
+    counts = {}
+    for conn, _ in _open_connections():
+        counts[conn.alias] = counts.get(conn.alias, 0) + 1
+    return [((alias,), count) for alias, count in counts.items()]
+
+
+def _connection_max_ages():
+    now = time.monotonic()
+    ages = {}
+    for conn, opened in _open_connections():
+        ages[conn.alias] = max(ages.get(conn.alias, 0.0), now - opened)
+    return [((alias,), round(age, 3)) for alias, age in ages.items()]
+
+
+def _pool_stats():
+    # Imported here: this module is loaded before the database settings
+    # are needed
+    from django.db import connections
+
+    values = []
+    for alias in connections:
+        if not connections.settings[alias].get('OPTIONS', {}).get('pool'):
+            continue
+        pool = connections[alias].pool
+        if pool is None:
+            continue
+        for stat, value in pool.get_stats().items():
+            values.append(((alias, stat), value))
+    return values
+
+
+def _image_asset_stats():
+    # Imported here: the registry pulls in ReportLab and Pillow, which
+    # processes that only serve metrics don't otherwise need
+    from .assets import registry
+
+    return [((stat,), value) for stat, value in registry.stats().items()]
+
+
+def _response_cache_hit_ratios():
+    requests = {}
+    hits = {}
+    for (name, result), count in response_cache_requests.values().items():
+        requests[name] = requests.get(name, 0) + count
+        if result == 'hit':
+            hits[name] = count
+    return [((name,), round(hits.get(name, 0) / total, 4)) for name, total in requests.items()]
+
+
+db_reads_routed = register(Counter(
+    'db_reads_routed_total', 'Read queries routed to each database alias', ['alias'],
+))
+db_connections_opened = register(Counter(
+    'db_connections_opened_total', 'Database connections opened (checked out, with pooling)', ['alias'],
+))
+db_connections_open = register(Gauge(
+    'db_connections_open', 'Database connections currently open in this process',
+    _connection_counts, ['alias'],
+))
+db_connection_age = register(Gauge(
+    'db_connection_age_max_seconds', 'Age of the oldest open database connection in this process',
+    _connection_max_ages, ['alias'],
+))
+db_pool = register(Gauge(
+    'db_pool', 'Connection pool statistics from psycopg, for aliases with pooling enabled',
+    _pool_stats, ['alias', 'stat'],
+))
+
+response_cache_requests = register(Counter(
+    'response_cache_requests_total', 'Cacheable API requests by response cache and result',
+    ['cache', 'result'],
+))
+response_cache_hit_ratio = register(Gauge(
+    'response_cache_hit_ratio', 'Share of cacheable API requests served from the response cache',
+    _response_cache_hit_ratios, ['cache'],
+))
+
+image_asset_cache = register(Gauge(
+    'pdf_image_cache', 'Hits, misses and images held by the decoded PDF image cache of this process',
+    _image_asset_stats, ['stat'],
+))
+
+
+class RequestStats:
+    """Counters collected while a single request is handled"""
+
+    __slots__ = ('query_count', 'query_time', 'pdf_time')
+
+    def __init__(self):
+        self.query_count = 0
+        self.query_time = 0.0
+        self.pdf_time = 0.0
+
+
+def record_query(execute, sql, params, many, context):
+    """``connection.execute_wrapper`` hook counting and timing queries"""
+    stats = current_request_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.query_time += time.perf_counter() - start
+        stats.query_count += 1
+
+
+@contextmanager
+def track_pdf_render():
+    """Time a PDF render and charge it to the current request, if any"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        pdf_render_duration.observe(elapsed)
+        stats = current_request_stats.get()
+        if stats is not None:
+            stats.pdf_time += elapsed
+
+
+def render_metrics():
+    """Return every registered metric in the Prometheus text format"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.collect())
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,151 @@
+import hashlib
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from . import db_router, metrics
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class PerformanceMiddleware:
+    """
+    Measure each request and report it in a ``Server-Timing`` header.
+
+    Records the query count, SQL time, PDF render time, response size and
+    total latency, and feeds them into the histograms in ``api.metrics``.
+    Disabled entirely when ``PERFORMANCE_METRICS_ENABLED`` is off.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.PERFORMANCE_METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        stats = metrics.RequestStats()
+        token = metrics.current_request_stats.set(stats)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.current_request_stats.reset(token)
+        return self._finish(request, response, stats, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        stats = metrics.RequestStats()
+        token = metrics.current_request_stats.set(stats)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.current_request_stats.reset(token)
+        return self._finish(request, response, stats, time.perf_counter() - start)
+
+    def _finish(self, request, response, stats, duration):
+        match = request.resolver_match
+        view = match.view_name if match is not None else 'unresolved'
+        metrics.request_duration.observe(duration, view=view, method=request.method, status=response.status_code)
+        metrics.request_db_queries.observe(stats.query_count, view=view)
+        metrics.request_db_duration.observe(stats.query_time, view=view)
+        if stats.pdf_time:
+            metrics.request_pdf_duration.observe(stats.pdf_time, view=view)
+
+        size = self._response_size(response)
+        if size is not None:
+            metrics.response_size.observe(size, view=view)
+
+        timings = [
+            f'db;desc="{stats.query_count} queries";dur={stats.query_time * 1000:.1f}',
+            f'total;dur={duration * 1000:.1f}',
+        ]
+        if stats.pdf_time:
+            timings.insert(1, f'pdf;dur={stats.pdf_time * 1000:.1f}')
+        response['Server-Timing'] = ', '.join(timings)
+        return response
+
+    def _response_size(self, response):
+        # Streaming bodies are only known up front if they set a length
+        if response.streaming:
+            length = response.get('Content-Length')
+            return int(length) if length else None
+        return len(response.content)
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Read from the replica for safe requests, except just after a write.
+
+    Unsafe requests read from the primary, and once a client has written,
+    its requests keep using the primary for ``REPLICA_PIN_SECONDS`` so it
+    sees its own changes despite replication lag. Clients are recognised
+    by their credentials (the Authorization header or session cookie)
+    because the frontend is served from another origin and sends no
+    cookies of ours. Not used at all when no replica is configured.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not db_router.replica_configured():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        keys = self._pin_keys(request)
+        pinned = bool(keys) and request.method in SAFE_METHODS and bool(cache.get_many(keys))
+        with db_router.routing(self._read_alias(request, pinned)) as state:
+            response = self.get_response(request)
+        if state.wrote:
+            cache.set_many(self._pins(keys, response), settings.REPLICA_PIN_SECONDS)
+        return response
+
+    async def __acall__(self, request):
+        keys = self._pin_keys(request)
+        pinned = bool(keys) and request.method in SAFE_METHODS and bool(await cache.aget_many(keys))
+        # The routing state is a context variable, so it follows the request
+        # into sync_to_async threads and the render executor
+        with db_router.routing(self._read_alias(request, pinned)) as state:
+            response = await self.get_response(request)
+        if state.wrote:
+            await cache.aset_many(self._pins(keys, response), settings.REPLICA_PIN_SECONDS)
+        return response
+
+    def _read_alias(self, request, pinned):
+        if request.method not in SAFE_METHODS or pinned:
+            return db_router.PRIMARY
+        return db_router.REPLICA
+
+    def _pin_keys(self, request):
+        credentials = [
+            request.META.get('HTTP_AUTHORIZATION'),
+            request.COOKIES.get(settings.SESSION_COOKIE_NAME),
+        ]
+        return [self._pin_key(credential) for credential in credentials if credential]
+
+    def _pin_key(self, credential):
+        # Hashed so credentials never end up in the cache
+        return 'db:pin:' + hashlib.sha256(credential.encode()).hexdigest()
+
+    def _pins(self, keys, response):
+        keys = list(keys)
+        # Logging in issues a new session cookie; pin that session as well
+        session = response.cookies.get(settings.SESSION_COOKIE_NAME)
+        if session is not None and session.value:
+            keys.append(self._pin_key(session.value))
+        return dict.fromkeys(keys, True)
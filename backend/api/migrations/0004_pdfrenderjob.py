@@ -0,0 +1,28 @@
+# Generated by Django 5.1.7 on 2026-10-16 20:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_alter_purchaseorder_approval_stamp'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PDFRenderJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], db_index=True, default='pending', max_length=20)),
+                ('fingerprint', models.CharField(blank=True, help_text='Fingerprint of the rendered content', max_length=64)),
+                ('pdf', models.FileField(blank=True, null=True, upload_to='pdfs/')),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('purchase_order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pdf_jobs', to='api.purchaseorder')),
+            ],
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.1.7 on 2026-10-16 20:40
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_totals(apps, schema_editor):
+    LineItem = apps.get_model('api', 'LineItem')
+    PurchaseOrder = apps.get_model('api', 'PurchaseOrder')
+    line_item_totals = (
+        LineItem.objects.filter(purchase_orders=OuterRef('pk'))
+        .values('purchase_orders')
+        .annotate(total=Sum(F('quantity') * F('rate')))
+        .values('total')
+    )
+    PurchaseOrder.objects.update(
+        total_amount=Coalesce(
+            Subquery(line_item_totals),
+            Value(Decimal('0.00')),
+            output_field=models.DecimalField(max_digits=12, decimal_places=2)
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_pdfrenderjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='purchaseorder',
+            name='total_amount',
+            field=models.DecimalField(db_index=True, decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.RunPython(backfill_totals, migrations.RunPython.noop),
+    ]
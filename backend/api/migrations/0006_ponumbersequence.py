@@ -0,0 +1,43 @@
+# Generated by Django 5.1.7 on 2026-10-16 20:40
+
+import re
+from datetime import datetime
+from django.db import migrations, models
+
+PO_NUMBER_RE = re.compile(r'^CIT(\d{6})-(\d+)$')
+
+
+def seed_sequences(apps, schema_editor):
+    """Start each day's sequence after the highest number already issued"""
+    PurchaseOrder = apps.get_model('api', 'PurchaseOrder')
+    PONumberSequence = apps.get_model('api', 'PONumberSequence')
+    last_values = {}
+    for po_number in PurchaseOrder.objects.values_list('po_number', flat=True).iterator():
+        match = PO_NUMBER_RE.match(po_number)
+        if not match:
+            continue
+        day = datetime.strptime(match.group(1), '%m%d%y').date()
+        last_values[day] = max(last_values.get(day, 0), int(match.group(2)))
+    PONumberSequence.objects.bulk_create(
+        PONumberSequence(day=day, last_value=last_value)
+        for day, last_value in last_values.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_purchaseorder_total_amount'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PONumberSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True)),
+                ('last_value', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(seed_sequences, migrations.RunPython.noop),
+    ]
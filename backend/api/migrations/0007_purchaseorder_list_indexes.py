@@ -0,0 +1,31 @@
+# Generated by Django 5.1.7 on 2026-10-16 20:41
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_ponumbersequence'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='purchaseorder',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='po_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchaseorder',
+            index=models.Index(fields=['user', 'vendor', '-created_at'], name='po_user_vendor_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchaseorder',
+            index=models.Index(fields=['user', '-date'], name='po_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchaseorder',
+            index=models.Index(fields=['user', '-total_amount'], name='po_user_total_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.1.7 on 2026-10-16 20:44
+
+from django.db import migrations
+
+# Trigram indexes on the uppercased text back the typeahead search in
+# api/search.py: both fuzzy matching (%) and prefix LIKE queries use them.
+# They only exist on PostgreSQL; other databases use the plain fallback.
+TRIGRAM_INDEXES = [
+    ('vendor_name_trgm_idx', 'api_vendor', 'name'),
+    ('lineitem_description_trgm_idx', 'api_lineitem', 'description'),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin (UPPER({column}) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_purchaseorder_list_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
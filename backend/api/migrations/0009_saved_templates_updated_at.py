@@ -0,0 +1,26 @@
+# Generated by Django 5.1.7 on 2026-10-16 21:10
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_search_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='savedlineitem',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='savedvendor',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.7 on 2026-10-16 21:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_saved_templates_updated_at'),
+    ]
+
+    operations = [
+        # Nullable until 0011 has filled it in and merged the duplicates
+        migrations.AddField(
+            model_name='lineitem',
+            name='content_hash',
+            field=models.CharField(editable=False, max_length=64, null=True),
+        ),
+    ]
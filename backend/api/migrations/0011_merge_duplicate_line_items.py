@@ -0,0 +1,170 @@
+# Generated by Django 5.1.7 on 2026-10-16 21:40
+
+import hashlib
+from collections import Counter
+from decimal import Decimal
+from django.db import migrations, transaction
+from django.db.models import Case, Count, Min, Value, When
+from django.utils import timezone
+
+# The content hash matches api.line_items.line_item_content_hash as it was
+# when the hash was introduced, frozen so later changes there don't alter
+# this migration. Merging only ever has work to do between 0010 and 0012,
+# so it lives here rather than in the app.
+
+BATCH_SIZE = 1000
+AMOUNT_PRECISION = Decimal('0.01')
+
+
+def content_hash(description, quantity, rate):
+    normalized = '\x1f'.join([
+        ' '.join(str(description).split()),
+        str(Decimal(str(quantity)).quantize(AMOUNT_PRECISION)),
+        str(Decimal(str(rate)).quantize(AMOUNT_PRECISION)),
+    ])
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+def ids_by_hash(LineItem, hashes):
+    # The oldest row of each group is the one kept
+    rows = LineItem.objects.filter(content_hash__in=hashes).order_by('-pk')
+    return dict(rows.values_list('content_hash', 'pk'))
+
+
+def get_or_create_line_items(LineItem, items):
+    fields = [
+        {'description': item['description'], 'quantity': item['quantity'], 'rate': item['rate']}
+        for item in items
+    ]
+    hashes = [content_hash(**item) for item in fields]
+    ids = ids_by_hash(LineItem, hashes)
+    missing = {value: item for value, item in zip(hashes, fields) if value not in ids}
+    if missing:
+        LineItem.objects.bulk_create(
+            [LineItem(content_hash=value, **item) for value, item in missing.items()]
+        )
+        ids.update(ids_by_hash(LineItem, missing))
+    return [ids[value] for value in hashes]
+
+
+def combine_repeated_line_items(LineItem, line_item_ids):
+    # An order links a line item at most once, so identical lines become a
+    # single line of the summed quantity, which keeps the order's total
+    replaced = set()
+    while True:
+        counts = Counter(line_item_ids)
+        repeated = {pk: count for pk, count in counts.items() if count > 1}
+        if not repeated:
+            return list(counts), replaced
+
+        rows = LineItem.objects.filter(pk__in=repeated).values('pk', 'description', 'quantity', 'rate')
+        combined = {
+            row['pk']: {**row, 'quantity': row['quantity'] * repeated[row['pk']]}
+            for row in rows
+        }
+        replaced.update(combined)
+        replacements = dict(zip(combined, get_or_create_line_items(LineItem, combined.values())))
+        line_item_ids = [replacements.get(pk, pk) for pk in counts]
+
+
+def fill_content_hashes(LineItem):
+    while True:
+        batch = list(
+            LineItem.objects.filter(content_hash__isnull=True).order_by('pk')
+            .only('description', 'quantity', 'rate')[:BATCH_SIZE]
+        )
+        if not batch:
+            return
+        for item in batch:
+            item.content_hash = content_hash(item.description, item.quantity, item.rate)
+        LineItem.objects.bulk_update(batch, ['content_hash'])
+
+
+def relink_purchase_orders(PurchaseOrder, LineItem, replacements):
+    through = PurchaseOrder.line_items.through
+    order_ids = sorted(set(
+        through.objects.filter(lineitem_id__in=replacements).values_list('purchaseorder_id', flat=True)
+    ))
+    combined = set()
+    for start in range(0, len(order_ids), BATCH_SIZE):
+        batch = order_ids[start:start + BATCH_SIZE]
+        links = {}
+        for order_id, line_item_id in (
+            through.objects.filter(purchaseorder_id__in=batch).order_by('pk')
+            .values_list('purchaseorder_id', 'lineitem_id')
+        ):
+            links.setdefault(order_id, []).append(replacements.get(line_item_id, line_item_id))
+
+        new_links = []
+        for order_id, line_item_ids in links.items():
+            line_item_ids, replaced = combine_repeated_line_items(LineItem, line_item_ids)
+            combined.update(replaced)
+            new_links.extend(through(purchaseorder_id=order_id, lineitem_id=pk) for pk in line_item_ids)
+        through.objects.filter(purchaseorder_id__in=batch).delete()
+        through.objects.bulk_create(new_links)
+        PurchaseOrder.objects.filter(pk__in=batch).update(updated_at=timezone.now())
+    return combined
+
+
+def merge_duplicates(apps, schema_editor):
+    LineItem = apps.get_model('api', 'LineItem')
+    SavedLineItem = apps.get_model('api', 'SavedLineItem')
+    PurchaseOrder = apps.get_model('api', 'PurchaseOrder')
+    fill_content_hashes(LineItem)
+
+    groups = (
+        LineItem.objects.filter(content_hash__isnull=False)
+        .values('content_hash')
+        .annotate(rows=Count('pk'), keep=Min('pk'))
+        .filter(rows__gt=1)
+        .order_by('content_hash')
+    )
+    last_hash = ''
+    while True:
+        batch = list(groups.filter(content_hash__gt=last_hash)[:BATCH_SIZE])
+        if not batch:
+            return
+        last_hash = batch[-1]['content_hash']
+        keep = {row['content_hash']: row['keep'] for row in batch}
+
+        with transaction.atomic():
+            duplicates = dict(
+                LineItem.objects.filter(content_hash__in=keep)
+                .exclude(pk__in=keep.values())
+                .values_list('pk', 'content_hash')
+            )
+            replacements = {pk: keep[value] for pk, value in duplicates.items()}
+            # A group with a row nothing used was listed on its own, so its
+            # kept row stays even if orders only used it repeated
+            listed = {keep[value] for value in (
+                LineItem.objects.filter(pk__in=[*keep.values(), *replacements], purchase_orders=None, savedlineitem=None)
+                .values_list('content_hash', flat=True)
+            )}
+            combined = relink_purchase_orders(PurchaseOrder, LineItem, replacements)
+            SavedLineItem.objects.filter(line_item_id__in=replacements).update(
+                line_item_id=Case(*(When(line_item_id=pk, then=Value(kept)) for pk, kept in replacements.items())),
+                updated_at=timezone.now()
+            )
+            LineItem.objects.filter(pk__in=replacements).delete()
+            # Lines that were only used repeated are now replaced by their combination
+            LineItem.objects.filter(pk__in=combined - listed, purchase_orders=None, savedlineitem=None).delete()
+
+
+# Merging rewrites the line items of orders that were already issued: their
+# links move to the kept rows and repeated lines become one line of the
+# summed quantity. Totals stay the same, but no record of the original lines
+# is kept, so back up api_purchaseorder_line_items before applying this if
+# issued orders need to be reproducible line for line.
+class Migration(migrations.Migration):
+    # Each batch commits on its own, so large tables aren't merged in one
+    # long transaction
+    atomic = False
+
+    dependencies = [
+        ('api', '0010_lineitem_content_hash'),
+    ]
+
+    operations = [
+        # Merged rows can't be split apart again, so reversing leaves them merged
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+    ]
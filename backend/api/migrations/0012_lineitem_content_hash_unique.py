@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-16 21:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_merge_duplicate_line_items'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='lineitem',
+            name='content_hash',
+            field=models.CharField(editable=False, max_length=64, unique=True),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.7 on 2026-10-16 22:32
+
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def drop_duplicate_pending_jobs(apps, schema_editor):
+    # Keep the oldest pending job of each order; the others render the same thing
+    PDFRenderJob = apps.get_model('api', 'PDFRenderJob')
+    pending = PDFRenderJob.objects.filter(status='pending')
+    keep = pending.values('purchase_order_id').annotate(keep=Min('pk')).values('keep')
+    pending.exclude(pk__in=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_lineitem_content_hash_unique'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_pending_jobs, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='pdfrenderjob',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'pending')), fields=('purchase_order',), name='pdfjob_one_pending_per_po'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.7 on 2026-10-16 23:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_pdfrenderjob_one_pending_per_po'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='purchaseorder',
+            name='po_user_date_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='purchaseorder',
+            name='po_user_total_idx',
+        ),
+        migrations.AddIndex(
+            model_name='purchaseorder',
+            index=models.Index(fields=['user', '-date', '-id'], name='po_user_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchaseorder',
+            index=models.Index(fields=['user', '-total_amount', '-id'], name='po_user_total_id_idx'),
+        ),
+    ]
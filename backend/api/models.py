@@ -1,8 +1,12 @@
-from django.db import models
+from decimal import Decimal
+from django.db import models, transaction
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
 from django.utils import timezone
 import uuid
 from datetime import datetime
+from .line_items import line_item_content_hash
 
 class Vendor(models.Model):
     """Model for storing vendor information"""
@@ -24,18 +28,46 @@ class SavedVendor(models.Model):
     vendor = models.ForeignKey(Vendor, on_delete=models.CASCADE)
     name = models.CharField(max_length=255, help_text="Template name for this saved vendor")
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return f"{self.name} - {self.vendor.name}"
 
+class LineItemQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        """Fill in the content hash, which bulk inserts don't get from save()"""
+        objs = list(objs)
+        for obj in objs:
+            obj.content_hash = obj.compute_content_hash()
+        return super().bulk_create(objs, *args, **kwargs)
+
 class LineItem(models.Model):
     """Model for storing line items in purchase orders"""
     quantity = models.DecimalField(max_digits=10, decimal_places=2)
     description = models.TextField()
     rate = models.DecimalField(max_digits=10, decimal_places=2)
+    # One row per distinct line, shared by every order and template using it
+    content_hash = models.CharField(max_length=64, unique=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = LineItemQuerySet.as_manager()
+    
+    def compute_content_hash(self):
+        return line_item_content_hash(self.description, self.quantity, self.rate)
+    
+    def save(self, *args, **kwargs):
+        """Keep the content hash in step with the fields it covers"""
+        self.content_hash = self.compute_content_hash()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'content_hash' not in update_fields:
+            kwargs['update_fields'] = [*update_fields, 'content_hash']
+        super().save(*args, **kwargs)
+    
+    def is_in_use(self):
+        """Whether an order or a saved template links this line item"""
+        return self.purchase_orders.exists() or self.savedlineitem_set.exists()
+    
     @property
     def amount(self):
         """Calculate the total amount for this line item"""
@@ -50,10 +82,50 @@ class SavedLineItem(models.Model):
     line_item = models.ForeignKey(LineItem, on_delete=models.CASCADE)
     name = models.CharField(max_length=255, help_text="Template name for this saved line item")
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return f"{self.name} - {self.line_item.description}"
 
+class PONumberSequence(models.Model):
+    """Model for allocating the daily sequence number in purchase order numbers"""
+    day = models.DateField(unique=True)
+    last_value = models.PositiveIntegerField(default=0)
+    
+    @classmethod
+    def next_value(cls, day):
+        """
+        Atomically allocate the next number for ``day``.
+        
+        The UPDATE takes a row lock that is held until the surrounding
+        transaction ends, so concurrent callers are serialized per day.
+        """
+        with transaction.atomic():
+            sequence, _ = cls.objects.get_or_create(day=day)
+            cls.objects.filter(pk=sequence.pk).update(last_value=F('last_value') + 1)
+            sequence.refresh_from_db(fields=['last_value'])
+        return sequence.last_value
+    
+    def __str__(self):
+        return f"{self.day}: {self.last_value}"
+
+class PurchaseOrderQuerySet(models.QuerySet):
+    def refresh_totals(self):
+        """Recompute the stored total_amount of every order in the queryset"""
+        line_item_totals = (
+            LineItem.objects.filter(purchase_orders=OuterRef('pk'))
+            .values('purchase_orders')
+            .annotate(total=Sum(F('quantity') * F('rate')))
+            .values('total')
+        )
+        return self.update(
+            total_amount=Coalesce(
+                Subquery(line_item_totals),
+                Value(Decimal('0.00')),
+                output_field=DecimalField(max_digits=12, decimal_places=2)
+            )
+        )
+
 class PurchaseOrder(models.Model):
     """Model for storing purchase orders"""
     APPROVAL_STAMP_CHOICES = [
@@ -73,46 +145,79 @@ class PurchaseOrder(models.Model):
     notes = models.TextField(blank=True)
     approval_stamp = models.CharField(max_length=20, choices=APPROVAL_STAMP_CHOICES, default='none')
     signature = models.ImageField(upload_to='signatures/', blank=True, null=True)
+    # Sum of the line item amounts, kept up to date by the signals in api.signals
+    total_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
-    @property
-    def total_amount(self):
-        """Calculate the total amount for this purchase order"""
-        return sum(item.amount for item in self.line_items.all())
+    objects = PurchaseOrderQuerySet.as_manager()
+    
+    class Meta:
+        indexes = [
+            # Cursor pagination and the default ordering of the list
+            models.Index(fields=['user', '-created_at', '-id'], name='po_user_created_idx'),
+            # Filtering by vendor, date or value within a user's orders
+            models.Index(fields=['user', 'vendor', '-created_at'], name='po_user_vendor_idx'),
+            # Also the orderings the list offers, with the id that breaks ties
+            models.Index(fields=['user', '-date', '-id'], name='po_user_date_id_idx'),
+            models.Index(fields=['user', '-total_amount', '-id'], name='po_user_total_id_idx'),
+        ]
+    
+    def refresh_total(self):
+        """Recompute the stored total and reload it onto this instance"""
+        PurchaseOrder.objects.filter(pk=self.pk).refresh_totals()
+        self.refresh_from_db(fields=['total_amount'])
     
     def save(self, *args, **kwargs):
         """Override save method to generate PO number if not provided"""
-        if not self.po_number:
-            # Generate PO number in format CITMMDDYY-[PO number of the day]
-            today = timezone.now().date()
-            date_part = today.strftime('%m%d%y')
+        today = timezone.now().date()
+        
+        # Allocate the number in the same transaction as the insert, so a
+        # failed insert rolls the sequence back instead of leaving a gap
+        with transaction.atomic():
+            if not self.po_number:
+                # Generate PO number in format CITMMDDYY-[PO number of the day]
+                number = PONumberSequence.next_value(today)
+                self.po_number = f"CIT{today.strftime('%m%d%y')}-{number}"
             
-            # Find the highest PO number for today
-            today_pos = PurchaseOrder.objects.filter(
-                created_at__year=today.year,
-                created_at__month=today.month,
-                created_at__day=today.day
-            ).order_by('-po_number')
+            # Always update the date to the current date
+            self.date = today
             
-            # Get the highest number or start with 1
-            if today_pos.exists():
-                # Extract the number after the dash
-                last_po = today_pos.first()
-                try:
-                    last_number = int(last_po.po_number.split('-')[-1])
-                    new_number = last_number + 1
-                except (ValueError, IndexError):
-                    new_number = 1
-            else:
-                new_number = 1
-                
-            self.po_number = f"CIT{date_part}-{new_number}"
-        
-        # Always update the date to the current date
-        self.date = timezone.now().date()
-        
-        super().save(*args, **kwargs)
+            super().save(*args, **kwargs)
+    
+    def __str__(self):
+        return f"PO #: {self.po_number} - {self.vendor.name}"
+
+class PDFRenderJob(models.Model):
+    """Model for queued background renders of purchase order PDFs"""
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+    
+    purchase_order = models.ForeignKey(PurchaseOrder, on_delete=models.CASCADE, related_name='pdf_jobs')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING, db_index=True)
+    fingerprint = models.CharField(max_length=64, blank=True, help_text="Fingerprint of the rendered content")
+    pdf = models.FileField(upload_to='pdfs/', blank=True, null=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        constraints = [
+            # Saves in quick succession share one queued render
+            models.UniqueConstraint(
+                fields=['purchase_order'], condition=models.Q(status='pending'),
+                name='pdfjob_one_pending_per_po'
+            ),
+        ]
     
     def __str__(self):
-        return f"PO #: {self.po_number} - {self.vendor.name}" 
\ No newline at end of file
+        return f"PDF job {self.id} for {self.purchase_order.po_number} ({self.status})"
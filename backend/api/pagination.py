@@ -0,0 +1,13 @@
+from rest_framework.pagination import CursorPagination
+
+
+class PurchaseOrderCursorPagination(CursorPagination):
+    """
+    Keyset pagination for purchase orders.
+
+    Each page is a range scan on the (user, created_at, id) index instead
+    of an OFFSET, so deep pages cost the same as the first one.
+    """
+    ordering = ('-created_at', '-id')
+    page_size_query_param = 'page_size'
+    max_page_size = 100
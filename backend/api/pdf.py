@@ -0,0 +1,381 @@
+import logging
+import threading
+from contextlib import contextmanager
+from io import BytesIO
+from reportlab import rl_config
+from reportlab.pdfgen import canvas
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.units import inch
+from .assets import registry, LOGO_PATH, ORIGINAL_STAMP_PATH, CIT_STAMP_PATH
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the drawing code below changes so cached PDFs are re-rendered
+PDF_LAYOUT_VERSION = 6
+
+PAGE_WIDTH, PAGE_HEIGHT = letter
+BOTTOM_MARGIN = 0.9*inch
+ROW_HEIGHT = 0.2*inch
+DESCRIPTION_CHARS_PER_LINE = 50
+NOTES_CHARS_PER_LINE = 80
+
+CONTINUATION_TOP = PAGE_HEIGHT - 1.1*inch
+
+# Vertical space the totals, notes, signature and stamps need below the
+# last row
+TOTALS_HEIGHT = 0.2*inch
+NOTES_GAP = 0.4*inch
+SIGNATURE_GAP = 0.8*inch
+SIGNATURE_BLOCK_HEIGHT = SIGNATURE_GAP + 1.7*inch
+
+# Static drawing operations, built once per process. Each entry is
+# (canvas method, arguments).
+LETTERHEAD_OPS = (
+    # Add header - moved further to the right
+    ('setFont', ("Helvetica-Bold", 18)),
+    ('drawString', (PAGE_WIDTH - 2.7*inch, PAGE_HEIGHT - 0.5*inch, "PURCHASE ORDER")),
+
+    # Add company information - now below the logo
+    ('setFont', ("Helvetica", 10)),
+    ('drawString', (1*inch, PAGE_HEIGHT - 1.7*inch, "Chem Is Try Inc")),
+    ('drawString', (1*inch, PAGE_HEIGHT - 1.9*inch, "160-4 Liberty Street")),
+    ('drawString', (1*inch, PAGE_HEIGHT - 2.1*inch, "Metuchen, NJ 08840")),
+    ('drawString', (1*inch, PAGE_HEIGHT - 2.3*inch, "Phone: 732-372-7311")),
+    ('drawString', (1*inch, PAGE_HEIGHT - 2.5*inch, "Email: info@chem-is-try.com")),
+    ('drawString', (1*inch, PAGE_HEIGHT - 2.7*inch, "Website: www.chem-is-try.com")),
+
+    # Add shipping information
+    ('setFont', ("Helvetica-Bold", 12)),
+    ('drawString', (5*inch, PAGE_HEIGHT - 3.1*inch, "Ship To:")),
+    ('setFont', ("Helvetica", 10)),
+    ('drawString', (5*inch, PAGE_HEIGHT - 3.3*inch, "Chem Is Try Inc")),
+    ('drawString', (5*inch, PAGE_HEIGHT - 3.5*inch, "160-4 Liberty Street")),
+    ('drawString', (5*inch, PAGE_HEIGHT - 3.7*inch, "Metuchen, NJ 08840 US")),
+
+    # Section labels for the per-order data
+    ('setFont', ("Helvetica-Bold", 12)),
+    ('drawString', (1*inch, PAGE_HEIGHT - 3.1*inch, "Vendor:")),
+    ('drawString', (1*inch, PAGE_HEIGHT - 4.3*inch, "Payment Terms:")),
+    ('drawString', (1*inch, PAGE_HEIGHT - 4.9*inch, "Line Items:")),
+)
+
+# Drawn relative to the header baseline so it can be placed at any height
+TABLE_HEADER_OPS = (
+    ('setFont', ("Helvetica-Bold", 10)),
+    ('drawString', (1*inch, 0, "Qty")),
+    ('drawString', (1.5*inch, 0, "Description")),
+    ('drawString', (5*inch, 0, "Rate")),
+    ('drawString', (6*inch, 0, "Amount")),
+    # Draw a line under the headers
+    ('line', (1*inch, -0.1*inch, 7*inch, -0.1*inch)),
+)
+
+# Stamps drawn for each approval_stamp choice
+APPROVAL_STAMPS = {
+    'original': ('original',),
+    'cit': ('cit',),
+    'both': ('original', 'cit'),
+    'none': (),
+}
+
+
+_binary_streams_lock = threading.Lock()
+_binary_streams_users = 0
+_saved_use_a85 = None
+
+
+@contextmanager
+def _binary_streams():
+    """
+    Write PDF streams as binary instead of ASCII85 while rendering.
+
+    Binary streams are smaller and skip ReportLab's pure Python encoder,
+    which dominated render time for images. ReportLab has no per-canvas
+    setting for this: it reads the process-wide ``rl_config.useA85`` while
+    drawing images and again when saving, so the switch is turned off
+    while any purchase order is being rendered and restored after the
+    last one. Documents that other code writes in the meantime, on any
+    thread, get binary streams too; those are as valid as ASCII85 ones and
+    only differ in encoding.
+    """
+    global _binary_streams_users, _saved_use_a85
+    with _binary_streams_lock:
+        if not _binary_streams_users:
+            _saved_use_a85 = rl_config.useA85
+            rl_config.useA85 = 0
+        _binary_streams_users += 1
+    try:
+        yield
+    finally:
+        with _binary_streams_lock:
+            _binary_streams_users -= 1
+            if not _binary_streams_users:
+                rl_config.useA85 = _saved_use_a85
+
+
+def _replay(p, ops):
+    for method, args in ops:
+        getattr(p, method)(*args)
+
+
+def _wrap(text, width):
+    """Split text into fixed-width chunks (at least one, even when empty)"""
+    return [text[i:i+width] for i in range(0, len(text), width)] or ['']
+
+
+class PurchaseOrderLayout:
+    """
+    Flows a purchase order across as many letter pages as it needs.
+
+    Line items are drawn row by row from any iterable, starting a new page
+    (with the table header repeated) whenever the next row doesn't fit.
+    The totals, notes and signature block are kept together on the last
+    page, unless the notes alone are too long for a page and have to break.
+    """
+
+    def __init__(self, p, purchase_order):
+        self.p = p
+        self.purchase_order = purchase_order
+        self.page_number = 1
+        self.y = PAGE_HEIGHT
+        self.in_table = False
+        self._forms = set()
+
+    def render(self, line_items):
+        self.draw_first_page_header()
+        self.y = PAGE_HEIGHT - 5.2*inch
+
+        total_amount = 0
+        self.in_table = True
+        self.draw_table_header()
+        for item in line_items:
+            self.draw_line_item(item)
+            total_amount += item.amount
+        self.in_table = False
+
+        # Make room for the whole closing block at once, so the totals can't
+        # stay behind on a page the notes and signature don't fit on
+        notes = _wrap(self.purchase_order.notes, NOTES_CHARS_PER_LINE) if self.purchase_order.notes else []
+        height = self.closing_height(notes)
+        fits = height <= CONTINUATION_TOP - BOTTOM_MARGIN
+        self.ensure_space(height if fits else TOTALS_HEIGHT + NOTES_GAP + ROW_HEIGHT)
+        self.draw_totals(total_amount)
+        if notes:
+            self.draw_notes(notes, split=not fits)
+        if not fits:
+            self.ensure_space(SIGNATURE_BLOCK_HEIGHT)
+        self.draw_signature_block()
+        self.finish_page()
+
+    def closing_height(self, notes):
+        """Height of the totals, the given lines of notes and the signature block"""
+        height = TOTALS_HEIGHT + SIGNATURE_BLOCK_HEIGHT
+        if notes:
+            height += NOTES_GAP + len(notes) * ROW_HEIGHT
+        return height
+
+    def ensure_space(self, needed):
+        """Start a new page unless ``needed`` points fit above the bottom margin"""
+        # Positions are sums of fractions of an inch, so an exact fit can be
+        # off by float rounding; compare to a hundredth of a point
+        if round(self.y - needed - BOTTOM_MARGIN, 2) < 0:
+            self.finish_page()
+            self.p.showPage()
+            self.page_number += 1
+            self.draw_continuation_header()
+            if self.in_table:
+                self.draw_table_header()
+            self.p.setFont("Helvetica", 10)
+
+    def finish_page(self):
+        self.p.setFont("Helvetica", 8)
+        self.p.drawCentredString(PAGE_WIDTH / 2, 0.5*inch, f"Page {self.page_number}")
+
+    def use_form(self, name, draw, lowery=0, uppery=PAGE_HEIGHT, y=0):
+        """
+        Draw a layer repeated on several pages, defining it as a form XObject
+        the first time.
+
+        Later uses in the same document only add a reference to the form,
+        so repeated content is stored in the PDF once. A PDF can't refer to
+        another document's objects, so each document defines its own; a
+        layer drawn once per document is cheaper drawn directly.
+        """
+        p = self.p
+        if name not in self._forms:
+            p.beginForm(name, lowery=lowery, uppery=uppery)
+            draw()
+            p.endForm()
+            self._forms.add(name)
+
+        if y:
+            p.saveState()
+            p.translate(0, y)
+            p.doForm(name)
+            p.restoreState()
+        else:
+            p.doForm(name)
+
+    def draw_letterhead(self):
+        # Add company logo in the top left, keeping its aspect ratio
+        logo = registry.static_image(LOGO_PATH, mode='RGB')
+        if logo is not None:
+            img_width, img_height = logo.getSize()
+            target_height = 1*inch
+            target_width = target_height * img_width / img_height
+            self.p.drawImage(logo, 0.3*inch, PAGE_HEIGHT - 1*inch, width=target_width*0.7, height=target_height*0.7)
+        _replay(self.p, LETTERHEAD_OPS)
+
+    def draw_first_page_header(self):
+        p = self.p
+        purchase_order = self.purchase_order
+        width, height = PAGE_WIDTH, PAGE_HEIGHT
+
+        # Logo, title, company and ship-to blocks and section labels
+        self.draw_letterhead()
+
+        # Add PO number on a separate line below the title
+        p.setFont("Helvetica-Bold", 14)
+        p.drawString(width - 2.3*inch, height - 0.8*inch, f"PO #{purchase_order.po_number}")
+
+        # Add date in the top right corner below the PO number
+        p.setFont("Helvetica", 12)
+        date_text = f"Date: {purchase_order.date.strftime('%B %d, %Y')}"
+        p.drawString(width - 2.3*inch, height - 1.1*inch, date_text)
+
+        # Add vendor information
+        vendor = purchase_order.vendor
+        p.setFont("Helvetica", 10)
+        p.drawString(1*inch, height - 3.3*inch, vendor.name)
+        p.drawString(1*inch, height - 3.5*inch, vendor.address)
+        p.drawString(1*inch, height - 3.7*inch, f"{vendor.city}, {vendor.state} {vendor.zip_code}")
+        p.drawString(1*inch, height - 3.9*inch, vendor.country)
+
+        # Add payment terms
+        payment_terms = f"Net {purchase_order.payment_days} days"
+        if purchase_order.payment_terms:
+            payment_terms += f" - {purchase_order.payment_terms}"
+        p.drawString(1*inch, height - 4.5*inch, payment_terms)
+
+    def draw_continuation_header(self):
+        """Identify the order at the top of every page after the first"""
+        self.use_form('continuation-header', self._draw_continuation_title, lowery=PAGE_HEIGHT - 1*inch)
+        self.y = CONTINUATION_TOP
+
+    def _draw_continuation_title(self):
+        p = self.p
+        p.setFont("Helvetica-Bold", 12)
+        p.drawString(1*inch, PAGE_HEIGHT - 0.7*inch, f"PURCHASE ORDER PO #{self.purchase_order.po_number} (continued)")
+
+    def draw_table_header(self):
+        self.use_form('table-header', lambda: _replay(self.p, TABLE_HEADER_OPS),
+                      lowery=-0.2*inch, uppery=0.2*inch, y=self.y)
+        self.y -= 0.4*inch
+        self.p.setFont("Helvetica", 10)
+
+    def draw_line_item(self, item):
+        description_lines = _wrap(item.description, DESCRIPTION_CHARS_PER_LINE)
+
+        # Keep short items together; very long descriptions may split
+        self.ensure_space(min(len(description_lines), 5) * ROW_HEIGHT)
+        p = self.p
+        p.drawString(1*inch, self.y, str(item.quantity))
+        p.drawString(5*inch, self.y, f"${item.rate:.2f}")
+        p.drawString(6*inch, self.y, f"${item.amount:.2f}")
+
+        for i, line in enumerate(description_lines):
+            if i:
+                self.y -= ROW_HEIGHT
+                self.ensure_space(ROW_HEIGHT)
+            p.drawString(1.5*inch, self.y, line)
+
+        # Leave a blank row between items
+        self.y -= 2 * ROW_HEIGHT
+
+    def draw_totals(self, total_amount):
+        p = self.p
+
+        # Draw a line above the total
+        p.line(1*inch, self.y + 0.1*inch, 7*inch, self.y + 0.1*inch)
+
+        p.saveState()
+        p.setFont("Helvetica-Bold", 12)
+        p.drawString(5*inch, self.y - 0.2*inch, "Total:")
+        p.drawString(6*inch, self.y - 0.2*inch, f"${total_amount:.2f}")
+        p.restoreState()
+        self.y -= TOTALS_HEIGHT
+
+    def draw_notes(self, lines, split=False):
+        """Draw the notes, breaking them across pages only when ``split``"""
+        p = self.p
+        self.y -= NOTES_GAP
+        p.setFont("Helvetica-Bold", 12)
+        p.drawString(1*inch, self.y, "Notes:")
+        p.setFont("Helvetica", 10)
+
+        for line in lines:
+            self.y -= ROW_HEIGHT
+            if split:
+                self.ensure_space(ROW_HEIGHT)
+            p.drawString(1*inch, self.y, line)
+
+    def draw_signature_block(self):
+        p = self.p
+        purchase_order = self.purchase_order
+        top = self.y - SIGNATURE_GAP
+
+        # Add "Generated by" first
+        p.setFont("Helvetica", 10)
+        p.drawString(1*inch, top, f"Generated by: {purchase_order.user.get_full_name()}")
+
+        # Add "Authorized Signature" line below
+        p.line(1*inch, top - 0.4*inch, 3*inch, top - 0.4*inch)
+        p.drawString(1*inch, top - 0.6*inch, "Authorized Signature")
+
+        if purchase_order.signature:
+            # Fit the signature into a box directly below the caption
+            signature = registry.signature_image(purchase_order.signature.path)
+            p.drawImage(signature, 1*inch, top - 1.7*inch, width=2*inch, height=1*inch,
+                        preserveAspectRatio=True, anchor='nw')
+
+        # Stamps sit to the right of the signature section, overlapping slightly
+        stamp_x_position = 5.2*inch
+        stamps = APPROVAL_STAMPS.get(purchase_order.approval_stamp, ())
+        if 'original' in stamps:
+            self.draw_stamp(ORIGINAL_STAMP_PATH, "Original", stamp_x_position, top - 0.45*inch, alpha=0.95)
+        if 'cit' in stamps:
+            self.draw_stamp(CIT_STAMP_PATH, "CIT", stamp_x_position, top - 1.2*inch, alpha=0.8)
+
+        self.y = top - 1.7*inch
+
+    def draw_stamp(self, path, label, x, y, alpha, width=1.8*inch):
+        stamp = registry.static_image(path)
+        if stamp is None:
+            logger.warning("%s stamp not found", label, extra={'fields': {'path': path}})
+            return
+        img_width, img_height = stamp.getSize()
+        p = self.p
+        p.saveState()
+        p.setFillAlpha(alpha)
+        p.setStrokeAlpha(alpha)
+        p.drawImage(stamp, x, y, width=width, height=width * img_height / img_width)
+        p.restoreState()
+
+
+def render_purchase_order_pdf(purchase_order, line_items):
+    """
+    Render a purchase order to PDF and return the document bytes.
+
+    ``line_items`` may be any iterable of the order's line items; it is
+    consumed once, in order.
+    """
+    buffer = BytesIO()
+    with _binary_streams():
+        p = canvas.Canvas(buffer, pagesize=letter, pageCompression=1)
+        p.setTitle(f"Purchase Order - {purchase_order.po_number}")
+
+        PurchaseOrderLayout(p, purchase_order).render(line_items)
+
+        p.showPage()
+        p.save()
+    return buffer.getvalue()
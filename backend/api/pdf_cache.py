@@ -0,0 +1,211 @@
+import hashlib
+import os
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+from .assets import STATIC_ASSET_PATHS
+from .metrics import track_pdf_render
+from .pdf import PDF_LAYOUT_VERSION, render_purchase_order_pdf
+
+
+def _file_identity(path):
+    """Return a cheap identity string for a file (path, size and mtime)"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return f"{path}:missing"
+    return f"{path}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def purchase_order_fingerprint(purchase_order, line_items):
+    """
+    Build a content fingerprint for the PDF of a purchase order.
+
+    The fingerprint covers everything the renderer reads: the order itself,
+    its vendor, its line items, the signature file and the static assets.
+    Two renders with the same fingerprint produce the same document.
+    """
+    vendor = purchase_order.vendor
+    parts = [
+        f"layout:{PDF_LAYOUT_VERSION}",
+        f"po:{purchase_order.pk}:{purchase_order.po_number}:{purchase_order.date}",
+        f"terms:{purchase_order.payment_days}:{purchase_order.payment_terms}",
+        f"notes:{purchase_order.notes}",
+        f"stamp:{purchase_order.approval_stamp}",
+        f"user:{purchase_order.user.get_full_name()}",
+        f"vendor:{vendor.pk}:{vendor.name}:{vendor.address}:{vendor.city}:"
+        f"{vendor.state}:{vendor.zip_code}:{vendor.country}",
+    ]
+    for item in line_items:
+        parts.append(f"item:{item.pk}:{item.quantity}:{item.rate}:{item.description}")
+    if purchase_order.signature:
+        parts.append(f"signature:{_file_identity(purchase_order.signature.path)}")
+    for path in STATIC_ASSET_PATHS:
+        parts.append(f"asset:{_file_identity(path)}")
+
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def purchase_order_last_modified(purchase_order, line_items):
+    """Return the latest modification time of anything shown on the PDF"""
+    timestamps = [purchase_order.updated_at, purchase_order.vendor.updated_at]
+    timestamps.extend(item.updated_at for item in line_items)
+    return max(timestamps)
+
+
+class BasePDFCache(ABC):
+    """Interface for rendered PDF storage backends"""
+
+    @abstractmethod
+    def get(self, key):
+        """Return the cached PDF bytes for ``key``, or None on a miss"""
+
+    @abstractmethod
+    def set(self, key, data):
+        """Store the PDF bytes for ``key``"""
+
+
+class FileSystemPDFCache(BasePDFCache):
+    """
+    Store rendered PDFs on disk, one file per fingerprint.
+
+    A hit refreshes the file's mtime, so evicting the oldest mtimes first
+    once the directory grows past ``max_size`` bytes gives LRU behaviour.
+    The size of the directory is tracked as files are written and only
+    rescanned once it passes ``max_size``; eviction then goes down to
+    ``low_water`` of it, so the scan isn't repeated on the next write.
+    """
+
+    def __init__(self, location, max_size, low_water=0.9):
+        self.location = location
+        self.max_size = max_size
+        self.low_water = low_water
+        # Other processes write to the same directory, so this is an
+        # estimate that each scan corrects
+        self._size = None
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.location, f"{key}.pdf")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return data
+
+    def set(self, key, data):
+        os.makedirs(self.location, exist_ok=True)
+        path = self._path(key)
+        try:
+            replaced_size = os.stat(path).st_size
+        except OSError:
+            replaced_size = 0
+        # Write to a temporary file first so readers never see partial PDFs
+        fd, temp_path = tempfile.mkstemp(dir=self.location, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            return
+
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan()[1]
+            else:
+                self._size += len(data) - replaced_size
+            over_size = self._size > self.max_size
+        if over_size:
+            self.evict()
+
+    def _scan(self):
+        """Return the cached files as (mtime, size, path) and their total size"""
+        entries = []
+        total_size = 0
+        with os.scandir(self.location) as it:
+            for entry in it:
+                if not entry.name.endswith('.pdf'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total_size += stat.st_size
+        return entries, total_size
+
+    def evict(self):
+        """Remove least recently used entries until the cache is below ``low_water``"""
+        with self._lock:
+            entries, total_size = self._scan()
+            if total_size > self.max_size:
+                target_size = self.max_size * self.low_water
+                entries.sort()
+                for _, size, path in entries:
+                    try:
+                        os.unlink(path)
+                    except OSError:
+                        continue
+                    total_size -= size
+                    if total_size <= target_size:
+                        break
+            self._size = total_size
+
+
+class DjangoCachePDFCache(BasePDFCache):
+    """Store rendered PDFs in one of the configured Django cache aliases"""
+
+    def __init__(self, location='default', timeout=None, **kwargs):
+        self.cache = caches[location]
+        self.timeout = timeout
+
+    def get(self, key):
+        return self.cache.get(f"po-pdf:{key}")
+
+    def set(self, key, data):
+        self.cache.set(f"po-pdf:{key}", data, self.timeout)
+
+
+_pdf_cache = None
+
+
+def get_pdf_cache():
+    """Return the process-wide PDF cache configured in ``settings.PDF_CACHE``"""
+    global _pdf_cache
+    if _pdf_cache is None:
+        options = dict(settings.PDF_CACHE)
+        backend = import_string(options.pop('BACKEND'))
+        _pdf_cache = backend(**{key.lower(): value for key, value in options.items()})
+    return _pdf_cache
+
+
+def get_purchase_order_pdf(purchase_order, line_items, fingerprint=None):
+    """
+    Return the PDF bytes for a purchase order, rendering only on a cache miss.
+    """
+    if fingerprint is None:
+        fingerprint = purchase_order_fingerprint(purchase_order, line_items)
+    cache = get_pdf_cache()
+    data = cache.get(fingerprint)
+    if data is None:
+        with track_pdf_render():
+            data = render_purchase_order_pdf(purchase_order, line_items)
+        cache.set(fingerprint, data)
+    return data
@@ -0,0 +1,143 @@
+import multiprocessing
+import threading
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+import django
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _init_worker():
+    """Configure Django in a freshly spawned render process"""
+    django.setup()
+
+
+def _render_in_worker(purchase_order_id):
+    """Render one purchase order inside a pool process"""
+    from .models import PurchaseOrder
+    from .pdf_cache import get_purchase_order_pdf
+
+    purchase_order = PurchaseOrder.objects.select_related('vendor', 'user').get(pk=purchase_order_id)
+    line_items = list(purchase_order.line_items.all())
+    return f"PO_{purchase_order.po_number}.pdf", get_purchase_order_pdf(purchase_order, line_items)
+
+
+def get_export_pool():
+    """
+    Return the shared process pool used for bulk PDF rendering.
+
+    Workers are spawned rather than forked so they never share the parent's
+    database connections, and they are kept alive between exports because
+    starting Django in a new process is far more expensive than a render.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.PDF_EXPORT_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+            )
+        return _pool
+
+
+def _discard_pool(pool):
+    """Drop a broken pool so the next export starts a fresh one"""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+class _ZipStream:
+    """Unseekable file object that buffers ZIP output until it is drained"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_purchase_orders_zip(purchase_order_ids, concurrency):
+    """
+    Yield a ZIP archive of purchase order PDFs chunk by chunk.
+
+    At most ``concurrency`` renders are in flight at once and every entry is
+    written out as soon as its render finishes, so memory stays bounded by
+    the concurrency rather than by the number of orders.
+    """
+    pool = get_export_pool()
+    stream = _ZipStream()
+    remaining = iter(purchase_order_ids)
+    pending = {}
+    errors = []
+
+    try:
+        with zipfile.ZipFile(stream, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            while True:
+                while len(pending) < concurrency:
+                    purchase_order_id = next(remaining, None)
+                    if purchase_order_id is None:
+                        break
+                    future = pool.submit(_render_in_worker, purchase_order_id)
+                    pending[future] = purchase_order_id
+                if not pending:
+                    break
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    purchase_order_id = pending.pop(future)
+                    try:
+                        filename, data = future.result()
+                    except BrokenProcessPool:
+                        _discard_pool(pool)
+                        raise
+                    except Exception as e:
+                        errors.append(f"Purchase order {purchase_order_id}: {e}")
+                        continue
+                    archive.writestr(filename, data)
+                    yield stream.drain()
+
+            if errors:
+                archive.writestr('errors.txt', '\n'.join(errors) + '\n')
+        yield stream.drain()
+    finally:
+        # The client may disconnect mid-stream; don't keep rendering for it
+        for future in pending:
+            future.cancel()
+
+
+async def astream_purchase_orders_zip(purchase_order_ids, concurrency):
+    """
+    Async version of ``stream_purchase_orders_zip`` for ASGI servers.
+
+    Django reads a sync iterator under ASGI into a list before sending
+    any of it, so ASGI responses get this instead. Each chunk is produced
+    on a worker thread, since waiting for renders blocks.
+    """
+    chunks = stream_purchase_orders_zip(purchase_order_ids, concurrency)
+    next_chunk = sync_to_async(next, thread_sensitive=False)
+    try:
+        while True:
+            chunk = await next_chunk(chunks, None)
+            if chunk is None:
+                return
+            yield chunk
+    finally:
+        # Runs the generator's cleanup, which cancels pending renders
+        await sync_to_async(chunks.close, thread_sensitive=False)()
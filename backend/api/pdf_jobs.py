@@ -0,0 +1,150 @@
+import logging
+from datetime import timedelta
+from django.core.files.base import ContentFile
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from .models import PDFRenderJob, PurchaseOrder
+from .pdf_cache import get_purchase_order_pdf, purchase_order_fingerprint
+
+logger = logging.getLogger(__name__)
+
+# Running jobs older than this are assumed to belong to a dead worker
+STALE_JOB_AGE = timedelta(minutes=10)
+
+# Finished jobs stay this long after a newer render of the same order
+# replaced them, so clients still polling or downloading them aren't cut off
+SUPERSEDED_JOB_RETENTION = timedelta(hours=1)
+
+
+def enqueue_pdf_render(purchase_order):
+    """
+    Queue a background render for a purchase order.
+
+    An order only ever has one pending job, which a unique constraint
+    enforces; asking again returns it.
+    """
+    while True:
+        job = PDFRenderJob.objects.filter(
+            purchase_order=purchase_order, status=PDFRenderJob.STATUS_PENDING
+        ).first()
+        if job is not None:
+            return job
+        try:
+            with transaction.atomic():
+                return PDFRenderJob.objects.create(purchase_order=purchase_order)
+        except IntegrityError:
+            # Another request queued one in the meantime; go and fetch it,
+            # unless a worker has claimed it already
+            continue
+
+
+def enqueue_pdf_render_on_commit(purchase_order):
+    """Queue a render once the current transaction has committed"""
+    transaction.on_commit(lambda: enqueue_pdf_render(purchase_order))
+
+
+def claim_pdf_jobs(limit):
+    """Mark up to ``limit`` pending jobs as running and return them"""
+    with transaction.atomic():
+        jobs = list(
+            PDFRenderJob.objects.select_for_update(skip_locked=True)
+            .filter(status=PDFRenderJob.STATUS_PENDING)
+            .order_by('created_at')[:limit]
+        )
+        if jobs:
+            PDFRenderJob.objects.filter(pk__in=[job.pk for job in jobs]).update(
+                status=PDFRenderJob.STATUS_RUNNING, started_at=timezone.now()
+            )
+    return jobs
+
+
+def requeue_stale_pdf_jobs(max_age):
+    """
+    Put back jobs left running by a worker that died, returning the count.
+
+    An order can only have one pending job, so stale jobs of orders that
+    already have one, and all but the newest stale job of an order, are
+    marked as failed instead.
+    """
+    cutoff = timezone.now() - max_age
+    with transaction.atomic():
+        stale_jobs = list(
+            PDFRenderJob.objects.select_for_update()
+            .filter(status=PDFRenderJob.STATUS_RUNNING, started_at__lt=cutoff)
+            .order_by('-created_at')
+            .values_list('pk', 'purchase_order_id')
+        )
+        queued_orders = set(
+            PDFRenderJob.objects.filter(
+                status=PDFRenderJob.STATUS_PENDING,
+                purchase_order_id__in={purchase_order_id for _, purchase_order_id in stale_jobs}
+            ).values_list('purchase_order_id', flat=True)
+        )
+        requeue, superseded = [], []
+        for pk, purchase_order_id in stale_jobs:
+            if purchase_order_id in queued_orders:
+                superseded.append(pk)
+            else:
+                queued_orders.add(purchase_order_id)
+                requeue.append(pk)
+
+        PDFRenderJob.objects.filter(pk__in=superseded).update(
+            status=PDFRenderJob.STATUS_FAILED, finished_at=timezone.now(),
+            error='Worker stopped; superseded by a newer render.'
+        )
+        return PDFRenderJob.objects.filter(pk__in=requeue).update(
+            status=PDFRenderJob.STATUS_PENDING, started_at=None
+        )
+
+
+def run_pdf_job(job_id):
+    """Render one claimed job and store the PDF under MEDIA_ROOT"""
+    try:
+        job = PDFRenderJob.objects.get(pk=job_id)
+        try:
+            purchase_order = PurchaseOrder.objects.select_related('vendor', 'user').get(
+                pk=job.purchase_order_id
+            )
+            line_items = list(purchase_order.line_items.all())
+            fingerprint = purchase_order_fingerprint(purchase_order, line_items)
+            data = get_purchase_order_pdf(purchase_order, line_items, fingerprint=fingerprint)
+
+            job.fingerprint = fingerprint
+            job.pdf.save(f"PO_{purchase_order.po_number}_{fingerprint[:12]}.pdf", ContentFile(data), save=False)
+            job.status = PDFRenderJob.STATUS_DONE
+        except Exception as e:
+            logger.exception("PDF render job failed", extra={'fields': {
+                'job_id': job.pk, 'purchase_order_id': job.purchase_order_id
+            }})
+            job.status = PDFRenderJob.STATUS_FAILED
+            job.error = str(e)
+        job.finished_at = timezone.now()
+        job.save()
+        return job
+    finally:
+        # Worker threads each hold their own connection; don't leak them
+        close_old_connections()
+
+
+def delete_superseded_pdf_jobs(retention):
+    """
+    Remove finished jobs replaced by a newer render at least ``retention``
+    ago, with their PDFs, returning how many were removed.
+    """
+    cutoff = timezone.now() - retention
+    newer_render = PDFRenderJob.objects.filter(
+        purchase_order_id=OuterRef('purchase_order_id'),
+        status=PDFRenderJob.STATUS_DONE,
+        created_at__gt=OuterRef('created_at'),
+        finished_at__lt=cutoff,
+    )
+    superseded = list(
+        PDFRenderJob.objects.filter(status__in=[PDFRenderJob.STATUS_DONE, PDFRenderJob.STATUS_FAILED])
+        .filter(Exists(newer_render))
+    )
+    for job in superseded:
+        if job.pdf:
+            job.pdf.delete(save=False)
+        job.delete()
+    return len(superseded)
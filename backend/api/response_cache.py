@@ -0,0 +1,117 @@
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+from . import db_router, metrics
+
+CATALOG_CACHE_ALIAS = 'catalog'
+
+
+def _generation_key(name):
+    return f"response-cache:{name}:generation"
+
+
+def generation(name):
+    """
+    Return the current generation of ``name``, which changes on every write.
+
+    Kept in the shared default cache so a write in one server process
+    invalidates the local caches of all of them. A generation that was
+    evicted restarts at the current time rather than at a value that may
+    have been handed out before, since clients keep ETags built from it.
+    """
+    return cache.get_or_set(_generation_key(name), time.time, None)
+
+
+def purchase_orders_generation_name(user_id):
+    """Generation name for one user's purchase orders and their line item links"""
+    return f"purchase-orders:{user_id}"
+
+
+def invalidate(name):
+    """Drop every cached response of ``name`` once the current transaction commits"""
+    # The generation is the time of the write, which tells readers whether
+    # a replica may not have caught up with it yet
+    transaction.on_commit(lambda: cache.set(_generation_key(name), time.time(), None))
+
+
+class CacheHit(Exception):
+    """Raised to answer a request from the response cache before the view runs"""
+
+    def __init__(self, data):
+        self.data = data
+
+
+class CachedResponseMixin:
+    """
+    Serve list, retrieve and search responses from the ``catalog`` cache.
+
+    For tables that every user reads the same way. Entries are keyed by
+    the action, object, query string and host under a generation that
+    ``invalidate(response_cache_name)`` bumps on every write, so a hit
+    costs no queries at all. Each entry keeps its ETag, which lets
+    ``ConditionalRequestMixin`` answer ``If-None-Match`` from the cache
+    too; this mixin must come before it.
+    """
+    response_cache_name = None
+    cache_actions = ('list', 'retrieve', 'search')
+
+    def _response_cache_key(self):
+        request = self.request
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        target = self.kwargs.get(lookup_url_kwarg, self.action)
+        # The host is part of the key because paginated responses contain
+        # absolute links
+        variant = hashlib.sha256(
+            f"{request.get_host()}\0{request.query_params.urlencode()}".encode('utf-8')
+        ).hexdigest()
+        return f"{self.response_cache_name}:{self._cache_generation}:{target}:{variant}"
+
+    def get_etag(self):
+        if self.action not in self.cache_actions:
+            return super().get_etag()
+
+        self._cache_generation = generation(self.response_cache_name)
+        self._cached_entry = caches[CATALOG_CACHE_ALIAS].get(self._response_cache_key())
+        self._cache_miss = self._cached_entry is None
+        metrics.response_cache_requests.inc(
+            cache=self.response_cache_name, result='miss' if self._cache_miss else 'hit'
+        )
+        if self._cached_entry is not None:
+            return self._cached_entry['etag']
+        return super().get_etag()
+
+    def initial(self, request, *args, **kwargs):
+        self._cached_entry = None
+        self._cache_miss = False
+        super().initial(request, *args, **kwargs)
+        if self._cached_entry is not None:
+            raise CacheHit(self._cached_entry['data'])
+
+    def handle_exception(self, exc):
+        if isinstance(exc, CacheHit):
+            return Response(exc.data)
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if (
+            getattr(self, '_cache_miss', False)
+            and response.status_code == status.HTTP_200_OK
+            and self._may_cache()
+        ):
+            caches[CATALOG_CACHE_ALIAS].set(self._response_cache_key(), {
+                'etag': self.etag,
+                'data': response.data,
+            })
+        return response
+
+    def _may_cache(self):
+        # A replica may still be missing the write that started this
+        # generation; don't keep what it returned until it has caught up
+        if not db_router.reading_from_replica():
+            return True
+        return time.time() - self._cache_generation >= settings.REPLICA_PIN_SECONDS
@@ -0,0 +1,69 @@
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.functions import Length, Upper
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+DEFAULT_SEARCH_LIMIT = 10
+MAX_SEARCH_LIMIT = 50
+
+
+def search_queryset(queryset, field, term, limit):
+    """
+    Return up to ``limit`` rows whose ``field`` matches ``term``, best first.
+
+    Prefix matches rank above everything else. On PostgreSQL the remaining
+    rows are fuzzy trigram matches ranked by similarity, served by the
+    ``gin_trgm_ops`` index on ``UPPER(field)``. Other databases fall back to
+    a case-insensitive substring match ranked by length.
+    """
+    key = term.upper()
+    queryset = queryset.annotate(search_key=Upper(field)).annotate(
+        is_prefix=Case(
+            When(search_key__startswith=key, then=Value(1)),
+            default=Value(0),
+            output_field=IntegerField()
+        )
+    )
+
+    if connection.vendor == 'postgresql':
+        from django.contrib.postgres.search import TrigramSimilarity
+        queryset = (
+            queryset.filter(Q(search_key__startswith=key) | Q(search_key__trigram_similar=key))
+            .annotate(similarity=TrigramSimilarity('search_key', key))
+            .order_by('-is_prefix', '-similarity', field)
+        )
+    else:
+        queryset = (
+            queryset.filter(search_key__contains=key)
+            .order_by('-is_prefix', Length(field), field)
+        )
+    return queryset[:limit]
+
+
+class TypeaheadSearchMixin:
+    """
+    Adds a ``search`` list action to a viewset: ``?q=<text>&limit=<n>``.
+
+    Viewsets set ``search_field`` to the model field to match against.
+    """
+    search_field = None
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """
+        Return the best matches for a typeahead query
+        """
+        term = request.query_params.get('q', '').strip()
+        if not term:
+            return Response([])
+
+        try:
+            limit = int(request.query_params.get('limit', DEFAULT_SEARCH_LIMIT))
+        except ValueError:
+            limit = DEFAULT_SEARCH_LIMIT
+        limit = max(1, min(limit, MAX_SEARCH_LIMIT))
+
+        results = search_queryset(self.get_queryset(), self.search_field, term, limit)
+        serializer = self.get_serializer(results, many=True)
+        return Response(serializer.data)
@@ -1,20 +1,29 @@
+import logging
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import Vendor, SavedVendor, LineItem, SavedLineItem, PurchaseOrder
+from django.db import transaction
+from django.urls import reverse
+from .dynamic_fields import DynamicFieldsMixin
+from .line_items import get_or_create_line_items, line_item_content_hash
+from .models import Vendor, SavedVendor, LineItem, SavedLineItem, PurchaseOrder, PDFRenderJob
+from .pdf_jobs import enqueue_pdf_render_on_commit
+from .response_cache import invalidate as invalidate_cached_responses
+from .signatures import store_signature
 
-class UserSerializer(serializers.ModelSerializer):
+logger = logging.getLogger(__name__)
+
+class UserSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'email', 'first_name', 'last_name', 'date_joined', 'last_login']
         read_only_fields = ['id', 'username', 'date_joined', 'last_login']
 
-class VendorSerializer(serializers.ModelSerializer):
+class VendorSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Vendor
         fields = '__all__'
 
-class SavedVendorSerializer(serializers.ModelSerializer):
-    vendor = VendorSerializer(read_only=True)
+class SavedVendorSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     vendor_id = serializers.PrimaryKeyRelatedField(
         queryset=Vendor.objects.all(),
         write_only=True,
@@ -24,22 +33,65 @@ class SavedVendorSerializer(serializers.ModelSerializer):
     class Meta:
         model = SavedVendor
         fields = ['id', 'user', 'vendor', 'vendor_id', 'name', 'created_at']
-        read_only_fields = ['id', 'user', 'created_at']
+        read_only_fields = ['id', 'user', 'vendor', 'created_at']
+        expandable_fields = {'vendor': (VendorSerializer, {})}
     
     def create(self, validated_data):
         validated_data['user'] = self.context['request'].user
         return super().create(validated_data)
 
-class LineItemSerializer(serializers.ModelSerializer):
+class LineItemSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     amount = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
     
     class Meta:
         model = LineItem
         fields = ['id', 'quantity', 'description', 'rate', 'amount', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at']
+    
+    def validate(self, data):
+        """
+        Validate that an edit doesn't make the line item identical to another.
+        
+        Line items in use are copied on write instead, so that check only
+        applies to the ones edited in place.
+        """
+        if self.instance is not None and not self.instance.is_in_use():
+            fields = self._line_item_fields(data)
+            duplicate_id = (
+                LineItem.objects.filter(content_hash=line_item_content_hash(**fields))
+                .exclude(pk=self.instance.pk).values_list('pk', flat=True).first()
+            )
+            if duplicate_id:
+                raise serializers.ValidationError(f"An identical line item already exists (id {duplicate_id}).")
+        return data
+    
+    def create(self, validated_data):
+        # Identical line items are shared rather than stored again, and the
+        # view answers 200 instead of 201 when one already existed
+        line_item, self.created = LineItem.objects.get_or_create(
+            content_hash=line_item_content_hash(**validated_data), defaults=validated_data
+        )
+        return line_item
+    
+    def update(self, instance, validated_data):
+        """
+        Edit the line item in place, unless an order or template uses it.
+        
+        Orders and templates share line items, so one in use is left as it
+        is and the edit is saved as another line item, which is returned.
+        """
+        if not instance.is_in_use():
+            return super().update(instance, validated_data)
+        fields = self._line_item_fields(validated_data)
+        line_item, _ = LineItem.objects.get_or_create(
+            content_hash=line_item_content_hash(**fields), defaults=fields
+        )
+        return line_item
+    
+    def _line_item_fields(self, data):
+        return {name: data.get(name, getattr(self.instance, name)) for name in ('description', 'quantity', 'rate')}
 
-class SavedLineItemSerializer(serializers.ModelSerializer):
-    line_item = LineItemSerializer(read_only=True)
+class SavedLineItemSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     line_item_id = serializers.PrimaryKeyRelatedField(
         queryset=LineItem.objects.all(),
         write_only=True,
@@ -49,90 +101,210 @@ class SavedLineItemSerializer(serializers.ModelSerializer):
     class Meta:
         model = SavedLineItem
         fields = ['id', 'user', 'line_item', 'line_item_id', 'name', 'created_at']
-        read_only_fields = ['id', 'user', 'created_at']
+        read_only_fields = ['id', 'user', 'line_item', 'created_at']
+        expandable_fields = {'line_item': (LineItemSerializer, {})}
     
     def create(self, validated_data):
         validated_data['user'] = self.context['request'].user
         return super().create(validated_data)
 
-class PurchaseOrderSerializer(serializers.ModelSerializer):
-    vendor = VendorSerializer(read_only=True)
+class PurchaseOrderSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     vendor_id = serializers.PrimaryKeyRelatedField(
         queryset=Vendor.objects.all(),
         write_only=True,
         source='vendor'
     )
-    line_items = LineItemSerializer(many=True, read_only=True)
-    line_item_ids = serializers.PrimaryKeyRelatedField(
-        queryset=LineItem.objects.all(),
+    line_item_ids = serializers.ListField(
+        child=serializers.IntegerField(),
         write_only=True,
-        many=True,
-        source='line_items',
         required=False
     )
-    total_amount = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
-    user = UserSerializer(read_only=True)
+    new_line_items = LineItemSerializer(many=True, write_only=True, required=False)
+    total_amount = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
     
     class Meta:
         model = PurchaseOrder
         fields = [
             'id', 'po_number', 'user', 'vendor', 'vendor_id', 'date', 
             'payment_terms', 'payment_days', 'line_items', 'line_item_ids',
-            'notes', 'approval_stamp', 'signature', 'total_amount',
+            'new_line_items', 'notes', 'approval_stamp', 'signature', 'total_amount',
             'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'po_number', 'user', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'po_number', 'user', 'vendor', 'line_items', 'created_at', 'updated_at']
+        expandable_fields = {
+            'user': (UserSerializer, {}),
+            'vendor': (VendorSerializer, {}),
+            'line_items': (LineItemSerializer, {'many': True}),
+        }
+    
+    def validate_line_item_ids(self, value):
+        """
+        Validate that every line item exists, with a single query.
+        """
+        line_item_ids = list(dict.fromkeys(value))
+        self._line_item_hashes = dict(
+            LineItem.objects.filter(pk__in=line_item_ids).values_list('pk', 'content_hash')
+        )
+        missing_ids = [pk for pk in line_item_ids if pk not in self._line_item_hashes]
+        if missing_ids:
+            raise serializers.ValidationError(f"Invalid line item ids: {missing_ids}")
+        return line_item_ids
     
     def validate(self, data):
         """
-        Validate that at least one line item is provided.
+        Validate that at least one line item is provided, and no line twice.
         """
         # For updates, we need to check if line_items are in the data
-        if self.instance and 'line_items' not in data:
+        if self.instance and 'line_item_ids' not in data and 'new_line_items' not in data:
             # If not updating line items, use existing ones
             return data
             
         # For creates or if updating line items
-        line_items = data.get('line_items', [])
-        if not line_items:
+        if not data.get('line_item_ids') and not data.get('new_line_items'):
             raise serializers.ValidationError({"line_items": "At least one line item is required."})
+        
+        # Identical lines share one line item, which an order can only link
+        # once, so a new line must differ from the order's other lines
+        seen = {self._line_item_hashes[pk] for pk in data.get('line_item_ids', [])}
+        repeated = []
+        for number, item in enumerate(data.get('new_line_items', []), start=1):
+            content_hash = line_item_content_hash(item['description'], item['quantity'], item['rate'])
+            if content_hash in seen:
+                repeated.append(number)
+            seen.add(content_hash)
+        if repeated:
+            raise serializers.ValidationError({"new_line_items": (
+                f"New line items {repeated} repeat another line of the order; "
+                "list each line once with the total quantity."
+            )})
         return data
     
     def create(self, validated_data):
-        line_items = validated_data.pop('line_items', [])
+        line_item_ids = validated_data.pop('line_item_ids', [])
+        new_line_items = validated_data.pop('new_line_items', [])
         validated_data['user'] = self.context['request'].user
+        self._store_signature(validated_data)
         
-        # Print debug information
-        print(f"Creating purchase order with validated data: {validated_data}")
-        print(f"Line items: {line_items}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Creating purchase order", extra={'fields': {
+                'validated_data': validated_data, 'new_line_items': len(new_line_items)
+            }})
         
-        purchase_order = PurchaseOrder.objects.create(**validated_data)
+        with transaction.atomic():
+            purchase_order = PurchaseOrder.objects.create(**validated_data)
+            self._set_line_items(purchase_order, line_item_ids, new_line_items, clear_existing=False)
         
-        if line_items:
-            purchase_order.line_items.set(line_items)
-            print(f"Set line items: {purchase_order.line_items.all()}")
-        else:
-            print("No line items to set")
+        # Render the PDF in the background so it's ready before anyone asks
+        enqueue_pdf_render_on_commit(purchase_order)
         
         return purchase_order
     
     def update(self, instance, validated_data):
-        line_items = validated_data.pop('line_items', None)
+        line_item_ids = validated_data.pop('line_item_ids', None)
+        new_line_items = validated_data.pop('new_line_items', None)
+        self._store_signature(validated_data)
         
-        # Print debug information
-        print(f"Updating purchase order {instance.id} with validated data: {validated_data}")
-        if line_items is not None:
-            print(f"Updating line items: {line_items}")
-        else:
-            print("Not updating line items")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Updating purchase order", extra={'fields': {
+                'purchase_order_id': instance.id, 'validated_data': validated_data
+            }})
         
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
         
-        instance.save()
+        with transaction.atomic():
+            instance.save()
+            if line_item_ids is not None or new_line_items is not None:
+                self._set_line_items(instance, line_item_ids or [], new_line_items or [])
+        
+        enqueue_pdf_render_on_commit(instance)
         
-        if line_items is not None:
-            instance.line_items.set(line_items)
-            print(f"Updated line items: {instance.line_items.all()}")
+        return instance
+    
+    def _store_signature(self, validated_data):
+        """
+        Replace an uploaded signature with its normalized, shared copy.
         
-        return instance 
\ No newline at end of file
+        The model field is then just pointed at the stored file name.
+        """
+        signature = validated_data.get('signature')
+        if signature:
+            validated_data['signature'] = store_signature(signature)
+    
+    def _set_line_items(self, purchase_order, line_item_ids, new_line_items, clear_existing=True):
+        """
+        Link the order to exactly these line items using bulk inserts.
+        
+        New line items that already exist are reused and the rest are created
+        with one INSERT, and all links with another, so the cost doesn't grow
+        in queries with the number of lines.
+        """
+        new_line_item_ids, created = get_or_create_line_items(new_line_items)
+        line_item_ids = [*line_item_ids, *new_line_item_ids]
+        if created:
+            # bulk_create sends no post_save, so do what the signal handlers would
+            from .dashboard import invalidate_all_dashboards  # imports this module
+            invalidate_cached_responses('line-items')
+            invalidate_all_dashboards()
+        
+        through = PurchaseOrder.line_items.through
+        # bulk_create doesn't send m2m_changed, so totals are refreshed below
+        if clear_existing:
+            through.objects.filter(purchaseorder_id=purchase_order.pk).delete()
+        through.objects.bulk_create(
+            through(purchaseorder_id=purchase_order.pk, lineitem_id=line_item_id)
+            for line_item_id in line_item_ids
+        )
+        purchase_order.refresh_total()
+        # Drop any prefetched line items so the response reflects the new set
+        purchase_order._prefetched_objects_cache = {}
+
+class PurchaseOrderSummarySerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    """Compact read-only representation of a purchase order"""
+    vendor_name = serializers.CharField(source='vendor.name', read_only=True)
+    
+    class Meta:
+        model = PurchaseOrder
+        fields = ['id', 'po_number', 'date', 'vendor_id', 'vendor_name', 'total_amount', 'created_at']
+        read_only_fields = fields
+
+class PurchaseOrderListSerializer(PurchaseOrderSummarySerializer):
+    """Row of the purchase order list; the detail endpoint has everything else"""
+    
+    class Meta(PurchaseOrderSummarySerializer.Meta):
+        fields = PurchaseOrderSummarySerializer.Meta.fields + ['payment_terms', 'payment_days']
+        read_only_fields = fields
+
+class PDFRenderJobSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    download_url = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = PDFRenderJob
+        fields = [
+            'id', 'purchase_order', 'status', 'error', 'download_url',
+            'created_at', 'started_at', 'finished_at'
+        ]
+        read_only_fields = fields
+    
+    def get_download_url(self, obj):
+        if obj.status != PDFRenderJob.STATUS_DONE:
+            return None
+        url = reverse('pdf-job-download', kwargs={'pk': obj.pk})
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+class PurchaseOrderExportSerializer(serializers.Serializer):
+    """Selects the purchase orders to include in a bulk PDF export"""
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+    vendor_id = serializers.IntegerField(required=False)
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+    concurrency = serializers.IntegerField(required=False, min_value=1)
+    
+    def validate(self, data):
+        """
+        Validate that the export is limited by ids or at least one filter.
+        """
+        if not any(key in data for key in ('ids', 'vendor_id', 'date_from', 'date_to')):
+            raise serializers.ValidationError("Provide a list of ids or at least one filter.")
+        return data
@@ -0,0 +1,89 @@
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from . import metrics, response_cache
+from .dashboard import invalidate_all_dashboards, invalidate_dashboard
+from .models import LineItem, PurchaseOrder, Vendor
+
+
+@receiver(m2m_changed, sender=PurchaseOrder.line_items.through)
+def update_totals_on_line_items_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Keep PurchaseOrder.total_amount in sync when line items are linked or unlinked"""
+    if not reverse:
+        # instance is the purchase order whose line items changed
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            instance.refresh_total()
+            invalidate_dashboard(instance.user_id)
+            response_cache.invalidate(response_cache.purchase_orders_generation_name(instance.user_id))
+        return
+
+    # instance is a line item being linked to or unlinked from orders
+    if action == 'pre_clear':
+        instance._cleared_purchase_order_ids = list(instance.purchase_orders.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        purchase_orders = PurchaseOrder.objects.filter(
+            pk__in=pk_set if action != 'post_clear' else instance._cleared_purchase_order_ids
+        )
+        purchase_orders.refresh_totals()
+        invalidate_all_dashboards()
+        for user_id in purchase_orders.values_list('user_id', flat=True).distinct():
+            response_cache.invalidate(response_cache.purchase_orders_generation_name(user_id))
+
+
+@receiver(post_save, sender=LineItem)
+def update_totals_on_line_item_saved(sender, instance, created, **kwargs):
+    """A line item may be shared by several orders, so refresh all of them"""
+    if not created:
+        PurchaseOrder.objects.filter(line_items=instance).refresh_totals()
+
+
+@receiver(pre_delete, sender=LineItem)
+def remember_orders_of_deleted_line_item(sender, instance, **kwargs):
+    instance._deleted_from_purchase_order_ids = list(instance.purchase_orders.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=LineItem)
+def update_totals_on_line_item_deleted(sender, instance, **kwargs):
+    """Deleting a line item removes its order links without an m2m_changed signal"""
+    purchase_order_ids = getattr(instance, '_deleted_from_purchase_order_ids', None)
+    if purchase_order_ids:
+        PurchaseOrder.objects.filter(pk__in=purchase_order_ids).refresh_totals()
+
+
+@receiver(post_save, sender=PurchaseOrder)
+@receiver(post_delete, sender=PurchaseOrder)
+def invalidate_dashboard_on_purchase_order_change(sender, instance, **kwargs):
+    invalidate_dashboard(instance.user_id)
+
+
+@receiver(post_save, sender=PurchaseOrder)
+@receiver(post_delete, sender=PurchaseOrder)
+def invalidate_purchase_order_list_etags(sender, instance, **kwargs):
+    """The purchase order list's ETag is built from this generation"""
+    response_cache.invalidate(response_cache.purchase_orders_generation_name(instance.user_id))
+
+
+@receiver(post_save, sender=Vendor)
+@receiver(post_delete, sender=Vendor)
+@receiver(post_save, sender=LineItem)
+@receiver(post_delete, sender=LineItem)
+def invalidate_dashboards_on_catalog_change(sender, **kwargs):
+    """Vendors and line items are shared, so every user's dashboard is affected"""
+    invalidate_all_dashboards()
+
+
+@receiver(post_save, sender=Vendor)
+@receiver(post_delete, sender=Vendor)
+def invalidate_vendor_responses(sender, **kwargs):
+    response_cache.invalidate('vendors')
+
+
+@receiver(post_save, sender=LineItem)
+@receiver(post_delete, sender=LineItem)
+def invalidate_line_item_responses(sender, **kwargs):
+    response_cache.invalidate('line-items')
+
+
+@receiver(connection_created)
+def track_database_connection(sender, connection, **kwargs):
+    metrics.track_connection(connection)
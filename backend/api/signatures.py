@@ -0,0 +1,75 @@
+import hashlib
+import re
+from io import BytesIO
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+# The PDF prints signatures in a 2in x 1in box; 300 dpi is plenty for that
+SIGNATURE_MAX_SIZE = (600, 300)
+# Pixels lighter than this count as background when trimming
+SIGNATURE_INK_THRESHOLD = 245
+SIGNATURE_PADDING = 8
+SIGNATURE_DIR = 'signatures'
+
+STORED_SIGNATURE_NAME = re.compile(rf'^{SIGNATURE_DIR}/[0-9a-f]{{64}}\.png$')
+
+
+def normalize_signature(image_file):
+    """
+    Return compact PNG bytes for an uploaded signature image.
+
+    The image is flattened onto white, converted to grayscale, trimmed to
+    the inked area (plus a little padding) and shrunk to fit
+    ``SIGNATURE_MAX_SIZE``. The output is deterministic, so identical
+    signatures always produce identical bytes.
+    """
+    image_file.seek(0)
+    with Image.open(image_file) as img:
+        img = ImageOps.exif_transpose(img)
+        img = img.convert('RGBA')
+
+    background = Image.new('RGBA', img.size, 'white')
+    gray = Image.alpha_composite(background, img).convert('L')
+
+    ink = gray.point(lambda value: 255 if value < SIGNATURE_INK_THRESHOLD else 0)
+    bbox = ink.getbbox()
+    if bbox:
+        left, top, right, bottom = bbox
+        gray = gray.crop((
+            max(left - SIGNATURE_PADDING, 0),
+            max(top - SIGNATURE_PADDING, 0),
+            min(right + SIGNATURE_PADDING, gray.width),
+            min(bottom + SIGNATURE_PADDING, gray.height),
+        ))
+
+    gray.thumbnail(SIGNATURE_MAX_SIZE, Image.LANCZOS)
+    # Resampling leaves faint noise; snapping to white and 16 gray levels
+    # keeps the antialiasing but makes the image compress far better
+    gray = gray.point(lambda value: 255 if value >= SIGNATURE_INK_THRESHOLD else (value >> 4) * 17)
+
+    output = BytesIO()
+    gray.save(output, format='PNG', optimize=True)
+    return output.getvalue()
+
+
+def store_signature(image_file):
+    """
+    Normalize a signature and save it under its content hash.
+
+    Returns the storage name. Identical signatures share one file, so an
+    existing file is reused rather than written again.
+    """
+    data = normalize_signature(image_file)
+    name = f"{SIGNATURE_DIR}/{hashlib.sha256(data).hexdigest()}.png"
+    if not default_storage.exists(name):
+        saved_name = default_storage.save(name, ContentFile(data))
+        if saved_name != name:
+            # Another upload stored the same signature in the meantime
+            default_storage.delete(saved_name)
+    return name
+
+
+def is_stored_signature(name):
+    """Whether a file name already points at a normalized, hashed signature"""
+    return bool(STORED_SIGNATURE_NAME.match(name or ''))
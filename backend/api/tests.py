@@ -0,0 +1,924 @@
+import os
+import re
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import date, timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from types import SimpleNamespace
+from unittest import mock, skipIf
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.test import AsyncClient, RequestFactory, TestCase, TransactionTestCase, override_settings
+from PIL import Image
+from reportlab import rl_config
+from reportlab.pdfgen import canvas as reportlab_canvas
+from rest_framework.test import APIClient
+from . import metrics, pdf, pdf_cache, response_cache
+from .assets import LOGO_PATH, registry
+from .pdf_jobs import delete_superseded_pdf_jobs, enqueue_pdf_render, run_pdf_job
+from .db_router import PrimaryReplicaRouter
+from .importers import LineItemImporter
+from .middleware import ReplicaRoutingMiddleware
+from .pdf_export import stream_purchase_orders_zip
+from .signatures import SIGNATURE_MAX_SIZE, is_stored_signature, normalize_signature
+from .models import LineItem, PDFRenderJob, PurchaseOrder, SavedLineItem, Vendor
+
+# Keep the caches out of the shared cache directories while testing
+TEST_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'test-default'},
+    'catalog': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'test-catalog'},
+}
+
+
+@override_settings(CACHES=TEST_CACHES, PERFORMANCE_METRICS_ENABLED=False)
+class APITestCase(TestCase):
+    """Base class for API tests with an authenticated client, a vendor and empty caches"""
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root.name))
+        self.user = User.objects.create_user('buyer', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.vendor = Vendor.objects.create(
+            name='Acme', address='1 Main St', city='Springfield', state='IL', zip_code='62701', country='USA'
+        )
+
+    def create_purchase_order(self, line_count=2):
+        purchase_order = PurchaseOrder.objects.create(user=self.user, vendor=self.vendor)
+        line_items = [
+            LineItem.objects.create(description=f'Item {purchase_order.pk}-{n}', quantity=Decimal(n + 1), rate=Decimal('2.50'))
+            for n in range(line_count)
+        ]
+        purchase_order.line_items.set(line_items)
+        return purchase_order
+
+
+class PurchaseOrderQueryCountTests(APITestCase):
+    """
+    Reading purchase orders costs a fixed number of queries, however many
+    orders are on the page or line items are on an order.
+    """
+    # Authentication is forced, so the list only fetches its rows (its ETag
+    # comes from cached generations), the detail runs the ETag aggregate,
+    # the order and the line item prefetch, and the PDF view loads the
+    # order with its vendor and user, then its line items
+    LIST_QUERIES = 1
+    DETAIL_QUERIES = 3
+    PDF_QUERIES = 2
+
+    def test_list(self):
+        for page_size in (2, 20):
+            PurchaseOrder.objects.all().delete()
+            for _ in range(page_size):
+                self.create_purchase_order()
+            with self.assertNumQueries(self.LIST_QUERIES):
+                response = self.client.get('/api/purchase-orders/', {'page_size': page_size})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.json()['results']), page_size)
+
+    def test_detail(self):
+        for line_count in (1, 20):
+            purchase_order = self.create_purchase_order(line_count)
+            with self.assertNumQueries(self.DETAIL_QUERIES):
+                response = self.client.get(f'/api/purchase-orders/{purchase_order.pk}/', {'expand': 'line_items,vendor'})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.json()['line_items']), line_count)
+
+    def test_pdf(self):
+        with tempfile.TemporaryDirectory() as location, override_settings(PDF_CACHE={
+            'BACKEND': 'api.pdf_cache.FileSystemPDFCache', 'LOCATION': location, 'MAX_SIZE': 1024 * 1024
+        }):
+            pdf_cache._pdf_cache = None
+            try:
+                for line_count in (1, 20):
+                    purchase_order = self.create_purchase_order(line_count)
+                    with self.assertNumQueries(self.PDF_QUERIES):
+                        response = self.client.get(f'/api/purchase-orders/{purchase_order.pk}/pdf/')
+                    self.assertEqual(response.status_code, 200)
+                    self.assertEqual(response['Content-Type'], 'application/pdf')
+            finally:
+                pdf_cache._pdf_cache = None
+
+
+def _signature_upload():
+    image = Image.new('L', (120, 40), 'white')
+    image.paste(0, (10, 15, 110, 25))
+    output = BytesIO()
+    image.save(output, format='PNG')
+    return SimpleUploadedFile('signature.png', output.getvalue(), content_type='image/png')
+
+
+class SignatureTests(APITestCase):
+    def test_signature_is_trimmed_flattened_and_downscaled(self):
+        image = Image.new('RGBA', (3000, 2000), (0, 0, 0, 0))
+        image.paste((0, 0, 255, 255), (500, 800, 2500, 1200))
+        upload = BytesIO()
+        image.save(upload, format='PNG')
+        data = normalize_signature(upload)
+        with Image.open(BytesIO(data)) as normalized:
+            self.assertEqual(normalized.mode, 'L')
+            # The 2000x400 stroke and its padding, shrunk to fit 600x300
+            self.assertEqual(normalized.width, SIGNATURE_MAX_SIZE[0])
+            self.assertLess(normalized.height, 130)
+            self.assertEqual(normalized.getpixel((0, 0)), 255)
+        self.assertEqual(normalize_signature(upload), data)
+
+    def test_identical_signatures_share_one_file(self):
+        names = []
+        for upload_name in ('first.png', 'second.png'):
+            upload = _signature_upload()
+            upload.name = upload_name
+            response = self.client.post('/api/purchase-orders/', {
+                'vendor_id': self.vendor.pk,
+                'new_line_items': '[{"description": "Bolts", "quantity": "2", "rate": "1.50"}]',
+                'signature': upload,
+            }, format='multipart')
+            self.assertEqual(response.status_code, 201, response.content)
+            names.append(PurchaseOrder.objects.get(pk=response.json()['id']).signature.name)
+        self.assertEqual(names[0], names[1])
+        self.assertTrue(is_stored_signature(names[0]))
+        self.assertEqual(os.listdir(os.path.join(settings.MEDIA_ROOT, 'signatures')), [os.path.basename(names[0])])
+
+
+class DashboardInvalidationTests(APITestCase):
+    def test_dashboard_is_cached_until_the_users_orders_change(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_purchase_order()
+        self.assertEqual(self.client.get('/api/dashboard/').json()['total_spend'], '7.50')
+        with self.assertNumQueries(0):
+            self.client.get('/api/dashboard/')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_purchase_order(line_count=1)
+        data = self.client.get('/api/dashboard/').json()
+        self.assertEqual((data['purchase_orders'], data['total_spend']), (2, '10.00'))
+
+    def test_order_change_leaves_other_dashboards_cached(self):
+        other_client = APIClient()
+        other_client.force_authenticate(User.objects.create_user('approver'))
+        other_client.get('/api/dashboard/')
+        with self.captureOnCommitCallbacks(execute=True):
+            PurchaseOrder.objects.create(user=self.user, vendor=self.vendor)
+        with self.assertNumQueries(0):
+            other_client.get('/api/dashboard/')
+
+    def test_vendor_change_invalidates_every_dashboard(self):
+        other_client = APIClient()
+        other_client.force_authenticate(User.objects.create_user('approver'))
+        self.assertEqual(other_client.get('/api/dashboard/').json()['vendors'], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            Vendor.objects.create(
+                name='Globex', address='2 Main St', city='Springfield', state='IL', zip_code='62701', country='USA'
+            )
+        self.assertEqual(other_client.get('/api/dashboard/').json()['vendors'], 2)
+
+    def test_purchase_order_with_new_line_items_updates_other_users_counts(self):
+        other_client = APIClient()
+        other_client.force_authenticate(User.objects.create_user('approver'))
+        self.assertEqual(other_client.get('/api/dashboard/').json()['line_items'], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/purchase-orders/', {
+                'vendor_id': self.vendor.pk,
+                'new_line_items': '[{"description": "Bolts", "quantity": "2", "rate": "1.50"}]',
+                'signature': _signature_upload(),
+            }, format='multipart')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(other_client.get('/api/dashboard/').json()['line_items'], 1)
+
+    def test_csv_import_updates_line_item_count(self):
+        self.assertEqual(self.client.get('/api/dashboard/').json()['line_items'], 0)
+        upload = SimpleUploadedFile('items.csv', b'description,quantity,rate\nBolts,2,1.50\nNuts,3,0.25\n')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/line-items/import/', {'file': upload}, format='multipart')
+        self.assertEqual(response.json()['created'], 2)
+        self.assertEqual(self.client.get('/api/dashboard/').json()['line_items'], 2)
+
+
+class PurchaseOrderTotalTests(APITestCase):
+    """total_amount is stored, and the signals keep it equal to the sum of the lines"""
+
+    def assertTotal(self, purchase_order, expected):
+        purchase_order.refresh_from_db(fields=['total_amount'])
+        self.assertEqual(purchase_order.total_amount, Decimal(expected))
+
+    def test_linking_and_unlinking_line_items(self):
+        purchase_order = self.create_purchase_order()
+        self.assertTotal(purchase_order, '7.50')
+        extra = LineItem.objects.create(description='Bolts', quantity=Decimal('4'), rate=Decimal('1.25'))
+        purchase_order.line_items.add(extra)
+        self.assertTotal(purchase_order, '12.50')
+        purchase_order.line_items.remove(extra)
+        self.assertTotal(purchase_order, '7.50')
+        # From the line item's side of the relation
+        extra.purchase_orders.add(purchase_order)
+        self.assertTotal(purchase_order, '12.50')
+        extra.purchase_orders.clear()
+        self.assertTotal(purchase_order, '7.50')
+        purchase_order.line_items.clear()
+        self.assertTotal(purchase_order, '0')
+
+    def test_editing_a_shared_line_item_updates_every_order(self):
+        first = self.create_purchase_order(line_count=1)
+        second = self.create_purchase_order(line_count=1)
+        shared = first.line_items.get()
+        second.line_items.add(shared)
+        shared.quantity = Decimal('10')
+        shared.save()
+        self.assertTotal(first, '25.00')
+        self.assertTotal(second, '27.50')
+
+    def test_deleting_a_line_item(self):
+        purchase_order = self.create_purchase_order()
+        purchase_order.line_items.order_by('pk').first().delete()
+        self.assertTotal(purchase_order, '5.00')
+
+
+class CatalogResponseCacheTests(APITestCase):
+    """Vendor and line item responses are cached until a write bumps their generation"""
+
+    def test_cached_list_is_served_without_queries(self):
+        first = self.client.get('/api/vendors/')
+        with self.assertNumQueries(0):
+            second = self.client.get('/api/vendors/')
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(second['ETag'], first['ETag'])
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/vendors/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_writes_bump_the_generation(self):
+        generation = response_cache.generation('vendors')
+        response = self.client.get(f'/api/vendors/{self.vendor.pk}/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/api/vendors/{self.vendor.pk}/', {'name': 'Globex'}, format='json')
+        self.assertGreater(response_cache.generation('vendors'), generation)
+        fresh = self.client.get(f'/api/vendors/{self.vendor.pk}/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(fresh.status_code, 200)
+        self.assertEqual(fresh.json()['name'], 'Globex')
+
+    def test_csv_import_bumps_the_line_item_generation(self):
+        self.assertEqual(self.client.get('/api/line-items/').json()['count'], 0)
+        generation = response_cache.generation('line-items')
+        upload = SimpleUploadedFile('items.csv', b'description,quantity,rate\nBolts,2,1.50\n')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/line-items/import/', {'file': upload}, format='multipart')
+        self.assertGreater(response_cache.generation('line-items'), generation)
+        self.assertEqual(self.client.get('/api/line-items/').json()['count'], 1)
+
+
+class TypeaheadSearchTests(APITestCase):
+    def create_vendor(self, name):
+        return Vendor.objects.create(
+            name=name, address='2 Main St', city='Springfield', state='IL', zip_code='62701', country='USA'
+        )
+
+    def search(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_prefix_matches_rank_before_other_matches(self):
+        for name in ('Blue Widget Co', 'Widget Works', 'Globex'):
+            self.create_vendor(name)
+        names = [row['name'] for row in self.search('/api/vendors/search/', q='widget')]
+        self.assertEqual(names, ['Widget Works', 'Blue Widget Co'])
+
+    def test_line_item_search_and_limit(self):
+        for description in ('Hex bolts', 'Bolts', 'Bolt cutters', 'Washers'):
+            LineItem.objects.create(description=description, quantity=Decimal('1'), rate=Decimal('1.00'))
+        descriptions = [row['description'] for row in self.search('/api/line-items/search/', q='BOLT')]
+        self.assertEqual(descriptions, ['Bolts', 'Bolt cutters', 'Hex bolts'])
+        self.assertEqual(len(self.search('/api/line-items/search/', q='bolt', limit=1)), 1)
+
+    def test_blank_query_returns_nothing(self):
+        self.assertEqual(self.search('/api/vendors/search/', q='  '), [])
+
+
+class PurchaseOrderListTests(APITestCase):
+    def list_ids(self, **params):
+        """Follow the cursor through every page and return the ids in order"""
+        response = self.client.get('/api/purchase-orders/', {'page_size': 2, **params})
+        ids = []
+        while True:
+            self.assertEqual(response.status_code, 200, response.content)
+            ids.extend(row['id'] for row in response.json()['results'])
+            next_url = response.json()['next']
+            if not next_url:
+                return ids
+            response = self.client.get(next_url)
+
+    def test_filters(self):
+        other_vendor = Vendor.objects.create(
+            name='Globex', address='2 Main St', city='Springfield', state='IL', zip_code='62701', country='USA'
+        )
+        small = self.create_purchase_order(line_count=1)
+        large = self.create_purchase_order(line_count=3)
+        PurchaseOrder.objects.filter(pk=small.pk).update(date=date(2026, 1, 10))
+        PurchaseOrder.objects.filter(pk=large.pk).update(date=date(2026, 2, 10), vendor=other_vendor)
+
+        self.assertEqual(self.list_ids(vendor_id=other_vendor.pk), [large.pk])
+        self.assertEqual(self.list_ids(date_from='2026-02-01'), [large.pk])
+        self.assertEqual(self.list_ids(date_to='2026-01-31'), [small.pk])
+        # The orders total 2.50 and 15.00
+        self.assertEqual(self.list_ids(min_total='10'), [large.pk])
+        self.assertEqual(self.list_ids(max_total='10'), [small.pk])
+
+    def test_ordering_breaks_ties_by_id(self):
+        # Three totals shared by several orders each, across page boundaries
+        orders = [self.create_purchase_order(line_count=n % 3 + 1) for n in range(9)]
+        totals = {order.pk: PurchaseOrder.objects.get(pk=order.pk).total_amount for order in orders}
+
+        self.assertEqual(self.list_ids(ordering='total_amount'), sorted(totals, key=lambda pk: (totals[pk], pk)))
+        self.assertEqual(
+            self.list_ids(ordering='-total_amount'), sorted(totals, key=lambda pk: (totals[pk], pk), reverse=True)
+        )
+
+    def test_default_and_unsupported_ordering(self):
+        orders = [self.create_purchase_order() for _ in range(5)]
+        newest_first = [order.pk for order in reversed(orders)]
+        self.assertEqual(self.list_ids(), newest_first)
+        # Not backed by an index, so not offered
+        self.assertEqual(self.list_ids(ordering='po_number'), newest_first)
+
+
+class PurchaseOrderETagTests(APITestCase):
+    def test_if_match_accepts_etag_of_expanded_read(self):
+        purchase_order = self.create_purchase_order()
+        url = f'/api/purchase-orders/{purchase_order.pk}/'
+        etag = self.client.get(url, {'expand': 'line_items'})['ETag']
+        response = self.client.patch(
+            url, {'notes': 'Deliver to dock 2', 'signature': _signature_upload()},
+            format='multipart', HTTP_IF_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+
+        # The ETag read before the update is stale now
+        response = self.client.patch(
+            url, {'notes': 'Deliver to dock 3', 'signature': _signature_upload()},
+            format='multipart', HTTP_IF_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 412)
+
+    def test_detail_etag_depends_on_representation(self):
+        purchase_order = self.create_purchase_order()
+        url = f'/api/purchase-orders/{purchase_order.pk}/'
+        expanded = self.client.get(url, {'expand': 'line_items'})
+        plain = self.client.get(url)
+        self.assertNotEqual(expanded['ETag'], plain['ETag'])
+        # A client caching one representation doesn't get a 304 for the other
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=expanded['ETag'])
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(url, {'expand': 'line_items'}, HTTP_IF_NONE_MATCH=expanded['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_list_etag_changes_with_orders(self):
+        self.create_purchase_order()
+        etag = self.client.get('/api/purchase-orders/')['ETag']
+        response = self.client.get('/api/purchase-orders/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_purchase_order()
+        response = self.client.get('/api/purchase-orders/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 2)
+
+
+class JSONRenderingTests(APITestCase):
+    def test_list_field_errors_are_rendered(self):
+        # Errors of list items are keyed by their integer index
+        response = self.client.post('/api/purchase-orders/export-pdf/', {'ids': ['x']}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'ids': {'0': ['A valid integer is required.']}})
+
+
+class LineItemSharingTests(APITestCase):
+    """Identical line items are one row, which orders and templates share"""
+
+    def test_create_returns_existing_identical_line_item(self):
+        data = {'description': 'Bolts', 'quantity': '2', 'rate': '1.50'}
+        first = self.client.post('/api/line-items/', data, format='json')
+        self.assertEqual(first.status_code, 201)
+        second = self.client.post('/api/line-items/', {**data, 'description': '  Bolts '}, format='json')
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json()['id'], first.json()['id'])
+
+    def test_edit_of_line_item_in_use_is_saved_as_a_copy(self):
+        purchase_order = self.create_purchase_order()
+        line_item = purchase_order.line_items.order_by('pk').first()
+        response = self.client.put(
+            f'/api/line-items/{line_item.pk}/', {'description': 'Washers', 'quantity': '5', 'rate': '1.00'}, format='json'
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertNotEqual(response.json()['id'], line_item.pk)
+        self.assertEqual(response.json()['description'], 'Washers')
+        self.assertTrue(response['Location'].endswith(f"/api/line-items/{response.json()['id']}/"))
+
+        # The order still has the line it was issued with
+        line_item.refresh_from_db()
+        self.assertEqual(line_item.description, f'Item {purchase_order.pk}-0')
+        self.assertIn(line_item, purchase_order.line_items.all())
+
+        # The ETag handed back is the copy's, for its next update
+        response = self.client.patch(
+            f"/api/line-items/{response.json()['id']}/", {'quantity': '6'},
+            format='json', HTTP_IF_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+
+    def test_edit_of_unused_line_item_is_in_place(self):
+        line_item = LineItem.objects.create(description='Bolts', quantity=Decimal('2'), rate=Decimal('1.50'))
+        response = self.client.patch(f'/api/line-items/{line_item.pk}/', {'quantity': '3'}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()['id'], line_item.pk)
+        self.assertNotIn('Location', response)
+        line_item.refresh_from_db()
+        self.assertEqual(line_item.quantity, Decimal('3'))
+
+    def test_delete_of_line_item_in_use_is_refused(self):
+        purchase_order = self.create_purchase_order(line_count=1)
+        ordered = purchase_order.line_items.get()
+        saved = LineItem.objects.create(description='Nuts', quantity=Decimal('1'), rate=Decimal('0.25'))
+        SavedLineItem.objects.create(user=self.user, line_item=saved, name='Nuts')
+        unused = LineItem.objects.create(description='Washers', quantity=Decimal('1'), rate=Decimal('0.10'))
+
+        for line_item in (ordered, saved):
+            response = self.client.delete(f'/api/line-items/{line_item.pk}/')
+            self.assertEqual(response.status_code, 409)
+            self.assertTrue(LineItem.objects.filter(pk=line_item.pk).exists())
+        response = self.client.delete(f'/api/line-items/{unused.pk}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(LineItem.objects.filter(pk=unused.pk).exists())
+
+    def test_purchase_order_with_repeated_line_is_rejected(self):
+        existing = LineItem.objects.create(description='Nuts', quantity=Decimal('3'), rate=Decimal('0.25'))
+        response = self.client.post('/api/purchase-orders/', {
+            'vendor_id': self.vendor.pk,
+            'line_item_ids': f'[{existing.pk}]',
+            'new_line_items': (
+                '[{"description": "Bolts", "quantity": "2", "rate": "1.50"},'
+                ' {"description": "Nuts", "quantity": "3", "rate": "0.25"},'
+                ' {"description": "Bolts", "quantity": "2", "rate": "1.50"}]'
+            ),
+            'signature': _signature_upload(),
+        }, format='multipart')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('[2, 3]', response.json()['new_line_items'][0])
+        self.assertFalse(PurchaseOrder.objects.exists())
+
+    def test_import_skips_rows_added_since_the_index_was_loaded(self):
+        importer = LineItemImporter()
+        index = importer._load_index()
+        # Added by another request while the file is read
+        LineItem.objects.create(description='Bolts', quantity=Decimal('2'), rate=Decimal('1.50'))
+        importer._load_index = lambda: index
+        stats = importer.run(StringIO('description,quantity,rate\nBolts,2,1.50\nNuts,3,0.25\n'))
+        self.assertEqual((stats.created, stats.duplicates), (1, 1))
+        self.assertEqual(LineItem.objects.count(), 2)
+
+    @override_settings(CSV_IMPORT_MAX_REJECTS=1)
+    def test_import_returns_rejected_rows_inline(self):
+        upload = SimpleUploadedFile(
+            'items.csv', b'description,quantity,rate\nBolts,2,1.50\nNuts,x,0.25\n,1,1\n', content_type='text/csv'
+        )
+        response = self.client.post('/api/line-items/import/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual((data['created'], data['rejected']), (1, 2))
+        self.assertEqual(len(data['rejects']), 1)
+        self.assertEqual(data['rejects'][0]['line'], 3)
+        self.assertEqual(data['rejects'][0]['values'], {'description': 'Nuts', 'quantity': 'x', 'rate': '0.25'})
+        self.assertTrue(data['rejects_truncated'])
+        self.assertNotIn('rejects_url', data)
+        self.assertFalse(os.path.exists(os.path.join(settings.MEDIA_ROOT, 'imports')))
+
+
+def _server_timing_queries(response):
+    return int(re.search(r'db;desc="(\d+) queries"', response['Server-Timing']).group(1))
+
+
+@override_settings(PERFORMANCE_METRICS_ENABLED=True)
+class PerformanceMetricsTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        # Metrics are kept per process, so drop what earlier tests recorded
+        for metric in metrics.REGISTRY:
+            if hasattr(metric, 'clear'):
+                metric.clear()
+
+    def test_server_timing_counts_queries(self):
+        self.create_purchase_order()
+        response = self.client.get('/api/purchase-orders/')
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(_server_timing_queries(response), 0)
+
+    async def test_server_timing_counts_queries_under_asgi(self):
+        # The view's queries run on a sync_to_async thread, not the one the
+        # middleware runs on
+        await sync_to_async(self.create_purchase_order)()
+        client = AsyncClient()
+        await client.aforce_login(self.user)
+        response = await client.get('/api/purchase-orders/')
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(_server_timing_queries(response), 0)
+
+    def assertQueriesExported(self, output, view):
+        match = re.search(rf'http_request_db_queries_sum{{view="{view}"}} (\S+)', output)
+        self.assertIsNotNone(match, output)
+        self.assertGreater(float(match.group(1)), 0)
+        self.assertIn(f'http_request_duration_seconds_count{{view="{view}",method="GET",status="200"}} 1\n', output)
+
+    def test_metrics_endpoint_exports_request_histograms(self):
+        self.create_purchase_order()
+        self.client.get('/api/purchase-orders/')
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertQueriesExported(response.content.decode(), 'purchase-order-list')
+
+    async def test_metrics_endpoint_exports_request_histograms_under_asgi(self):
+        await sync_to_async(self.create_purchase_order)()
+        client = AsyncClient()
+        await client.aforce_login(self.user)
+        await client.get('/api/purchase-orders/')
+        response = await client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertQueriesExported(response.content.decode(), 'purchase-order-list')
+
+    def test_metrics_endpoint_refuses_other_addresses(self):
+        response = self.client.get('/metrics', REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, 403)
+
+    def test_image_cache_stats_are_exported(self):
+        registry.clear()
+        self.addCleanup(registry.clear)
+        for _ in range(2):
+            registry.static_image(LOGO_PATH)
+        output = metrics.render_metrics()
+        self.assertIn('pdf_image_cache{stat="hits"} 1\n', output)
+        self.assertIn('pdf_image_cache{stat="misses"} 1\n', output)
+        self.assertIn('pdf_image_cache{stat="static_images"} 1\n', output)
+
+
+class ReplicaRoutingTests(APITestCase):
+    """Reads go to the replica, except for clients that have just written"""
+
+    def setUp(self):
+        super().setUp()
+        self.enterContext(mock.patch('api.db_router.replica_configured', return_value=True))
+        self.router = PrimaryReplicaRouter()
+        self.factory = RequestFactory()
+
+    def handle(self, request, write=False):
+        """Run a request through the middleware and return the aliases its reads went to"""
+        reads = []
+
+        def view(request):
+            reads.append(self.router.db_for_read(PurchaseOrder))
+            if write:
+                self.router.db_for_write(PurchaseOrder)
+                reads.append(self.router.db_for_read(PurchaseOrder))
+            return HttpResponse()
+
+        ReplicaRoutingMiddleware(view)(request)
+        return reads
+
+    def test_safe_requests_read_from_the_replica_until_they_write(self):
+        self.assertEqual(self.handle(self.factory.get('/')), ['replica'])
+        self.assertEqual(self.handle(self.factory.get('/'), write=True), ['replica', 'default'])
+        self.assertEqual(self.handle(self.factory.post('/')), ['default'])
+
+    def test_client_reads_from_the_primary_after_writing(self):
+        self.handle(self.factory.post('/', HTTP_AUTHORIZATION='Bearer first'), write=True)
+        self.assertEqual(self.handle(self.factory.get('/', HTTP_AUTHORIZATION='Bearer first')), ['default'])
+        self.assertEqual(self.handle(self.factory.get('/', HTTP_AUTHORIZATION='Bearer second')), ['replica'])
+        # The pin expires with its cache entry
+        caches['default'].clear()
+        self.assertEqual(self.handle(self.factory.get('/', HTTP_AUTHORIZATION='Bearer first')), ['replica'])
+
+    def test_reads_outside_requests_use_the_primary(self):
+        self.assertEqual(self.router.db_for_read(PurchaseOrder), 'default')
+
+    async def test_routing_follows_async_requests_into_sync_threads(self):
+        async def view(request):
+            return HttpResponse(await sync_to_async(self.router.db_for_read)(PurchaseOrder))
+
+        response = await ReplicaRoutingMiddleware(view)(self.factory.get('/'))
+        self.assertEqual(response.content, b'replica')
+
+
+class _RecordingCanvas:
+    """Stands in for a ReportLab canvas, recording the strings drawn on each page"""
+
+    def __init__(self):
+        self.pages = [[]]
+
+    def drawString(self, x, y, text):
+        self.pages[-1].append((text, y))
+
+    def showPage(self):
+        self.pages.append([])
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+
+class PurchaseOrderLayoutTests(TestCase):
+    def render(self, line_count, note_lines):
+        purchase_order = SimpleNamespace(
+            po_number='PO-20260101-1', date=date(2026, 1, 1), payment_days=30, payment_terms='',
+            vendor=SimpleNamespace(name='Acme', address='1 Main St', city='Springfield', state='IL',
+                                   zip_code='62701', country='USA'),
+            notes='n' * pdf.NOTES_CHARS_PER_LINE * note_lines, approval_stamp='none', signature=None,
+            user=SimpleNamespace(get_full_name=lambda: 'Buyer'),
+        )
+        line_items = [
+            SimpleNamespace(description=f'Item {n}', quantity=Decimal(1), rate=Decimal(2), amount=Decimal(2))
+            for n in range(line_count)
+        ]
+        canvas = _RecordingCanvas()
+        layout = pdf.PurchaseOrderLayout(canvas, purchase_order)
+        layout.render(line_items)
+        return canvas.pages, layout.y
+
+    def assertClosingBlockOnLastPage(self, pages, bottom, note_lines):
+        closing = {
+            text: number for number, page in enumerate(pages) for text, _ in page
+            if text in ('Total:', 'Notes:', 'Authorized Signature')
+        }
+        self.assertEqual(len(closing), 3 if note_lines else 2)
+        self.assertEqual(set(closing.values()), {len(pages) - 1})
+        # The signature block ends above the bottom margin
+        self.assertGreaterEqual(round(bottom - pdf.BOTTOM_MARGIN, 2), 0)
+
+    def test_closing_block_stays_on_the_last_page(self):
+        # Each extra line item moves the closing block down two rows, so it
+        # crosses the page boundary somewhere in this range
+        for note_lines in (0, 1, 5):
+            for line_count in range(1, 30):
+                with self.subTest(line_count=line_count, note_lines=note_lines):
+                    pages, bottom = self.render(line_count, note_lines)
+                    self.assertClosingBlockOnLastPage(pages, bottom, note_lines)
+
+    def test_closing_block_that_fills_the_page_exactly(self):
+        # Rows start below the first page's header and single-line items take
+        # two rows each; with one line of notes, three items leave exactly
+        # the room the closing block needs
+        first_row = pdf.PAGE_HEIGHT - 5.6*pdf.inch
+        room = first_row - 3 * 2 * pdf.ROW_HEIGHT - pdf.BOTTOM_MARGIN
+        closing_height = pdf.TOTALS_HEIGHT + pdf.NOTES_GAP + pdf.ROW_HEIGHT + pdf.SIGNATURE_BLOCK_HEIGHT
+        self.assertAlmostEqual(room, closing_height)
+
+        pages, bottom = self.render(3, 1)
+        self.assertEqual(len(pages), 1)
+        self.assertClosingBlockOnLastPage(pages, bottom, 1)
+
+        # One more item and all of it moves to the next page
+        pages, bottom = self.render(4, 1)
+        self.assertEqual(len(pages), 2)
+        self.assertClosingBlockOnLastPage(pages, bottom, 1)
+
+    def test_notes_longer_than_a_page_break(self):
+        pages, bottom = self.render(3, 60)
+        self.assertEqual(len(pages), 3)
+        texts = [[text for text, _ in page] for page in pages]
+        self.assertIn('Total:', texts[0])
+        self.assertIn('Notes:', texts[0])
+        self.assertIn('Authorized Signature', texts[-1])
+        self.assertGreaterEqual(round(bottom - pdf.BOTTOM_MARGIN, 2), 0)
+
+
+class PDFRenderJobTests(APITestCase):
+    def render(self, purchase_order):
+        job = enqueue_pdf_render(purchase_order)
+        job.status = PDFRenderJob.STATUS_RUNNING
+        job.save()
+        # A worker closes its connection after each job, which would end the
+        # test's transaction on databases other than in-memory SQLite
+        with mock.patch('api.pdf_jobs.close_old_connections'):
+            return run_pdf_job(job.pk)
+
+    def test_superseded_job_stays_until_retention_expires(self):
+        purchase_order = self.create_purchase_order()
+        old_job = self.render(purchase_order)
+        new_job = self.render(purchase_order)
+
+        # A client still polling the old job can download its PDF
+        response = self.client.get(f'/api/pdf-jobs/{old_job.pk}/download/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+        self.assertEqual(delete_superseded_pdf_jobs(timedelta(hours=1)), 0)
+
+        PDFRenderJob.objects.filter(pk=new_job.pk).update(finished_at=new_job.finished_at - timedelta(hours=2))
+        self.assertEqual(delete_superseded_pdf_jobs(timedelta(hours=1)), 1)
+        self.assertFalse(PDFRenderJob.objects.filter(pk=old_job.pk).exists())
+        self.assertFalse(old_job.pdf.storage.exists(old_job.pdf.name))
+        self.assertTrue(new_job.pdf.storage.exists(new_job.pdf.name))
+
+
+class PurchaseOrderPDFTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        pdf_cache._pdf_cache = None
+        self.addCleanup(setattr, pdf_cache, '_pdf_cache', None)
+        self.enterContext(override_settings(PDF_CACHE={'BACKEND': 'api.pdf_cache.DjangoCachePDFCache'}))
+        self.renders = self.enterContext(
+            mock.patch('api.pdf_cache.render_purchase_order_pdf', wraps=pdf.render_purchase_order_pdf)
+        )
+
+    def test_unchanged_order_is_rendered_once(self):
+        purchase_order = self.create_purchase_order()
+        url = f'/api/purchase-orders/{purchase_order.pk}/pdf/'
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        second = self.client.get(url)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertEqual(self.renders.call_count, 1)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], first['ETag'])
+
+    def test_changes_to_the_order_invalidate_the_pdf(self):
+        purchase_order = self.create_purchase_order()
+        url = f'/api/purchase-orders/{purchase_order.pk}/pdf/'
+        etag = self.client.get(url)['ETag']
+        for change in (
+            lambda: purchase_order.line_items.update(description='Washers'),
+            lambda: Vendor.objects.filter(pk=self.vendor.pk).update(name='Globex'),
+            lambda: PurchaseOrder.objects.filter(pk=purchase_order.pk).update(notes='Deliver to dock 2'),
+        ):
+            change()
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response['ETag'], etag)
+            etag = response['ETag']
+        self.assertEqual(self.renders.call_count, 4)
+
+    def test_file_cache_evicts_least_recently_used(self):
+        with tempfile.TemporaryDirectory() as location:
+            cache = pdf_cache.FileSystemPDFCache(location, max_size=250, low_water=0.8)
+            for key in ('a', 'b'):
+                cache.set(key, b'x' * 100)
+                os.utime(os.path.join(location, f'{key}.pdf'), (0, 0))
+            # Reading 'a' makes 'b' the least recently used
+            self.assertIsNotNone(cache.get('a'))
+            cache.set('c', b'x' * 100)
+            self.assertIsNone(cache.get('b'))
+            self.assertIsNotNone(cache.get('a'))
+            self.assertIsNotNone(cache.get('c'))
+
+    def test_only_repeated_layers_are_forms(self):
+        purchase_order = self.create_purchase_order(line_count=40)
+        data = pdf.render_purchase_order_pdf(purchase_order, list(purchase_order.line_items.all()))
+        self.assertIn(b'FormXob.table-header', data)
+        self.assertIn(b'FormXob.continuation-header', data)
+        # The letterhead is only on the first page
+        self.assertNotIn(b'FormXob.letterhead', data)
+
+
+class _InlineExecutor:
+    """Runs each call as it is submitted, in place of the export process pool"""
+
+    def submit(self, fn, *args):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as exc:
+            future.set_exception(exc)
+        return future
+
+
+class PurchaseOrderExportTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        pdf_cache._pdf_cache = None
+        self.addCleanup(setattr, pdf_cache, '_pdf_cache', None)
+        self.enterContext(override_settings(PDF_CACHE={'BACKEND': 'api.pdf_cache.DjangoCachePDFCache'}))
+        # Spawned workers would read the real database, not the test one
+        self.enterContext(mock.patch('api.pdf_export.get_export_pool', return_value=_InlineExecutor()))
+
+    def test_export_streams_a_zip_of_the_selected_orders(self):
+        first = self.create_purchase_order()
+        second = self.create_purchase_order()
+        self.create_purchase_order()
+        response = self.client.post('/api/purchase-orders/export-pdf/', {'ids': [first.pk, second.pk]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        with zipfile.ZipFile(BytesIO(b''.join(response.streaming_content))) as archive:
+            self.assertEqual(
+                sorted(archive.namelist()), sorted(f'PO_{order.po_number}.pdf' for order in (first, second))
+            )
+            self.assertTrue(archive.read(f'PO_{first.po_number}.pdf').startswith(b'%PDF'))
+
+    def test_failed_renders_are_listed_in_errors_txt(self):
+        purchase_order = self.create_purchase_order()
+        missing_id = purchase_order.pk + 1
+        data = b''.join(stream_purchase_orders_zip([purchase_order.pk, missing_id], concurrency=2))
+        with zipfile.ZipFile(BytesIO(data)) as archive:
+            self.assertEqual(archive.namelist(), [f'PO_{purchase_order.po_number}.pdf', 'errors.txt'])
+            errors = archive.read('errors.txt').decode()
+        self.assertIn(f'Purchase order {missing_id}:', errors)
+
+    def test_export_without_matching_orders_is_not_found(self):
+        response = self.client.post('/api/purchase-orders/export-pdf/', {'vendor_id': self.vendor.pk}, format='json')
+        self.assertEqual(response.status_code, 404)
+
+
+class BinaryStreamsTests(TestCase):
+    """ReportLab's ASCII85 switch is global, so it is only off during renders"""
+
+    def test_switch_is_restored_after_the_last_render(self):
+        self.assertEqual(rl_config.useA85, 1)
+        with pdf._binary_streams():
+            self.assertEqual(rl_config.useA85, 0)
+            with pdf._binary_streams():
+                self.assertEqual(rl_config.useA85, 0)
+            # Another render is still running
+            self.assertEqual(rl_config.useA85, 0)
+        self.assertEqual(rl_config.useA85, 1)
+
+    def test_switch_is_restored_when_a_render_fails(self):
+        with self.assertRaises(RuntimeError):
+            with pdf._binary_streams():
+                raise RuntimeError
+        self.assertEqual(rl_config.useA85, 1)
+
+    def test_other_documents_keep_ascii85_streams(self):
+        def document():
+            buffer = BytesIO()
+            canvas = reportlab_canvas.Canvas(buffer, pageCompression=1)
+            canvas.drawString(72, 72, 'Hello')
+            canvas.save()
+            return buffer.getvalue()
+
+        with pdf._binary_streams():
+            self.assertNotIn(b'/ASCII85Decode', document())
+        self.assertIn(b'/ASCII85Decode', document())
+
+
+def _po_sequence_number(po_number):
+    return int(po_number.rsplit('-', 1)[1])
+
+
+class PurchaseOrderNumberTests(APITestCase):
+    def test_numbers_follow_each_other(self):
+        # Past -9, where sorting the strings used to hand out -10 again
+        numbers = [
+            _po_sequence_number(PurchaseOrder.objects.create(user=self.user, vendor=self.vendor).po_number)
+            for _ in range(12)
+        ]
+        self.assertEqual(numbers, list(range(1, 13)))
+
+    def test_rolled_back_create_releases_its_number(self):
+        PurchaseOrder.objects.create(user=self.user, vendor=self.vendor)
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                PurchaseOrder.objects.create(user=self.user, vendor=self.vendor)
+                raise RuntimeError
+        purchase_order = PurchaseOrder.objects.create(user=self.user, vendor=self.vendor)
+        self.assertEqual(_po_sequence_number(purchase_order.po_number), 2)
+
+
+@override_settings(CACHES=TEST_CACHES, PERFORMANCE_METRICS_ENABLED=False)
+@skipIf(connection.vendor == 'sqlite', "SQLite locks the whole database instead of the sequence row")
+class ConcurrentPurchaseOrderNumberTests(TransactionTestCase):
+    THREADS = 8
+    ORDERS_PER_THREAD = 10
+
+    def test_concurrent_creates_get_distinct_numbers(self):
+        user = User.objects.create_user('buyer')
+        vendor = Vendor.objects.create(
+            name='Acme', address='1 Main St', city='Springfield', state='IL', zip_code='62701', country='USA'
+        )
+        start = threading.Barrier(self.THREADS)
+
+        def create_orders():
+            try:
+                start.wait()
+                return [
+                    PurchaseOrder.objects.create(user=user, vendor=vendor).po_number
+                    for _ in range(self.ORDERS_PER_THREAD)
+                ]
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(self.THREADS) as executor:
+            futures = [executor.submit(create_orders) for _ in range(self.THREADS)]
+            po_numbers = [po_number for future in futures for po_number in future.result()]
+
+        # Every number once, with none skipped
+        total = self.THREADS * self.ORDERS_PER_THREAD
+        self.assertEqual(sorted(map(_po_sequence_number, po_numbers)), list(range(1, total + 1)))
@@ -2,7 +2,8 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     UserViewSet, VendorViewSet, SavedVendorViewSet,
-    LineItemViewSet, SavedLineItemViewSet, PurchaseOrderViewSet
+    LineItemViewSet, SavedLineItemViewSet, PurchaseOrderViewSet,
+    PDFRenderJobViewSet, DashboardView, purchase_order_pdf
 )
 
 router = DefaultRouter()
@@ -12,7 +13,11 @@ router.register(r'saved-vendors', SavedVendorViewSet, basename='saved-vendor')
 router.register(r'line-items', LineItemViewSet)
 router.register(r'saved-line-items', SavedLineItemViewSet, basename='saved-line-item')
 router.register(r'purchase-orders', PurchaseOrderViewSet, basename='purchase-order')
+router.register(r'pdf-jobs', PDFRenderJobViewSet, basename='pdf-job')
 
 urlpatterns = [
+    # Async view, so it is routed directly rather than as a viewset action
+    path('purchase-orders/<int:pk>/pdf/', purchase_order_pdf, name='purchase-order-pdf'),
     path('', include(router.urls)),
+    path('dashboard/', DashboardView.as_view(), name='dashboard'),
 ] 
\ No newline at end of file
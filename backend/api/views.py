@@ -1,23 +1,48 @@
-import os
 import json
-from datetime import timedelta
-from io import BytesIO
-from django.http import HttpResponse
+import logging
+from asgiref.sync import sync_to_async
+from django.http import (
+    FileResponse, HttpResponse, HttpResponseForbidden, HttpResponseNotAllowed,
+    JsonResponse, StreamingHttpResponse
+)
 from django.conf import settings
 from django.contrib.auth.models import User
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Count, Max
 from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.request import Request
 from rest_framework.response import Response
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.units import inch
-from reportlab.lib import colors
-from .models import Vendor, SavedVendor, LineItem, SavedLineItem, PurchaseOrder
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
+from .models import Vendor, SavedVendor, LineItem, SavedLineItem, PurchaseOrder, PDFRenderJob
 from .serializers import (
     UserSerializer, VendorSerializer, SavedVendorSerializer,
-    LineItemSerializer, SavedLineItemSerializer, PurchaseOrderSerializer
+    LineItemSerializer, SavedLineItemSerializer, PurchaseOrderSerializer,
+    PurchaseOrderListSerializer, PurchaseOrderExportSerializer, PDFRenderJobSerializer
+)
+from .conditional import ConditionalRequestMixin
+from .dashboard import get_dashboard_stats
+from .dynamic_fields import DynamicQuerysetMixin
+from .executor import ExecutorSaturated, get_render_executor
+from .filters import CursorOrderingFilter, PurchaseOrderFilter
+from .importers import CSVImportMixin, LineItemImporter, VendorImporter
+from .metrics import render_metrics
+from .pagination import PurchaseOrderCursorPagination
+from .pdf_cache import (
+    get_purchase_order_pdf, purchase_order_fingerprint, purchase_order_last_modified
 )
+from .pdf_export import astream_purchase_orders_zip, stream_purchase_orders_zip
+from .pdf_jobs import enqueue_pdf_render
+from .response_cache import CachedResponseMixin, generation, purchase_orders_generation_name
+from .search import TypeaheadSearchMixin
+
+logger = logging.getLogger(__name__)
 
 class UserViewSet(viewsets.ReadOnlyModelViewSet):
     """
@@ -48,20 +73,26 @@ class UserViewSet(viewsets.ReadOnlyModelViewSet):
         serializer = self.get_serializer(user)
         return Response(serializer.data)
 
-class VendorViewSet(viewsets.ModelViewSet):
+class VendorViewSet(CachedResponseMixin, ConditionalRequestMixin, DynamicQuerysetMixin, TypeaheadSearchMixin,
+                    CSVImportMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows vendors to be viewed or edited.
     """
     queryset = Vendor.objects.all()
     serializer_class = VendorSerializer
     permission_classes = [permissions.IsAuthenticated]
+    search_field = 'name'
+    response_cache_name = 'vendors'
+    etag_per_user = False
+    csv_importer_class = VendorImporter
     
     def create(self, request, *args, **kwargs):
         """Override create method to add better error handling"""
-        print(f"Creating vendor with data: {request.data}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Creating vendor", extra={'fields': {'data': dict(request.data)}})
         serializer = self.get_serializer(data=request.data)
         if not serializer.is_valid():
-            print(f"Validation errors: {serializer.errors}")
+            logger.info("Vendor validation failed", extra={'fields': {'errors': serializer.errors}})
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
         self.perform_create(serializer)
@@ -72,17 +103,18 @@ class VendorViewSet(viewsets.ModelViewSet):
         """Override update method to add better error handling"""
         partial = kwargs.pop('partial', False)
         instance = self.get_object()
-        print(f"Updating vendor {instance.id} with data: {request.data}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Updating vendor", extra={'fields': {'vendor_id': instance.id, 'data': dict(request.data)}})
         
         serializer = self.get_serializer(instance, data=request.data, partial=partial)
         if not serializer.is_valid():
-            print(f"Validation errors: {serializer.errors}")
+            logger.info("Vendor validation failed", extra={'fields': {'vendor_id': instance.id, 'errors': serializer.errors}})
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
             
         self.perform_update(serializer)
         return Response(serializer.data)
 
-class SavedVendorViewSet(viewsets.ModelViewSet):
+class SavedVendorViewSet(ConditionalRequestMixin, DynamicQuerysetMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows saved vendor templates to be viewed or edited.
     """
@@ -90,17 +122,62 @@ class SavedVendorViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
-        return SavedVendor.objects.filter(user=self.request.user)
+        return SavedVendor.objects.filter(user=self.request.user).select_related('vendor')
+    
+    def get_etag_aggregates(self):
+        return {**super().get_etag_aggregates(), 'vendor_updated': Max('vendor__updated_at')}
 
-class LineItemViewSet(viewsets.ModelViewSet):
+class LineItemViewSet(CachedResponseMixin, ConditionalRequestMixin, DynamicQuerysetMixin, TypeaheadSearchMixin,
+                      CSVImportMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows line items to be viewed or edited.
     """
     queryset = LineItem.objects.all()
     serializer_class = LineItemSerializer
     permission_classes = [permissions.IsAuthenticated]
+    search_field = 'description'
+    computed_field_columns = {'amount': ('quantity', 'rate')}
+    response_cache_name = 'line-items'
+    etag_per_user = False
+    csv_importer_class = LineItemImporter
+
+    def create(self, request, *args, **kwargs):
+        """Answer 200 with the existing line item when an identical one exists"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        self.perform_create(serializer)
+        if not serializer.created:
+            return Response(serializer.data)
+        headers = self.get_success_headers(serializer.data)
+        return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
+
+    def update(self, request, *args, **kwargs):
+        """Return the line item holding the edit, a copy if the original is in use"""
+        partial = kwargs.pop('partial', False)
+        instance = self.get_object()
+        serializer = self.get_serializer(instance, data=request.data, partial=partial)
+        serializer.is_valid(raise_exception=True)
+        self.perform_update(serializer)
+        line_item = serializer.instance
+        # The ETag handed back is the one of the line item holding the edit
+        self.etag = self.get_object_etag(line_item.pk)
+        headers = {}
+        if line_item.pk != instance.pk:
+            headers['Location'] = self.reverse_action('detail', args=[line_item.pk])
+        return Response(serializer.data, headers=headers)
+
+    def destroy(self, request, *args, **kwargs):
+        """Refuse to delete a line item that orders or saved templates use"""
+        instance = self.get_object()
+        if instance.is_in_use():
+            return Response(
+                {"detail": "This line item is used by purchase orders or saved templates."},
+                status=status.HTTP_409_CONFLICT
+            )
+        self.perform_destroy(instance)
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
-class SavedLineItemViewSet(viewsets.ModelViewSet):
+class SavedLineItemViewSet(ConditionalRequestMixin, DynamicQuerysetMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows saved line item templates to be viewed or edited.
     """
@@ -108,65 +185,83 @@ class SavedLineItemViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
-        return SavedLineItem.objects.filter(user=self.request.user)
+        return SavedLineItem.objects.filter(user=self.request.user).select_related('line_item')
+    
+    def get_etag_aggregates(self):
+        return {**super().get_etag_aggregates(), 'line_item_updated': Max('line_item__updated_at')}
 
-class PurchaseOrderViewSet(viewsets.ModelViewSet):
+class PurchaseOrderViewSet(ConditionalRequestMixin, DynamicQuerysetMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows purchase orders to be viewed or edited.
     """
     serializer_class = PurchaseOrderSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = PurchaseOrderCursorPagination
+    filter_backends = [DjangoFilterBackend, CursorOrderingFilter]
+    filterset_class = PurchaseOrderFilter
+    # Each has an index on (user, field, id) for the cursor to scan
+    ordering_fields = ['created_at', 'date', 'total_amount']
     
     def get_queryset(self):
-        return PurchaseOrder.objects.filter(user=self.request.user)
+        # Reads only fetch the columns and relations the serializer outputs
+        return (
+            PurchaseOrder.objects.filter(user=self.request.user)
+            .select_related('vendor', 'user')
+            .prefetch_related('line_items')
+        )
+    
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return PurchaseOrderListSerializer
+        return PurchaseOrderSerializer
+    
+    def get_etag_aggregates(self):
+        # Orders embed their vendor and line items. Totals are refreshed with
+        # queryset updates that leave updated_at alone, so count the line
+        # item links as well to notice items being removed.
+        return {
+            **super().get_etag_aggregates(),
+            'vendor_updated': Max('vendor__updated_at'),
+            'line_item_links': Count('line_items'),
+            'line_items_updated': Max('line_items__updated_at'),
+        }
+    
+    def get_etag_state(self, queryset):
+        if self.action != 'list':
+            return super().get_etag_state(queryset)
+        # Aggregating over all of the user's orders would cost more the more
+        # orders they have, on every page. The generations change on each
+        # write to their orders, vendors or line items instead.
+        return {
+            'purchase_orders': generation(purchase_orders_generation_name(self.request.user.pk)),
+            'vendors': generation('vendors'),
+            'line_items': generation('line-items'),
+        }
     
     def create(self, request, *args, **kwargs):
         """Override create method to add better error handling"""
-        print(f"Creating purchase order with data keys: {request.data.keys()}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Creating purchase order", extra={'fields': {'keys': sorted(request.data.keys())}})
         
         # Check if signature is provided
         if 'signature' not in request.data or not request.data['signature']:
-            print("No signature provided in request data")
+            logger.info("Purchase order rejected: no signature provided")
             return Response(
                 {"signature": ["Signature is required."]}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Handle line_item_ids from form data
-        data = request.data.copy()
-        if 'line_item_ids' in data:
-            try:
-                line_item_ids = json.loads(data['line_item_ids'])
-                print(f"Parsed line_item_ids: {line_item_ids}")
-                
-                # Validate line item IDs
-                if not line_item_ids or not isinstance(line_item_ids, list):
-                    return Response(
-                        {"line_item_ids": ["Invalid line item IDs format."]},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-                
-                # Convert to the format expected by the serializer
-                data.pop('line_item_ids')
-                for line_item_id in line_item_ids:
-                    data.appendlist('line_item_ids', line_item_id)
-                
-            except json.JSONDecodeError as e:
-                print(f"Error parsing line_item_ids: {e}")
-                return Response(
-                    {"line_item_ids": ["Invalid JSON format."]},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-        else:
-            print("No line_item_ids provided in request data")
+        data = self._decode_line_item_fields(request)
+        if 'line_item_ids' not in data and 'new_line_items' not in data:
+            logger.info("Purchase order rejected: no line items provided")
             return Response(
                 {"line_item_ids": ["At least one line item is required."]},
                 status=status.HTTP_400_BAD_REQUEST
             )
-            
+        
         serializer = self.get_serializer(data=data)
         if not serializer.is_valid():
-            print(f"Validation errors: {serializer.errors}")
+            logger.info("Purchase order validation failed", extra={'fields': {'errors': serializer.errors}})
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
         self.perform_create(serializer)
@@ -177,299 +272,220 @@ class PurchaseOrderViewSet(viewsets.ModelViewSet):
         """Override update method to add better error handling"""
         partial = kwargs.pop('partial', False)
         instance = self.get_object()
-        print(f"Updating purchase order {instance.id} with data keys: {request.data.keys()}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Updating purchase order", extra={'fields': {
+                'purchase_order_id': instance.id, 'keys': sorted(request.data.keys())
+            }})
         
         # Check if signature is provided
         if 'signature' not in request.data or not request.data['signature']:
-            print("No signature provided in request data")
+            logger.info("Purchase order %s rejected: no signature provided", instance.id)
             return Response(
                 {"signature": ["Signature is required."]}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Handle line_item_ids from form data
-        data = request.data.copy()
-        if 'line_item_ids' in data:
-            try:
-                line_item_ids = json.loads(data['line_item_ids'])
-                print(f"Parsed line_item_ids: {line_item_ids}")
-                
-                # Validate line item IDs
-                if not line_item_ids or not isinstance(line_item_ids, list):
-                    return Response(
-                        {"line_item_ids": ["Invalid line item IDs format."]},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-                
-                # Convert to the format expected by the serializer
-                data.pop('line_item_ids')
-                for line_item_id in line_item_ids:
-                    data.appendlist('line_item_ids', line_item_id)
-                
-            except json.JSONDecodeError as e:
-                print(f"Error parsing line_item_ids: {e}")
-                return Response(
-                    {"line_item_ids": ["Invalid JSON format."]},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
+        data = self._decode_line_item_fields(request)
+        
         serializer = self.get_serializer(instance, data=data, partial=partial)
         if not serializer.is_valid():
-            print(f"Validation errors: {serializer.errors}")
+            logger.info("Purchase order validation failed", extra={'fields': {
+                'purchase_order_id': instance.id, 'errors': serializer.errors
+            }})
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
             
         self.perform_update(serializer)
         return Response(serializer.data)
     
-    @action(detail=True, methods=['get'])
-    def pdf(self, request, pk=None):
+    def _decode_line_item_fields(self, request):
         """
-        Generate a PDF for the purchase order
-        """
-        purchase_order = self.get_object()
-        
-        # Create a file-like buffer to receive PDF data
-        buffer = BytesIO()
-        
-        # Create the PDF object, using the buffer as its "file"
-        p = canvas.Canvas(buffer, pagesize=letter)
-        width, height = letter
-        
-        # Set up the document
-        p.setTitle(f"Purchase Order - {purchase_order.po_number}")
-        
-        # Add company logo - using PIL approach that worked temporarily
-        try:
-            # Import required libraries
-            from PIL import Image
-            import tempfile
-            
-            # Define the logo path
-            logo_path = '/Users/shaun/Documents/GitHub/projects/PO-generator/backend/static/images/cit-logo.png'
-            
-            # Check if the file exists
-            if os.path.exists(logo_path):
-                print(f"Logo file exists at: {logo_path}")
-                
-                # Open the image with PIL
-                img = Image.open(logo_path)
-                print(f"Image opened: format={img.format}, size={img.size}, mode={img.mode}")
-                
-                # Convert to RGB if needed
-                if img.mode != 'RGB':
-                    img = img.convert('RGB')
-                    print("Converted image to RGB mode")
-                
-                # Create a temporary file
-                with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as temp_file:
-                    temp_path = temp_file.name
-                    print(f"Created temporary file: {temp_path}")
-                
-                # Save the image to the temporary file
-                img.save(temp_path, format='PNG')
-                print(f"Saved image to temporary file")
-                
-                # Get the original image dimensions
-                img_width, img_height = img.size
-                aspect_ratio = img_width / img_height
-                print(f"Original image dimensions: {img_width}x{img_height}, aspect ratio: {aspect_ratio}")
-                
-                # Calculate new dimensions that maintain the aspect ratio
-                target_height = 1*inch
-                target_width = target_height * aspect_ratio
-                print(f"Target dimensions: {target_width}x{target_height}")
-                
-                # Add the image to the PDF - now in the top left with proper aspect ratio
-                p.drawInlineImage(temp_path, 0.3*inch, height - 1*inch, width=target_width*0.7, height=target_height*0.7)
-                print("Added logo to PDF using drawInlineImage with calculated dimensions")
-                
-                # Clean up the temporary file
-                os.unlink(temp_path)
-                print("Removed temporary file")
-            else:
-                print(f"Logo file does not exist at: {logo_path}")
-        except Exception as e:
-            print(f"Error adding logo to PDF: {str(e)}")
-            import traceback
-            traceback.print_exc()
-        
-        # Add header - moved further to the right
-        p.setFont("Helvetica-Bold", 18)
-        p.drawString(width - 2.7*inch, height - 0.5*inch, "PURCHASE ORDER")
-        
-        # Add PO number on a separate line below the title
-        p.setFont("Helvetica-Bold", 14)
-        p.drawString(width - 2.3*inch, height - 0.8*inch, f"PO #{purchase_order.po_number}")
-        
-        # Add date in the top right corner below the PO number
-        p.setFont("Helvetica", 12)
-        date_text = f"Date: {purchase_order.date.strftime('%B %d, %Y')}"
-        p.drawString(width - 2.3*inch, height - 1.1*inch, date_text)
-        
-        # Add company information - now below the logo
-        p.setFont("Helvetica", 10)
-        p.drawString(1*inch, height - 1.7*inch, "Chem Is Try Inc")
-        p.drawString(1*inch, height - 1.9*inch, "160-4 Liberty Street")
-        p.drawString(1*inch, height - 2.1*inch, "Metuchen, NJ 08840")
-        p.drawString(1*inch, height - 2.3*inch, "Phone: 732-372-7311")
-        p.drawString(1*inch, height - 2.5*inch, "Email: info@chem-is-try.com")
-        p.drawString(1*inch, height - 2.7*inch, "Website: www.chem-is-try.com")
-        
-        # Add vendor information
-        p.setFont("Helvetica-Bold", 12)
-        p.drawString(1*inch, height - 3.1*inch, "Vendor:")
-        p.setFont("Helvetica", 10)
-        p.drawString(1*inch, height - 3.3*inch, purchase_order.vendor.name)
-        p.drawString(1*inch, height - 3.5*inch, purchase_order.vendor.address)
-        p.drawString(1*inch, height - 3.7*inch, f"{purchase_order.vendor.city}, {purchase_order.vendor.state} {purchase_order.vendor.zip_code}")
-        p.drawString(1*inch, height - 3.9*inch, purchase_order.vendor.country)
-        
-        # Add shipping information
-        p.setFont("Helvetica-Bold", 12)
-        p.drawString(5*inch, height - 3.1*inch, "Ship To:")
-        p.setFont("Helvetica", 10)
-        p.drawString(5*inch, height - 3.3*inch, "Chem Is Try Inc")
-        p.drawString(5*inch, height - 3.5*inch, "160-4 Liberty Street")
-        p.drawString(5*inch, height - 3.7*inch, "Metuchen, NJ 08840 US")
-        
-        # Add payment terms
-        p.setFont("Helvetica-Bold", 12)
-        p.drawString(1*inch, height - 4.3*inch, "Payment Terms:")
-        p.setFont("Helvetica", 10)
-        payment_terms = f"Net {purchase_order.payment_days} days"
-        if purchase_order.payment_terms:
-            payment_terms += f" - {purchase_order.payment_terms}"
-        p.drawString(1*inch, height - 4.5*inch, payment_terms)
-        
-        # Add line items table
-        p.setFont("Helvetica-Bold", 12)
-        p.drawString(1*inch, height - 4.9*inch, "Line Items:")
-        
-        # Table headers
-        p.setFont("Helvetica-Bold", 10)
-        p.drawString(1*inch, height - 5.2*inch, "Qty")
-        p.drawString(1.5*inch, height - 5.2*inch, "Description")
-        p.drawString(5*inch, height - 5.2*inch, "Rate")
-        p.drawString(6*inch, height - 5.2*inch, "Amount")
-        
-        # Draw a line under the headers
-        p.line(1*inch, height - 5.3*inch, 7*inch, height - 5.3*inch)
-        
-        # Add line items
-        y_position = height - 5.6*inch
-        p.setFont("Helvetica", 10)
-        
-        for item in purchase_order.line_items.all():
-            p.drawString(1*inch, y_position, str(item.quantity))
-            
-            # Handle multi-line descriptions
-            description_lines = [item.description[i:i+50] for i in range(0, len(item.description), 50)]
-            for i, line in enumerate(description_lines):
-                p.drawString(1.5*inch, y_position - i*0.2*inch, line)
-            
-            p.drawString(5*inch, y_position, f"${item.rate:.2f}")
-            p.drawString(6*inch, y_position, f"${item.amount:.2f}")
-            
-            # Move down for the next item, accounting for multi-line descriptions
-            y_position -= (0.2*inch) * (len(description_lines) + 1)
-        
-        # Draw a line above the total
-        p.line(1*inch, y_position - 0.1*inch, 7*inch, y_position - 0.1*inch)
-        
-        # Add total - explicitly set fill color to ensure no black box
-        p.setFillColorRGB(0, 0, 0)  # Set fill color to black (text)
-        p.setStrokeColorRGB(1, 1, 1)  # Set stroke color to white (no visible border)
-        
-        # Reset any drawing state that might cause unwanted artifacts
-        p.saveState()
-        
-        p.setFont("Helvetica-Bold", 12)
-        p.drawString(5*inch, y_position - 0.4*inch, "Total:")
-        p.drawString(6*inch, y_position - 0.4*inch, f"${purchase_order.total_amount:.2f}")
+        Return the request data with the JSON-encoded line item fields decoded.
         
-        p.restoreState()
-        
-        # Add notes if any
-        if purchase_order.notes:
-            p.setFont("Helvetica-Bold", 12)
-            p.drawString(1*inch, y_position - 0.8*inch, "Notes:")
-            p.setFont("Helvetica", 10)
-            
-            # Handle multi-line notes
-            notes_lines = [purchase_order.notes[i:i+80] for i in range(0, len(purchase_order.notes), 80)]
-            for i, line in enumerate(notes_lines):
-                p.drawString(1*inch, y_position - (1 + i*0.2)*inch, line)
-            
-            y_position -= (1 + len(notes_lines)*0.2)*inch
-        
-        # Create a section for signatures and stamps
-        signature_y_position = y_position - 1.5*inch
-        
-        # Add "Generated by" first
-        p.setFont("Helvetica", 10)
-        p.drawString(1*inch, signature_y_position, f"Generated by: {purchase_order.user.get_full_name()}")
-        
-        # Add "Authorized Signature" line below
-        signature_y_position -= 0.4*inch
-        p.line(1*inch, signature_y_position, 3*inch, signature_y_position)
-        p.drawString(1*inch, signature_y_position - 0.2*inch, "Authorized Signature")
-        
-        if purchase_order.signature:
-            # Position the signature directly below the "Authorized Signature" text
-            # Move it down to be below the "Authorized Signature" text
-            signature_y_position -= 0.5*inch
-            p.drawImage(purchase_order.signature.path, 1*inch, signature_y_position - 1*inch, width=2*inch, preserveAspectRatio=True)
-        
-        # Calculate stamp positions for better geometric placement
-        # Position stamps to the right of the signature section with some spacing
-        stamp_x_position = 4.5*inch + 0.7*inch
-        stamp_y_position = signature_y_position + 0.5*inch
-        stamp_width = 1.8*inch
-        
-        # Add both stamps to the right of the signature section
-        # First, add the original stamp with 75% opacity (increased from 50%)
-        original_stamp_path = os.path.join(settings.BASE_DIR, 'static', 'images', 'stamp-original.png')
-        if os.path.exists(original_stamp_path):
-            # Save the current graphics state
-            p.saveState()
-            # Set transparency for the original stamp (75% opacity)
-            p.setFillAlpha(0.95)
-            p.setStrokeAlpha(0.95)
-            # Position the original stamp at the top right
-            p.drawImage(original_stamp_path, stamp_x_position, stamp_y_position - 0.3*inch, width=stamp_width, preserveAspectRatio=True)
-            # Restore the graphics state
-            p.restoreState()
-        else:
-            print(f"Original stamp not found at: {original_stamp_path}")
-        
-        # Then, add the CIT stamp below the original stamp with 80% opacity
-        cit_stamp_path = os.path.join(settings.BASE_DIR, 'static', 'images', 'stamp-cit.png')
-        if os.path.exists(cit_stamp_path):
-            # Save the current graphics state
-            p.saveState()
-            # Set transparency for the CIT stamp (80% opacity)
-            p.setFillAlpha(0.8)
-            p.setStrokeAlpha(0.8)
-            # Position the CIT stamp below the original stamp with some overlap
-            p.drawImage(cit_stamp_path, stamp_x_position, stamp_y_position - 1.2*inch, width=stamp_width, preserveAspectRatio=True)
-            # Restore the graphics state
-            p.restoreState()
-        else:
-            print(f"CIT stamp not found at: {cit_stamp_path}")
-        
-        # Close the PDF object cleanly
-        p.showPage()
-        p.save()
-        
-        # Get the value of the BytesIO buffer and return it
-        buffer.seek(0)
-        response = HttpResponse(buffer, content_type='application/pdf')
+        Multipart forms (needed for the signature upload) can't nest, so
+        line_item_ids and new_line_items arrive as JSON strings.
+        """
+        data = request.data.dict() if hasattr(request.data, 'dict') else dict(request.data)
+        for field, expected_type in (('line_item_ids', int), ('new_line_items', dict)):
+            if field not in data or not isinstance(data[field], str):
+                continue
+            try:
+                value = json.loads(data[field])
+            except json.JSONDecodeError as e:
+                logger.info("Invalid JSON in %s: %s", field, e)
+                raise ValidationError({field: ["Invalid JSON format."]})
+            if not isinstance(value, list) or not all(isinstance(item, expected_type) for item in value):
+                raise ValidationError({field: ["Invalid line item format."]})
+            data[field] = value
+        return data
+    
+    @action(detail=True, methods=['post'], url_path='render')
+    def render_pdf(self, request, pk=None):
+        """
+        Queue a background PDF render and return the job to poll
+        """
+        job = enqueue_pdf_render(self.get_object())
+        serializer = PDFRenderJobSerializer(job, context=self.get_serializer_context())
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+    
+    @action(detail=False, methods=['post'], url_path='export-pdf')
+    def export_pdf(self, request):
+        """
+        Stream a ZIP of PDFs for the selected purchase orders
+        """
+        serializer = PurchaseOrderExportSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        params = serializer.validated_data
+        
+        queryset = self.get_queryset()
+        if 'ids' in params:
+            queryset = queryset.filter(pk__in=params['ids'])
+        if 'vendor_id' in params:
+            queryset = queryset.filter(vendor_id=params['vendor_id'])
+        if 'date_from' in params:
+            queryset = queryset.filter(date__gte=params['date_from'])
+        if 'date_to' in params:
+            queryset = queryset.filter(date__lte=params['date_to'])
+        purchase_order_ids = list(queryset.order_by('date', 'pk').values_list('pk', flat=True))
+        
+        if not purchase_order_ids:
+            return Response(
+                {"detail": "No purchase orders match the export criteria."},
+                status=status.HTTP_404_NOT_FOUND
+            )
         
-        # Check if the request wants to download or view the PDF
-        disposition = request.query_params.get('disposition', 'attachment')
-        if disposition == 'inline':
-            response['Content-Disposition'] = f'inline; filename="PO_{purchase_order.po_number}.pdf"'
+        concurrency = min(params.get('concurrency', settings.PDF_EXPORT_WORKERS), settings.PDF_EXPORT_WORKERS)
+        # Each server type needs its own kind of iterator to really stream
+        if isinstance(request._request, ASGIRequest):
+            chunks = astream_purchase_orders_zip(purchase_order_ids, concurrency)
         else:
-            response['Content-Disposition'] = f'attachment; filename="PO_{purchase_order.po_number}.pdf"'
+            chunks = stream_purchase_orders_zip(purchase_order_ids, concurrency)
+        response = StreamingHttpResponse(chunks, content_type='application/zip')
+        filename = f"purchase_orders_{timezone.now().strftime('%Y%m%d_%H%M%S')}.zip"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+class PDFRenderJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    API endpoint that allows background PDF render jobs to be polled.
+    """
+    serializer_class = PDFRenderJobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get_queryset(self):
+        return (
+            PDFRenderJob.objects.filter(purchase_order__user=self.request.user)
+            .select_related('purchase_order')
+            .order_by('-created_at')
+        )
+    
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        """
+        Return the rendered PDF once the job is done
+        """
+        job = self.get_object()
+        if job.status != PDFRenderJob.STATUS_DONE or not job.pdf:
+            return Response(
+                {"detail": f"PDF is not ready (status: {job.status})."},
+                status=status.HTTP_409_CONFLICT
+            )
         
-        return response 
\ No newline at end of file
+        as_attachment = request.query_params.get('disposition', 'attachment') != 'inline'
+        return FileResponse(
+            job.pdf.open('rb'),
+            as_attachment=as_attachment,
+            filename=f"PO_{job.purchase_order.po_number}.pdf",
+            content_type='application/pdf'
+        )
+
+class DashboardView(APIView):
+    """
+    API endpoint that returns the dashboard counts, spend and recent purchase orders.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request):
+        return Response(get_dashboard_stats(request.user))
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint for this process's request and PDF metrics.
+    """
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+        return HttpResponseForbidden()
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+def _authenticate(request):
+    """Authenticate a plain Django request with the API's DRF authenticators"""
+    drf_request = Request(
+        request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+    )
+    try:
+        user = drf_request.user
+    except APIException:
+        return None
+    return user if user.is_authenticated else None
+
+def _set_pdf_cache_headers(response, etag, last_modified):
+    """Let clients revalidate the PDF with If-None-Match/If-Modified-Since"""
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified.timestamp())
+    patch_cache_control(response, private=True, no_cache=True)
+
+async def purchase_order_pdf(request, pk):
+    """
+    Generate a PDF for the purchase order.
+    
+    An async view so a slow render doesn't occupy a server worker: the
+    order is loaded with the async ORM and the render runs on the bounded
+    render executor. When that executor is full the request is turned
+    away with a 503 and Retry-After instead of piling up.
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return HttpResponseNotAllowed(['GET', 'HEAD'])
+    
+    user = await sync_to_async(_authenticate)(request)
+    if user is None:
+        return JsonResponse({"detail": "Authentication credentials were not provided."}, status=401)
+    
+    try:
+        purchase_order = await (
+            PurchaseOrder.objects.filter(user=user).select_related('vendor', 'user').aget(pk=pk)
+        )
+    except PurchaseOrder.DoesNotExist:
+        return JsonResponse({"detail": "No PurchaseOrder matches the given query."}, status=404)
+    line_items = [item async for item in purchase_order.line_items.all()]
+    
+    # Answer conditional requests without touching the PDF at all
+    fingerprint = purchase_order_fingerprint(purchase_order, line_items)
+    etag = quote_etag(fingerprint)
+    last_modified = purchase_order_last_modified(purchase_order, line_items)
+    conditional_response = get_conditional_response(
+        request, etag=etag, last_modified=int(last_modified.timestamp())
+    )
+    if conditional_response is not None:
+        _set_pdf_cache_headers(conditional_response, etag, last_modified)
+        return conditional_response
+    
+    try:
+        pdf = await get_render_executor().run(
+            get_purchase_order_pdf, purchase_order, line_items, fingerprint=fingerprint
+        )
+    except ExecutorSaturated:
+        logger.warning("PDF render rejected: executor saturated", extra={'fields': {'purchase_order_id': pk}})
+        response = JsonResponse({"detail": "Too many PDFs are being rendered. Try again shortly."}, status=503)
+        response['Retry-After'] = str(settings.PDF_RENDER_RETRY_AFTER)
+        return response
+    
+    response = HttpResponse(pdf, content_type='application/pdf')
+    _set_pdf_cache_headers(response, etag, last_modified)
+    
+    # Check if the request wants to download or view the PDF
+    disposition = request.GET.get('disposition', 'attachment')
+    if disposition == 'inline':
+        response['Content-Disposition'] = f'inline; filename="PO_{purchase_order.po_number}.pdf"'
+    else:
+        response['Content-Disposition'] = f'attachment; filename="PO_{purchase_order.po_number}.pdf"'
+    
+    return response
@@ -32,18 +32,22 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     
     # Third-party apps
     'rest_framework',
     'rest_framework.authtoken',
     'corsheaders',
     'dj_rest_auth',
+    'django_filters',
     
     # Local apps
     'api',
 ]
 
 MIDDLEWARE = [
+    'api.middleware.PerformanceMiddleware',
+    'api.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -81,17 +85,79 @@ WSGI_APPLICATION = 'po_generator.wsgi.application'
 
 # Database settings with environment-specific configurations
 
-DATABASES = {
-    'default': {
+# Connections are kept open and reused for DB_CONN_MAX_AGE seconds, with a
+# health check before reuse. Under ASGI Django cannot carry a connection
+# from one request to the next, so set DB_POOL_MAX_SIZE to use psycopg's
+# connection pool for PostgreSQL instead (needs psycopg 3).
+DB_CONN_MAX_AGE = int(os.getenv('DB_CONN_MAX_AGE', 60))
+DB_POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', 2))
+DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', 0))
+
+
+def postgres_database(host, port, name):
+    database = {
         'ENGINE': 'django.db.backends.postgresql',
-        'NAME': f'{BASE_DB_NAME}_{ENVIRONMENT}',
+        'NAME': name,
         'USER': os.getenv('DB_USER', 'shaun'),
         'PASSWORD': os.getenv('DB_PASSWORD', ''),
-        'HOST': os.getenv('DB_HOST', 'localhost'),
-        'PORT': os.getenv('DB_PORT', '5432'),
+        'HOST': host,
+        'PORT': port,
+        'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+    }
+    if DB_POOL_MAX_SIZE:
+        # Pooled connections go back to the pool after each request
+        database['CONN_MAX_AGE'] = 0
+        database['OPTIONS'] = {
+            'pool': {
+                'min_size': min(DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE),
+                'max_size': DB_POOL_MAX_SIZE,
+                'timeout': int(os.getenv('DB_POOL_TIMEOUT', 10)),
+            },
+        }
+    return database
+
+
+def sqlite_database(path):
+    return {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': path,
+        'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
     }
+
+
+DATABASES = {
+    'default': postgres_database(
+        os.getenv('DB_HOST', 'localhost'),
+        os.getenv('DB_PORT', '5432'),
+        f'{BASE_DB_NAME}_{ENVIRONMENT}',
+    ),
 }
 
+# DB_ENGINE=sqlite runs against a local SQLite file instead, e.g. for benchmarks
+if os.getenv('DB_ENGINE') == 'sqlite':
+    DATABASES['default'] = sqlite_database(os.getenv('SQLITE_PATH', os.path.join(BASE_DIR, 'db.sqlite3')))
+
+# Optional read replica. Safe requests read from it unless the client wrote
+# in the last REPLICA_PIN_SECONDS; writes always go to the primary. Locally
+# a copy of the SQLite file (SQLITE_REPLICA_PATH) or a second PostgreSQL
+# database (DB_REPLICA_NAME) will do.
+if os.getenv('DB_ENGINE') == 'sqlite' and os.getenv('SQLITE_REPLICA_PATH'):
+    DATABASES['replica'] = sqlite_database(os.getenv('SQLITE_REPLICA_PATH'))
+elif os.getenv('DB_ENGINE') != 'sqlite' and (os.getenv('DB_REPLICA_HOST') or os.getenv('DB_REPLICA_NAME')):
+    DATABASES['replica'] = postgres_database(
+        os.getenv('DB_REPLICA_HOST', DATABASES['default']['HOST']),
+        os.getenv('DB_REPLICA_PORT', DATABASES['default']['PORT']),
+        os.getenv('DB_REPLICA_NAME', DATABASES['default']['NAME']),
+    )
+if 'replica' in DATABASES:
+    # Tests use the primary for both
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+
+DATABASE_ROUTERS = ['api.db_router.PrimaryReplicaRouter']
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', 5))
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -132,6 +198,81 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Shared by all server processes on the host so invalidation reaches every worker
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('CACHE_DIR', os.path.join(BASE_DIR, 'cache')),
+    },
+    # Serialized vendor and line item responses. Local to each process and
+    # least-recently-used entries are evicted first; writes invalidate it
+    # through a generation number kept in the default cache.
+    'catalog': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'catalog',
+        'TIMEOUT': int(os.getenv('CATALOG_CACHE_TIMEOUT', 300)),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('CATALOG_CACHE_MAX_ENTRIES', 1000)),
+        },
+    },
+}
+
+# Rendered purchase order PDFs, keyed by a fingerprint of everything they show
+PDF_CACHE = {
+    'BACKEND': 'api.pdf_cache.FileSystemPDFCache',
+    'LOCATION': os.getenv('PDF_CACHE_DIR', os.path.join(BASE_DIR, 'pdf_cache')),
+    'MAX_SIZE': int(os.getenv('PDF_CACHE_MAX_SIZE', 256 * 1024 * 1024)),
+}
+
+# Render processes per server process for bulk PDF exports; this also caps
+# the per-request concurrency clients can ask for
+PDF_EXPORT_WORKERS = int(os.getenv('PDF_EXPORT_WORKERS', os.cpu_count() or 1))
+
+# Threads per server process rendering PDFs for the async PDF view, and
+# how many more renders may wait before requests get a 503
+PDF_RENDER_THREADS = int(os.getenv('PDF_RENDER_THREADS', 4))
+PDF_RENDER_QUEUE_SIZE = int(os.getenv('PDF_RENDER_QUEUE_SIZE', 16))
+PDF_RENDER_RETRY_AFTER = int(os.getenv('PDF_RENDER_RETRY_AFTER', 2))
+
+# Rows validated and inserted per transaction by the vendor and line item
+# CSV imports
+CSV_IMPORT_CHUNK_SIZE = int(os.getenv('CSV_IMPORT_CHUNK_SIZE', 1000))
+# Rejected rows returned in an import's response
+CSV_IMPORT_MAX_REJECTS = int(os.getenv('CSV_IMPORT_MAX_REJECTS', 1000))
+
+# Structured key=value logs, written to stderr by a background thread so
+# request threads never wait on the stream
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'key_value': {
+            '()': 'api.log.KeyValueFormatter',
+        },
+    },
+    'handlers': {
+        'background': {
+            '()': 'api.log.BackgroundQueueHandler',
+            'formatter': 'key_value',
+            'stream': 'ext://sys.stderr',
+        },
+    },
+    'root': {
+        'handlers': ['background'],
+        'level': os.getenv('LOG_LEVEL', 'WARNING'),
+    },
+    'loggers': {
+        'api': {
+            'level': os.getenv('API_LOG_LEVEL', 'INFO'),
+        },
+    },
+}
+
+# Per-request query/render timings in a Server-Timing header, aggregated
+# into histograms served at /metrics to the listed addresses only
+PERFORMANCE_METRICS_ENABLED = os.getenv('PERFORMANCE_METRICS_ENABLED', 'True') == 'True'
+METRICS_ALLOWED_IPS = os.getenv('METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',')
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -148,6 +289,16 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
+    # orjson-backed JSON, falling back to the standard encoder without it
+    'DEFAULT_RENDERER_CLASSES': (
+        'api.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'api.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
 }
 
 # JWT Settings
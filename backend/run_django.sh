@@ -17,4 +17,9 @@ else
   PORT=${PROD_BACKEND_PORT:-8001}
 fi
 
-uv run --active manage.py runserver 0.0.0.0:${PORT}
+if [ "$ENV" = "development" ] || [ "$ENV" = "dev" ]; then
+  uv run --active manage.py runserver 0.0.0.0:${PORT}
+else
+  # ASGI, so the async PDF view doesn't tie up a worker while it renders
+  uv run --active uvicorn po_generator.asgi:application --host 0.0.0.0 --port ${PORT} --workers ${WEB_CONCURRENCY:-2}
+fi
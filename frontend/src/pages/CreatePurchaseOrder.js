@@ -72,8 +72,8 @@ const CreatePurchaseOrder = ({ isEditing = false, initialPurchaseOrder = null })
         console.log('Fetching data for purchase order creation...');
         const [vendorsResponse, savedVendorsResponse, savedLineItemsResponse] = await Promise.all([
           axios.get('/api/vendors/'),
-          axios.get('/api/saved-vendors/'),
-          axios.get('/api/saved-line-items/')
+          axios.get('/api/saved-vendors/?expand=vendor'),
+          axios.get('/api/saved-line-items/?expand=line_item')
         ]);
         
         console.log('Vendors response:', vendorsResponse.data);
@@ -257,77 +257,34 @@ const CreatePurchaseOrder = ({ isEditing = false, initialPurchaseOrder = null })
         console.log('No existing line items to add');
       }
       
-      // Create new line items first if needed
+      // New line items are sent inline and created with the purchase order
       const newLineItems = values.line_items.filter(item => !item.id);
-      if (newLineItems.length > 0) {
-        console.log('Creating new line items:', newLineItems);
-        
-        try {
-          // Ensure all required fields are present
-          for (const item of newLineItems) {
-            if (!item.quantity || !item.description || !item.rate) {
-              console.error('Invalid line item:', item);
-              toast.error('All line items must have quantity, description, and rate');
-              setSubmitting(false);
-              return;
-            }
-          }
-          
-          const lineItemPromises = newLineItems.map(item => 
-            axios.post('/api/line-items/', {
-              quantity: item.quantity,
-              description: item.description,
-              rate: item.rate
-            })
-          );
-          
-          const lineItemResponses = await Promise.all(lineItemPromises);
-          const createdLineItemIds = lineItemResponses.map(response => response.data.id);
-          console.log('Created line item IDs:', createdLineItemIds);
-          
-          // Make sure we have at least one line item
-          if (existingLineItemIds.length === 0 && createdLineItemIds.length === 0) {
-            console.error('No line items available');
-            toast.error('At least one line item is required');
-            setSubmitting(false);
-            return;
-          }
-          
-          // Add newly created line item IDs
-          if (existingLineItemIds.length > 0) {
-            // If we already have existing line items, we need to combine them
-            const allLineItemIds = [...existingLineItemIds, ...createdLineItemIds];
-            // Remove the previous line_item_ids entry
-            formData.delete('line_item_ids');
-            // Add the combined list
-            formData.append('line_item_ids', JSON.stringify(allLineItemIds));
-            console.log('Combined line item IDs:', allLineItemIds);
-          } else {
-            // If we only have new line items
-            formData.append('line_item_ids', JSON.stringify(createdLineItemIds));
-            console.log('Only new line item IDs:', createdLineItemIds);
-          }
-        } catch (lineItemError) {
-          console.error('Error creating line items:', lineItemError);
-          if (lineItemError.response) {
-            console.error('Line item error response:', lineItemError.response.data);
-          }
-          toast.error('Failed to create line items');
-          setSubmitting(false);
-          return;
-        }
-      } else {
-        console.log('No new line items to create');
-        
-        // Make sure we have at least one existing line item
-        if (existingLineItemIds.length === 0) {
-          console.error('No line items available');
-          toast.error('At least one line item is required');
+      for (const item of newLineItems) {
+        if (!item.quantity || !item.description || !item.rate) {
+          console.error('Invalid line item:', item);
+          toast.error('All line items must have quantity, description, and rate');
           setSubmitting(false);
           return;
         }
       }
       
+      // Make sure we have at least one line item
+      if (existingLineItemIds.length === 0 && newLineItems.length === 0) {
+        console.error('No line items available');
+        toast.error('At least one line item is required');
+        setSubmitting(false);
+        return;
+      }
+      
+      if (newLineItems.length > 0) {
+        formData.append('new_line_items', JSON.stringify(newLineItems.map(item => ({
+          quantity: item.quantity,
+          description: item.description,
+          rate: item.rate
+        }))));
+        console.log('New line items:', newLineItems);
+      }
+      
       let response;
       
       try {
@@ -453,7 +410,7 @@ const CreatePurchaseOrder = ({ isEditing = false, initialPurchaseOrder = null })
         initialValues={
           initialPurchaseOrder
             ? {
-                vendor_id: initialPurchaseOrder.vendor.id,
+                vendor_id: initialPurchaseOrder.vendor,
                 date: initialPurchaseOrder.date,
                 payment_days: initialPurchaseOrder.payment_days,
                 payment_terms: initialPurchaseOrder.payment_terms || '',
@@ -18,23 +18,14 @@ const Dashboard = () => {
   useEffect(() => {
     const fetchStats = async () => {
       try {
-        // Fetch counts
-        const [poResponse, vendorResponse, lineItemResponse] = await Promise.all([
-          axios.get('/api/purchase-orders/'),
-          axios.get('/api/vendors/'),
-          axios.get('/api/line-items/')
-        ]);
-
-        // Sort purchase orders by created_at in descending order (newest first)
-        const sortedPOs = [...(poResponse.data.results || [])].sort((a, b) => {
-          return new Date(b.created_at) - new Date(a.created_at);
-        });
+        // Counts and recent purchase orders come from one aggregated endpoint
+        const response = await axios.get('/api/dashboard/');
 
         setStats({
-          purchaseOrders: poResponse.data.count || poResponse.data.results.length,
-          vendors: vendorResponse.data.count || vendorResponse.data.results.length,
-          lineItems: lineItemResponse.data.count || lineItemResponse.data.results.length,
-          recentPOs: sortedPOs.slice(0, 5) // Get the 5 most recent POs
+          purchaseOrders: response.data.purchase_orders,
+          vendors: response.data.vendors,
+          lineItems: response.data.line_items,
+          recentPOs: response.data.recent_purchase_orders
         });
       } catch (error) {
         console.error('Error fetching dashboard stats:', error);
@@ -116,7 +107,7 @@ const Dashboard = () => {
                         <h5 className="mb-1">{po.po_number}</h5>
                         <small>{new Date(po.date).toLocaleDateString()}</small>
                       </div>
-                      <p className="mb-1">Vendor: {po.vendor.name}</p>
+                      <p className="mb-1">Vendor: {po.vendor_name}</p>
                       <small>Total: ${po.total_amount}</small>
                     </Link>
                   ))}
@@ -18,7 +18,7 @@ const EditPurchaseOrder = () => {
       setError(null);
       try {
         console.log(`Fetching purchase order with ID: ${id}`);
-        const response = await axios.get(`/api/purchase-orders/${id}/`);
+        const response = await axios.get(`/api/purchase-orders/${id}/?expand=line_items`);
         console.log('Purchase order data:', response.data);
         
         // Process the data to match the expected format for the form
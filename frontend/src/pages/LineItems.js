@@ -47,7 +47,7 @@ const LineItems = () => {
         console.log('Fetching line items and templates...');
         const [lineItemsResponse, savedLineItemsResponse] = await Promise.all([
           axios.get('/api/line-items/'),
-          axios.get('/api/saved-line-items/')
+          axios.get('/api/saved-line-items/?expand=line_item')
         ]);
         
         console.log('Line items response:', lineItemsResponse.data);
@@ -91,17 +91,23 @@ const LineItems = () => {
         response = await axios.put(`/api/line-items/${currentLineItem.id}/`, values);
         console.log('Line item updated:', response.data);
         
-        // Update line items list
-        setLineItems(lineItems.map(item => item.id === currentLineItem.id ? response.data : item));
-        toast.success('Line item updated successfully');
+        if (response.data.id === currentLineItem.id) {
+          // Update line items list
+          setLineItems(lineItems.map(item => item.id === currentLineItem.id ? response.data : item));
+          toast.success('Line item updated successfully');
+        } else {
+          // The original is used by orders or templates, so the edit was saved as another line item
+          setLineItems([...lineItems.filter(item => item.id !== response.data.id), response.data]);
+          toast.success('Line item is in use, so the changes were saved as a new line item');
+        }
       } else {
         // Create new line item
         response = await axios.post('/api/line-items/', values);
         console.log('Line item created:', response.data);
         
-        // Add to line items list
-        setLineItems([...lineItems, response.data]);
-        toast.success('Line item created successfully');
+        // Add to line items list, unless an identical one was already there
+        setLineItems([...lineItems.filter(item => item.id !== response.data.id), response.data]);
+        toast.success(response.status === 201 ? 'Line item created successfully' : 'An identical line item already exists');
       }
       
       // Close modal and reset form
@@ -130,7 +136,7 @@ const LineItems = () => {
   const handleSaveTemplate = async (values, { setSubmitting, resetForm, setFieldError }) => {
     try {
       console.log('Saving line item template:', values.name, 'for line item ID:', templateLineItem.id);
-      const response = await axios.post('/api/saved-line-items/', {
+      const response = await axios.post('/api/saved-line-items/?expand=line_item', {
         line_item_id: templateLineItem.id,
         name: values.name
       });
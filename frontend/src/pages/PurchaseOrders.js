@@ -61,13 +61,16 @@ const PurchaseOrders = () => {
   };
 
   // Handle duplicating a purchase order
-  const handleDuplicatePurchaseOrder = async (po) => {
+  const handleDuplicatePurchaseOrder = async (listRow) => {
     try {
-      console.log('Duplicating purchase order:', po);
+      console.log('Duplicating purchase order:', listRow);
+      
+      // List rows are compact, so fetch the full order to copy its line items
+      const { data: po } = await axios.get(`/api/purchase-orders/${listRow.id}/?expand=line_items`);
       
       // Create a new purchase order with the same data but without the ID and PO number
       const duplicateData = {
-        vendor_id: po.vendor.id,
+        vendor_id: po.vendor,
         payment_terms: po.payment_terms,
         payment_days: po.payment_days,
         notes: po.notes,
@@ -110,8 +113,11 @@ const PurchaseOrders = () => {
       
       console.log('Duplicate purchase order created:', response.data);
       
-      // Add the new purchase order to the list
-      setPurchaseOrders([response.data, ...purchaseOrders]);
+      // Add the new purchase order to the list, in the shape of a list row
+      setPurchaseOrders([
+        { ...response.data, vendor_id: listRow.vendor_id, vendor_name: listRow.vendor_name },
+        ...purchaseOrders
+      ]);
       
       toast.success(`Purchase order duplicated with new PO number: ${response.data.po_number}`);
     } catch (error) {
@@ -226,7 +232,7 @@ const PurchaseOrders = () => {
                           <Badge bg="secondary" className="me-2">{po.po_number}</Badge>
                         </td>
                         <td>{formatDate(po.date)}</td>
-                        <td>{po.vendor.name}</td>
+                        <td>{po.vendor_name}</td>
                         <td>${parseFloat(po.total_amount).toFixed(2)}</td>
                         <td>
                           {po.payment_terms ? 
@@ -39,7 +39,7 @@ const Vendors = () => {
       try {
         const [vendorsResponse, savedVendorsResponse] = await Promise.all([
           axios.get('/api/vendors/'),
-          axios.get('/api/saved-vendors/')
+          axios.get('/api/saved-vendors/?expand=vendor')
         ]);
         
         setVendors(vendorsResponse.data.results || vendorsResponse.data);
@@ -138,7 +138,7 @@ const Vendors = () => {
   // Handle saving a vendor template
   const handleSaveTemplate = async (values, { setSubmitting, resetForm }) => {
     try {
-      const response = await axios.post('/api/saved-vendors/', {
+      const response = await axios.post('/api/saved-vendors/?expand=vendor', {
         vendor_id: templateVendor.id,
         name: values.name
       });